@@ -24,7 +24,7 @@ config.set_main_option("sqlalchemy.url", database_url)
 from db.database import Base
 from models import (
     user, payment, order, rating, request,
-    category, chat, sms_code, notification, work_photo
+    category, chat, sms_code, notification, work_photo, outbox, moderation
 )
 from models.user import User  # на случай, если нужно явно
 
@@ -0,0 +1,52 @@
+"""add user rating aggregates
+
+Revision ID: 0a7d3e9c5b18
+Revises: f2a6c4e81b37
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a7d3e9c5b18'
+down_revision: Union[str, Sequence[str], None] = 'f2a6c4e81b37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = ('rating_sum', 'rating_count', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for column in COLUMNS:
+        op.add_column('users', sa.Column(column, sa.Integer(), server_default='0', nullable=False))
+    # Заполняем по существующим отзывам; reputation — из тех же агрегатов
+    op.execute("""
+        UPDATE users SET
+            rating_sum = s.total,
+            rating_count = s.count,
+            rating_1 = s.r1, rating_2 = s.r2, rating_3 = s.r3, rating_4 = s.r4, rating_5 = s.r5,
+            reputation = s.total::float / s.count
+        FROM (
+            SELECT master_id, COUNT(*) AS count, SUM(rating) AS total,
+                   COUNT(*) FILTER (WHERE rating = 1) AS r1,
+                   COUNT(*) FILTER (WHERE rating = 2) AS r2,
+                   COUNT(*) FILTER (WHERE rating = 3) AS r3,
+                   COUNT(*) FILTER (WHERE rating = 4) AS r4,
+                   COUNT(*) FILTER (WHERE rating = 5) AS r5
+            FROM ratings
+            GROUP BY master_id
+        ) AS s
+        WHERE users.id = s.master_id
+    """)
+    op.execute("UPDATE users SET reputation = 0 WHERE rating_count = 0 AND reputation IS DISTINCT FROM 0")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column in reversed(COLUMNS):
+        op.drop_column('users', column)
@@ -0,0 +1,68 @@
+"""add chat read cursors and unread counters
+
+Revision ID: 3b9d0c7e21a4
+Revises: e56eb37b2ed8
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9d0c7e21a4'
+down_revision: Union[str, Sequence[str], None] = 'e56eb37b2ed8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('chat_read_cursors',
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('last_read_message_id', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('unread_count', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('order_id', 'user_id')
+    )
+    op.create_table('chat_unread_counters',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('unread_count', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # Курсоры из is_read: прочитано до последнего прочитанного сообщения,
+    # непрочитанные — is_read false или NULL
+    op.execute("""
+        INSERT INTO chat_read_cursors (order_id, user_id, last_read_message_id, unread_count)
+        SELECT order_id, receiver_id,
+               COALESCE(MAX(CASE WHEN is_read IS TRUE THEN id END), 0),
+               COUNT(CASE WHEN is_read IS NOT TRUE THEN 1 END)
+        FROM chat_messages
+        GROUP BY order_id, receiver_id
+    """)
+    op.execute("""
+        INSERT INTO chat_unread_counters (user_id, unread_count)
+        SELECT user_id, SUM(unread_count)
+        FROM chat_read_cursors
+        GROUP BY user_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Обратно в is_read: всё до курсора прочитано
+    op.execute("""
+        UPDATE chat_messages AS m
+        SET is_read = TRUE
+        FROM chat_read_cursors AS c
+        WHERE m.order_id = c.order_id AND m.receiver_id = c.user_id
+          AND m.id <= c.last_read_message_id
+    """)
+    op.drop_table('chat_unread_counters')
+    op.drop_table('chat_read_cursors')
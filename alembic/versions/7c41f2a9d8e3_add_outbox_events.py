@@ -0,0 +1,59 @@
+"""add outbox events and notification delivery keys
+
+Revision ID: 7c41f2a9d8e3
+Revises: 3b9d0c7e21a4
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c41f2a9d8e3'
+down_revision: Union[str, Sequence[str], None] = '3b9d0c7e21a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('outbox_events',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+    sa.Column('event_type', sa.String(), nullable=False),
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('available_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_outbox_events_pending', 'outbox_events', ['available_at', 'id'],
+                    postgresql_where=sa.text('processed_at IS NULL'))
+
+    op.add_column('notifications', sa.Column('delivery_key', sa.String(), nullable=True))
+    # Таблица уведомлений большая — уникальный индекс строим без блокировки записи
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_notifications_delivery_key', 'notifications', ['delivery_key'],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_notifications_delivery_key', table_name='notifications',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_column('notifications', 'delivery_key')
+    op.drop_index('ix_outbox_events_pending', table_name='outbox_events')
+    op.drop_table('outbox_events')
@@ -0,0 +1,55 @@
+"""add notification unread counters and retention index
+
+Revision ID: 9d2e6b1f4c70
+Revises: 7c41f2a9d8e3
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d2e6b1f4c70'
+down_revision: Union[str, Sequence[str], None] = '7c41f2a9d8e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('notification_unread_counters',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('unread_count', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    # Непрочитанные — is_read false или NULL
+    op.execute("""
+        INSERT INTO notification_unread_counters (user_id, unread_count)
+        SELECT user_id, COUNT(*)
+        FROM notifications
+        WHERE is_read IS NOT TRUE AND user_id IS NOT NULL
+        GROUP BY user_id
+    """)
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_notifications_read_created_at', 'notifications', ['created_at'],
+            postgresql_where=sa.text('is_read IS TRUE'),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_notifications_read_created_at', table_name='notifications',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_table('notification_unread_counters')
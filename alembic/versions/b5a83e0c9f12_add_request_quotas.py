@@ -0,0 +1,52 @@
+"""add request quotas
+
+Revision ID: b5a83e0c9f12
+Revises: 9d2e6b1f4c70
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5a83e0c9f12'
+down_revision: Union[str, Sequence[str], None] = '9d2e6b1f4c70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('request_quotas',
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('free_used', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('paid_credits', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['client_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('client_id')
+    )
+    # Сегодняшние заявки (сутки по UTC) и оплаченные, но ещё не привязанные extra_request
+    op.execute("""
+        INSERT INTO request_quotas (client_id, day, free_used, paid_credits)
+        SELECT client_id, (now() AT TIME ZONE 'utc')::date, LEAST(SUM(today), 5), SUM(credits)
+        FROM (
+            SELECT client_id, COUNT(*) AS today, 0 AS credits
+            FROM client_requests
+            WHERE created_at >= date_trunc('day', now() AT TIME ZONE 'utc') AT TIME ZONE 'utc'
+            GROUP BY client_id
+            UNION ALL
+            SELECT user_id, 0, COUNT(*)
+            FROM payments
+            WHERE purpose = 'extra_request' AND status = 'paid' AND is_active
+            GROUP BY user_id
+        ) AS s
+        GROUP BY client_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('request_quotas')
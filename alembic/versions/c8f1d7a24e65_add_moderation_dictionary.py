@@ -0,0 +1,41 @@
+"""add moderation dictionary
+
+Revision ID: c8f1d7a24e65
+Revises: b5a83e0c9f12
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8f1d7a24e65'
+down_revision: Union[str, Sequence[str], None] = 'b5a83e0c9f12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Наполнение встроенным BAD_WORDS делает приложение при первом старте
+    op.create_table('moderation_words',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('word', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('word')
+    )
+    op.create_table('moderation_dictionary',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), server_default='1', nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('moderation_dictionary')
+    op.drop_table('moderation_words')
@@ -0,0 +1,56 @@
+"""add composite indexes for hot queries
+
+Revision ID: e56eb37b2ed8
+Revises: 5f81d022f1e0, 7fa11c4c775b
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e56eb37b2ed8'
+down_revision: Union[str, Sequence[str], None] = ('5f81d022f1e0', '7fa11c4c775b')
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (имя индекса, таблица, колонки)
+INDEXES = [
+    ('ix_orders_status_category_id_city', 'orders', ['status', 'category_id', 'city']),
+    ('ix_orders_master_id_status', 'orders', ['master_id', 'status']),
+    ('ix_orders_client_id', 'orders', ['client_id']),
+    ('ix_chat_messages_order_id_created_at', 'chat_messages', ['order_id', 'created_at']),
+    ('ix_chat_messages_receiver_id_is_read', 'chat_messages', ['receiver_id', 'is_read']),
+    ('ix_notifications_user_id_created_at', 'notifications', ['user_id', 'created_at']),
+    ('ix_ratings_master_id', 'ratings', ['master_id']),
+    ('ix_payments_user_id_purpose_is_active_end_date', 'payments', ['user_id', 'purpose', 'is_active', 'end_date']),
+    ('ix_client_requests_client_id_created_at', 'client_requests', ['client_id', 'created_at']),
+    ('ix_verification_codes_phone_number_created_at', 'verification_codes', ['phone_number', 'created_at']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY не блокирует запись, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name, table, columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
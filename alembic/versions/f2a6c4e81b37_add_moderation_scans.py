@@ -0,0 +1,56 @@
+"""add moderation scans and flags
+
+Revision ID: f2a6c4e81b37
+Revises: c8f1d7a24e65
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a6c4e81b37'
+down_revision: Union[str, Sequence[str], None] = 'c8f1d7a24e65'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('moderation_scans',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('dictionary_version', sa.Integer(), nullable=False),
+    sa.Column('source', sa.String(), nullable=True),
+    sa.Column('last_id', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('processed', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('flagged', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('errors', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('elapsed_seconds', sa.Float(), server_default='0', nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('moderation_flags',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('content_type', sa.String(), nullable=False),
+    sa.Column('content_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('terms', sa.Text(), nullable=True),
+    sa.Column('scan_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['scan_id'], ['moderation_scans.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('content_type', 'content_id', 'kind', name='uq_moderation_flags_content')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('moderation_flags')
+    op.drop_table('moderation_scans')
@@ -0,0 +1,129 @@
+# benchmarks/chat_rooms.py
+"""
+Нагрузочный тест WebSocket-чата: комнаты заказов /chat/ws/{order_id}.
+
+Создаёт --rooms заказов (клиент + мастер), открывает по два сокета на
+комнату, затем клиенты отправляют по --messages сообщений. Скрипт
+считает сообщения в секунду (сохранено в БД и доставлено собеседнику),
+задержку доставки и, с --server-pid, RSS сервера на одно соединение.
+
+Скрипт пишет данные напрямую в DATABASE_URL сервера и подписывает
+токены тем же SECRET_KEY. Пример:
+    uvicorn main:app --port 8000 & SERVER=$!
+    python -m benchmarks.chat_rooms --rooms 500 --messages 20 --server-pid $SERVER
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import websockets
+
+from benchmarks.feed_subscribers import rss_kb
+from core.dependencies import create_access_token
+from db.database import SessionLocal
+from models import (  # noqa: F401 — все модели нужны для настройки мапперов
+    user, payment, order, rating, request,
+    category, chat, sms_code, notification, work_photo
+)
+from models.category import Category
+from models.order import Order
+from models.user import User
+
+
+def setup(rooms: int) -> list:
+    """[(order_id, client_token, master_token)]"""
+    db = SessionLocal()
+    try:
+        suffix = time.time_ns()
+        category = Category(name=f"bench-chat-{suffix}")
+        db.add(category)
+        db.flush()
+        pairs = []
+        for i in range(rooms):
+            client = User(phone_number=f"bench-cc-{suffix}-{i}", password="x", user_type="client")
+            master = User(phone_number=f"bench-cm-{suffix}-{i}", password="x", user_type="master")
+            pairs.append((client, master))
+        db.add_all([u for pair in pairs for u in pair])
+        db.flush()
+        orders = [
+            Order(client_id=client.id, master_id=master.id, category_id=category.id,
+                  description="bench", city="bench", address="bench", status="in_progress")
+            for client, master in pairs
+        ]
+        db.add_all(orders)
+        db.commit()
+        return [
+            (o.id, create_access_token({"sub": str(c.id)}), create_access_token({"sub": str(m.id)}))
+            for o, (c, m) in zip(orders, pairs)
+        ]
+    finally:
+        db.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="ws://127.0.0.1:8000")
+    parser.add_argument("--rooms", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=20, help="сообщений от клиента в каждой комнате")
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    parser.add_argument("--server-pid", type=int, help="PID uvicorn для замера RSS")
+    args = parser.parse_args()
+
+    rooms = setup(args.rooms)
+    rss_before = rss_kb(args.server_pid) if args.server_pid else None
+
+    gate = asyncio.Semaphore(args.connect_concurrency)
+
+    async def connect(order_id: int, token: str):
+        async with gate:
+            return await websockets.connect(
+                f"{args.base_url}/chat/ws/{order_id}?token={token}", ping_interval=None, max_queue=None
+            )
+
+    started = time.perf_counter()
+    sockets = await asyncio.gather(*(
+        asyncio.gather(connect(order_id, client_token), connect(order_id, master_token))
+        for order_id, client_token, master_token in rooms
+    ))
+    connections = 2 * len(sockets)
+    print(f"Открыто {connections} соединений за {time.perf_counter() - started:.1f} с")
+    await asyncio.sleep(1)
+    if rss_before is not None:
+        rss_after = rss_kb(args.server_pid)
+        print(f"RSS сервера: {rss_before} → {rss_after} КБ, "
+              f"{(rss_after - rss_before) / connections:.1f} КБ на соединение")
+
+    latencies = []
+
+    async def receive(ws, expected: int):
+        got = 0
+        while got < expected:
+            event = json.loads(await ws.recv())
+            if event["type"] == "message":
+                sent_at = float(event["data"]["message"].split()[1])
+                latencies.append(time.perf_counter() - sent_at)
+                got += 1
+
+    async def send(ws):
+        for i in range(args.messages):
+            await ws.send(json.dumps({"type": "message", "message": f"bench {time.perf_counter()} {i}"}))
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(send(client_ws) for client_ws, _ in sockets),
+        *(receive(master_ws, args.messages) for _, master_ws in sockets),
+    )
+    elapsed = time.perf_counter() - started
+
+    total = args.messages * len(sockets)
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f"{total} сообщений за {elapsed:.1f} с: {total / elapsed:.0f} сообщений/с")
+    print(f"Задержка доставки: p50 {quantiles[49] * 1000:.1f} мс, p99 {quantiles[98] * 1000:.1f} мс")
+
+    await asyncio.gather(*(ws.close() for pair in sockets for ws in pair))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+# benchmarks/db_concurrency.py
+"""
+Сравнение пропускной способности одного воркера: синхронная Session
+внутри async-хендлера против AsyncSession.
+
+Каждый запрос выполняет "медленный" SQL (pg_sleep), как долгий запрос в БД.
+С синхронной сессией запросы выстраиваются в очередь на event loop,
+с асинхронной — выполняются параллельно (в пределах пула соединений).
+
+Запуск (нужен PostgreSQL в DATABASE_URL):
+    python -m benchmarks.db_concurrency --requests 200 --concurrency 50 --delay 0.05
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from db.database import get_db, get_async_db
+
+SLOW_QUERY = text("SELECT pg_sleep(:delay)")
+
+
+def build_app(delay: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/sync")
+    async def sync_endpoint(db: Session = Depends(get_db)):
+        db.execute(SLOW_QUERY, {"delay": delay})
+        return {"ok": True}
+
+    @app.get("/async")
+    async def async_endpoint(db: AsyncSession = Depends(get_async_db)):
+        await db.execute(SLOW_QUERY, {"delay": delay})
+        return {"ok": True}
+
+    return app
+
+
+async def run(app: FastAPI, path: str, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                response = await client.get(path)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return time.perf_counter() - started
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.05, help="длительность запроса в БД, сек")
+    args = parser.parse_args()
+
+    app = build_app(args.delay)
+    for label, path in (("sync Session", "/sync"), ("AsyncSession", "/async")):
+        elapsed = await run(app, path, args.requests, args.concurrency)
+        print(f"{label:<14} {args.requests} запросов за {elapsed:.2f} c -> {args.requests / elapsed:.1f} req/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
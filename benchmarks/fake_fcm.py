@@ -0,0 +1,79 @@
+# benchmarks/fake_fcm.py
+"""
+Локальный фейковый FCM v1 для офлайн-бенчмарков push-диспетчера.
+
+POST /v1/projects/{project}/messages:send отвечает как FCM после
+--latency-ms миллисекунд. Ответ зависит от префикса токена:
+  unreg-...  → 404 UNREGISTERED (токен надо удалить);
+  flaky-...  → 503 UNAVAILABLE на первую попытку, дальше успех;
+  остальные  → 200.
+GET /stats — сколько запросов и каких ответов было.
+
+Отдельно:  python -m benchmarks.fake_fcm --port 9099
+Сервис:    FCM_ENDPOINT=http://127.0.0.1:9099/v1/projects/{0}/messages:send
+"""
+import argparse
+import asyncio
+import threading
+import time
+from collections import Counter
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI()
+app.state.latency = 0.02
+stats: Counter = Counter()
+attempts: Counter = Counter()
+
+
+def _fcm_error(status: int, status_text: str, error_code: str) -> JSONResponse:
+    return JSONResponse(status_code=status, content={"error": {
+        "code": status,
+        "message": error_code,
+        "status": status_text,
+        "details": [{
+            "@type": "type.googleapis.com/google.firebase.fcm.v1.FcmError",
+            "errorCode": error_code,
+        }],
+    }})
+
+
+@app.post("/v1/projects/{project}/messages:send")
+async def send(project: str, request: Request):
+    token = (await request.json())["message"].get("token", "")
+    await asyncio.sleep(app.state.latency)
+    attempts[token] += 1
+    if token.startswith("unreg-"):
+        stats["unregistered"] += 1
+        return _fcm_error(404, "NOT_FOUND", "UNREGISTERED")
+    if token.startswith("flaky-") and attempts[token] == 1:
+        stats["unavailable"] += 1
+        return _fcm_error(503, "UNAVAILABLE", "UNAVAILABLE")
+    stats["ok"] += 1
+    return {"name": f"projects/{project}/messages/{time.time_ns()}"}
+
+
+@app.get("/stats")
+async def get_stats():
+    return dict(stats)
+
+
+def run_in_thread(port: int, latency: float) -> uvicorn.Server:
+    """Запускает сервер в фоновом потоке (для бенчмарка в одном процессе)."""
+    app.state.latency = latency
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=9099)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    args = parser.parse_args()
+    app.state.latency = args.latency_ms / 1000
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
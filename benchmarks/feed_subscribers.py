@@ -0,0 +1,170 @@
+# benchmarks/feed_subscribers.py
+"""
+Нагрузочный тест ленты мастеров: тысячи простаивающих подписчиков.
+
+Открывает N подписок (/feed/ws или /feed/sse) одного города и категории,
+затем клиент создаёт заказы через POST /orders, а скрипт меряет, за
+сколько событие доходит до подписчиков (p50/p99 и до последнего).
+С --server-pid дополнительно показывает RSS сервера на одно соединение.
+
+Скрипт пишет пользователей напрямую в DATABASE_URL сервера и подписывает
+токены тем же SECRET_KEY. Пример (ulimit -n должен быть больше N):
+    uvicorn main:app --port 8000 &
+    python -m benchmarks.feed_subscribers --subscribers 5000 --server-pid $!
+Для нескольких воркеров: PUBSUB_BACKEND=postgres uvicorn main:app --workers 4
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+import websockets
+
+from core.dependencies import create_access_token
+from db.database import SessionLocal
+from models import (  # noqa: F401 — все модели нужны для настройки мапперов
+    user, payment, order, rating, request,
+    category, chat, sms_code, notification, work_photo
+)
+from models.category import Category
+from models.user import User
+
+CITY = "bench-feed"
+
+
+def setup() -> tuple:
+    db = SessionLocal()
+    try:
+        suffix = time.time_ns()
+        category = Category(name=f"bench-feed-{suffix}")
+        db.add(category)
+        db.flush()
+        client = User(phone_number=f"bench-fc-{suffix}", password="x", user_type="client", is_verified=True)
+        master = User(phone_number=f"bench-fm-{suffix}", password="x", user_type="master", is_verified=True,
+                      city=CITY, category_id=category.id)
+        db.add_all([client, master])
+        db.commit()
+        return category.id, client.id, master.id
+    finally:
+        db.close()
+
+
+def rss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+class Subscribers:
+    def __init__(self):
+        self.connected = 0
+        self.received = {}  # description -> [время получения]
+
+    def record(self, text: str) -> None:
+        message = json.loads(text)
+        if message.get("type") == "order":
+            self.received.setdefault(message["data"]["description"], []).append(time.perf_counter())
+
+
+async def subscribe_ws(url: str, token: str, state: Subscribers, ready: asyncio.Event):
+    async with websockets.connect(f"{url}/feed/ws?token={token}", ping_interval=None, max_queue=None) as ws:
+        state.connected += 1
+        ready.set()
+        async for text in ws:
+            state.record(text)
+
+
+async def subscribe_sse(client: httpx.AsyncClient, token: str, state: Subscribers, ready: asyncio.Event):
+    async with client.stream("GET", "/feed/sse", params={"token": token}) as response:
+        state.connected += 1
+        ready.set()
+        async for line in response.aiter_lines():
+            if line.startswith("data: "):
+                state.record(line[6:])
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--subscribers", type=int, default=2000)
+    parser.add_argument("--transport", choices=("ws", "sse"), default="ws")
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.5, help="пауза между заказами, с")
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    parser.add_argument("--server-pid", type=int, help="PID uvicorn для замера RSS")
+    args = parser.parse_args()
+
+    category_id, client_id, master_id = setup()
+    master_token = create_access_token({"sub": str(master_id)})
+    client_headers = {"Authorization": "Bearer " + create_access_token({"sub": str(client_id)})}
+
+    state = Subscribers()
+    rss_before = rss_kb(args.server_pid) if args.server_pid else None
+    ws_url = args.base_url.replace("http", "ws", 1)
+    limits = httpx.Limits(max_connections=args.subscribers + 10, max_keepalive_connections=args.subscribers + 10)
+    sse_client = httpx.AsyncClient(base_url=args.base_url, timeout=None, limits=limits)
+
+    # Подключаемся порциями, чтобы не переполнить backlog accept()
+    gate = asyncio.Semaphore(args.connect_concurrency)
+
+    async def open_one():
+        ready = asyncio.Event()
+        async with gate:
+            if args.transport == "ws":
+                task = asyncio.create_task(subscribe_ws(ws_url, master_token, state, ready))
+            else:
+                task = asyncio.create_task(subscribe_sse(sse_client, master_token, state, ready))
+            await asyncio.wait([task, asyncio.create_task(ready.wait())], return_when=asyncio.FIRST_COMPLETED)
+        return task
+
+    started = time.perf_counter()
+    tasks = await asyncio.gather(*(open_one() for _ in range(args.subscribers)))
+    print(f"Подключено {state.connected}/{args.subscribers} ({args.transport}) "
+          f"за {time.perf_counter() - started:.1f} с")
+    await asyncio.sleep(1)
+    if rss_before is not None:
+        rss_after = rss_kb(args.server_pid)
+        print(f"RSS сервера: {rss_before} → {rss_after} КБ, "
+              f"{(rss_after - rss_before) / max(state.connected, 1):.1f} КБ на подписчика")
+
+    published = {}
+    async with httpx.AsyncClient(base_url=args.base_url, headers=client_headers) as api:
+        for i in range(args.events):
+            description = f"bench-{time.time_ns()}-{i}"
+            published[description] = time.perf_counter()
+            response = await api.post("/orders", json={
+                "category_id": category_id, "description": description, "city": CITY, "address": "bench",
+            })
+            response.raise_for_status()
+            await asyncio.sleep(args.interval)
+    await asyncio.sleep(2)
+
+    latencies, fanout, delivered = [], [], 0
+    for description, sent_at in published.items():
+        times = state.received.get(description, [])
+        delivered += len(times)
+        latencies.extend(t - sent_at for t in times)
+        if len(times) == state.connected:
+            fanout.append(max(times) - sent_at)
+
+    expected = len(published) * state.connected
+    print(f"Доставлено {delivered}/{expected} сообщений")
+    if latencies:
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(f"Задержка доставки: p50 {quantiles[49] * 1000:.1f} мс, p99 {quantiles[98] * 1000:.1f} мс")
+    if fanout:
+        print(f"До последнего подписчика: среднее {statistics.mean(fanout) * 1000:.1f} мс, "
+              f"макс. {max(fanout) * 1000:.1f} мс")
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await sse_client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
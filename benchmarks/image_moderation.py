@@ -0,0 +1,81 @@
+# benchmarks/image_moderation.py
+"""
+Пропускная способность локальной модерации фото (nudenet в пуле процессов).
+
+Генерирует --images разных JPEG --size x --size, затем для каждого
+числа процессов из --workers прогоняет их через ImageModerator пачками
+по --batch. Печатает фото/с и фото/с на ядро, отдельно — повторный
+прогон тех же фото (попадания в кэш по SHA-256).
+
+Нужен установленный nudenet (модель скачивается при первом запуске):
+    python -m benchmarks.image_moderation --images 200 --workers 1 2 4
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import tempfile
+import time
+
+from PIL import Image
+
+from services.image_moderation import ImageModerator
+
+
+def make_images(directory: str, count: int, size: int) -> list:
+    images = []
+    for i in range(count):
+        path = os.path.join(directory, f"{i}.jpg")
+        color = tuple(random.randrange(256) for _ in range(3))
+        image = Image.new("RGB", (size, size), color)
+        # Немного шума, чтобы у всех фото был разный хэш
+        image.putpixel((i % size, i // size % size), (255 - color[0], color[1], color[2]))
+        image.save(path, "JPEG", quality=85)
+        with open(path, "rb") as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+        images.append((sha256, path, f"/media/{i}.jpg"))
+    return images
+
+
+async def run(images: list, workers: int, batch: int) -> None:
+    moderator = ImageModerator(backend="local", workers=workers, batch_size=batch)
+    started = time.perf_counter()
+    await moderator.start()
+    warmup = time.perf_counter() - started
+    if moderator._pool is None:
+        raise SystemExit("Модель не загрузилась — установлен ли nudenet?")
+
+    started = time.perf_counter()
+    verdicts = await moderator.moderate_batch(images)
+    elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await moderator.moderate_batch(images)
+    cached = time.perf_counter() - started
+    await moderator.stop()
+
+    rate = len(images) / elapsed
+    print(
+        f"процессов={workers:<2} | загрузка модели {warmup:5.1f} с | {rate:7.1f} фото/с | "
+        f"{rate / workers:6.1f} фото/с на ядро | из кэша {len(images) / cached:9.0f} фото/с | "
+        f"отклонено {sum(verdicts)}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--batch", type=int, default=8, help="фото на один вызов в процесс")
+    parser.add_argument("--size", type=int, default=640)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        images = make_images(directory, args.images, args.size)
+        for workers in args.workers:
+            await run(images, workers, args.batch)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
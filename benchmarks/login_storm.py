@@ -0,0 +1,105 @@
+# benchmarks/login_storm.py
+"""
+Задержка "лёгких" эндпоинтов во время волны логинов.
+
+Два режима проверки пароля:
+  inline — bcrypt прямо в async-хендлере (как было раньше);
+  pool   — через core.passwords (ограниченный пул потоков).
+
+Пока идут логины, отдельный клиент каждые --interval секунд дёргает
+/ping и считает p50/p99 его задержки.
+
+Запуск:
+    python -m benchmarks.login_storm --logins 40 --concurrency 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from core.passwords import pwd_context, verify_password
+
+PASSWORD = "correct horse battery staple"
+
+
+def build_app(hashed: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/login/inline")
+    async def login_inline():
+        return {"ok": pwd_context.verify(PASSWORD, hashed)}
+
+    @app.post("/login/pool")
+    async def login_pool():
+        is_valid, _ = await verify_password(PASSWORD, hashed)
+        return {"ok": is_valid}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def storm(client: httpx.AsyncClient, path: str, logins: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await client.post(path)
+
+    await asyncio.gather(*(one() for _ in range(logins)))
+
+
+async def pings(client: httpx.AsyncClient, interval: float, stop: asyncio.Event):
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/ping")
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def run_mode(app: FastAPI, mode: str, args) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        stop = asyncio.Event()
+        ping_task = asyncio.create_task(pings(client, args.interval, stop))
+        started = time.perf_counter()
+        await storm(client, f"/login/{mode}", args.logins, args.concurrency)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        latencies = await ping_task
+
+    print(
+        f"{mode:<6} логинов: {args.logins} за {elapsed:.2f} c | "
+        f"/ping n={len(latencies)} p50={statistics.median(latencies):.1f} мс "
+        f"p99={percentile(latencies, 99):.1f} мс max={max(latencies):.1f} мс"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.005, help="пауза между /ping, сек")
+    args = parser.parse_args()
+
+    hashed = pwd_context.hash(PASSWORD)
+    app = build_app(hashed)
+    for mode in ("inline", "pool"):
+        await run_mode(app, mode, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+# benchmarks/notification_fanout.py
+"""
+Рассылка уведомления о новой заявке всем мастерам города и категории.
+
+  loop          — как было: SELECT мастеров в ORM, db.add(Notification) на каждого;
+  insert-select — один INSERT ... SELECT FROM users ... ON CONFLICT DO NOTHING
+                  (services.outbox.insert_master_notifications).
+
+Для каждого размера создаётся отдельный город с N подтверждёнными мастерами.
+
+Запуск (нужна база с актуальной схемой, лучше PostgreSQL):
+    python -m benchmarks.notification_fanout --masters 10 100 1000 10000 --rounds 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from db.database import ASYNC_DATABASE_URL
+from models import (  # noqa: F401 — все модели нужны для настройки мапперов
+    user, payment, order, rating, request,
+    category, chat, sms_code, notification, work_photo, outbox
+)
+from models.category import Category
+from models.notification import Notification
+from models.user import User
+from services.outbox import insert_master_notifications
+
+MESSAGE = "📥 Новая заявка: bench... (bench)"
+
+
+async def fanout_loop(db, key: str, city: str, category_id: int) -> int:
+    masters = (await db.scalars(select(User).where(
+        User.user_type == "master",
+        User.city == city,
+        User.category_id == category_id,
+        User.is_verified == True
+    ))).all()
+    for master in masters:
+        db.add(Notification(user_id=master.id, message=MESSAGE, delivery_key=f"{key}:{master.id}"))
+    await db.commit()
+    return len(masters)
+
+
+async def fanout_insert_select(db, key: str, city: str, category_id: int) -> int:
+    recipients = await insert_master_notifications(db, key, city, category_id, MESSAGE)
+    await db.commit()
+    return len(recipients)
+
+
+async def setup(sessionmaker, masters: int):
+    async with sessionmaker() as db:
+        suffix = time.time_ns()
+        category = Category(name=f"bench-fanout-{suffix}")
+        db.add(category)
+        await db.flush()
+        city = f"bench-{suffix}"
+        await db.execute(insert(User), [
+            {"phone_number": f"bench-fm-{suffix}-{i}", "password": "x", "user_type": "master",
+             "city": city, "category_id": category.id, "is_verified": True}
+            for i in range(masters)
+        ])
+        await db.commit()
+        return city, category.id
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--masters", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_async_engine(ASYNC_DATABASE_URL)
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+
+    print(f"{'мастеров':>9} | {'loop, мс':>10} | {'insert-select, мс':>18} | ускорение")
+    for masters in args.masters:
+        city, category_id = await setup(sessionmaker, masters)
+        timings = {}
+        for label, fanout in (("loop", fanout_loop), ("insert-select", fanout_insert_select)):
+            samples = []
+            for round_ in range(args.rounds):
+                # Свой ключ на раунд — каждый раз вставляются все N строк
+                key = f"bench:{label}:{city}:{round_}"
+                async with sessionmaker() as db:
+                    started = time.perf_counter()
+                    inserted = await fanout(db, key, city, category_id)
+                    samples.append(time.perf_counter() - started)
+                assert inserted == masters, (label, inserted)
+            timings[label] = statistics.median(samples) * 1000
+        print(
+            f"{masters:>9} | {timings['loop']:>10.1f} | {timings['insert-select']:>18.1f} | "
+            f"x{timings['loop'] / timings['insert-select']:.1f}"
+        )
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+# benchmarks/order_claim_contention.py
+"""
+Сотни мастеров одновременно берут один и тот же заказ.
+
+  read-modify-write — как было: SELECT, проверка статуса в Python, UPDATE;
+  cas               — один UPDATE ... WHERE status = 'pending' RETURNING.
+
+Правильный результат — ровно один победитель на заказ.
+
+Запуск (нужна база с актуальной схемой, лучше PostgreSQL):
+    python -m benchmarks.order_claim_contention --claims 300 --rounds 5
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from db.database import ASYNC_DATABASE_URL
+from models import (  # noqa: F401 — все модели нужны для настройки мапперов
+    user, payment, order, rating, request,
+    category, chat, sms_code, notification, work_photo
+)
+from models.category import Category
+from models.order import Order
+from models.user import User
+
+
+async def claim_read_modify_write(sessionmaker, order_id: int, master_id: int) -> bool:
+    async with sessionmaker() as db:
+        order = await db.scalar(select(Order).where(Order.id == order_id))
+        if order.status != "pending":
+            return False
+        await asyncio.sleep(0)  # как await между чтением и записью в хендлере
+        order.status = "in_progress"
+        order.master_id = master_id
+        await db.commit()
+        return True
+
+
+async def claim_cas(sessionmaker, order_id: int, master_id: int) -> bool:
+    async with sessionmaker() as db:
+        result = await db.execute(
+            update(Order)
+            .where(Order.id == order_id, Order.status == "pending")
+            .values(status="in_progress", master_id=master_id)
+            .returning(Order.id)
+            .execution_options(synchronize_session=False)
+        )
+        claimed = result.first() is not None
+        await db.commit()
+        return claimed
+
+
+async def setup(sessionmaker):
+    async with sessionmaker() as db:
+        category = Category(name=f"bench-{time.time_ns()}")
+        client = User(phone_number=f"bench-c-{time.time_ns()}", password="x", user_type="client")
+        master = User(phone_number=f"bench-m-{time.time_ns()}", password="x", user_type="master")
+        db.add_all([category, client, master])
+        await db.commit()
+        return category.id, client.id, master.id
+
+
+async def new_order(sessionmaker, category_id: int, client_id: int) -> int:
+    async with sessionmaker() as db:
+        order = Order(client_id=client_id, category_id=category_id, description="bench",
+                      city="bench", address="bench", status="pending")
+        db.add(order)
+        await db.commit()
+        return order.id
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--claims", type=int, default=300, help="одновременных попыток на заказ")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--pool-size", type=int, default=50)
+    args = parser.parse_args()
+
+    engine = create_async_engine(ASYNC_DATABASE_URL, pool_size=args.pool_size, max_overflow=0)
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    category_id, client_id, master_id = await setup(sessionmaker)
+
+    for label, claim in (("read-modify-write", claim_read_modify_write), ("cas", claim_cas)):
+        winners_per_round = []
+        elapsed = 0.0
+        for _ in range(args.rounds):
+            order_id = await new_order(sessionmaker, category_id, client_id)
+            started = time.perf_counter()
+            results = await asyncio.gather(
+                *(claim(sessionmaker, order_id, master_id) for _ in range(args.claims))
+            )
+            elapsed += time.perf_counter() - started
+            winners_per_round.append(sum(results))
+
+        total = args.claims * args.rounds
+        print(
+            f"{label:<18} победителей по раундам: {winners_per_round} | "
+            f"{total / elapsed:.0f} попыток/с"
+        )
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+# benchmarks/profanity_matcher.py
+"""
+Задержка одной проверки текста на запрещённые слова.
+
+  loop    — как было: re.search(rf"\\b{слово}\\b") по каждому слову словаря;
+  matcher — services.moderation.ProfanityMatcher (один проход по тексту).
+
+Тексты — типичные описания заявок и отзывы разной длины, чистые и с
+запрещённым словом в конце (худший случай для цикла). Заодно проверяется,
+что оба способа находят одно и то же.
+
+    python -m benchmarks.profanity_matcher --calls 2000
+"""
+import argparse
+import re
+import statistics
+import time
+
+from services.moderation import BAD_WORDS, ProfanityMatcher
+
+REVIEW = (
+    "Мастер приехал вовремя, быстро нашёл причину протечки под раковиной и заменил "
+    "сифон. Всё аккуратно, после себя убрал, цену назвал заранее и не поднимал. "
+)
+REQUEST = (
+    "Нужно повесить три люстры и заменить пять розеток в квартире на третьем этаже, "
+    "проводка старая алюминиевая, желательно с проверкой щитка. Материалы есть. "
+)
+TEXTS = {
+    "короткий отзыв": REVIEW[:80],
+    "отзыв": REVIEW,
+    "заявка": REQUEST * 2,
+    "длинное описание": (REQUEST + REVIEW) * 6,
+}
+
+
+def legacy_contains(text: str) -> bool:
+    lower_text = text.lower()
+    for word in BAD_WORDS:
+        if re.search(rf"\b{re.escape(word)}\b", lower_text):
+            return True
+    return False
+
+
+def per_call_us(fn, text: str, calls: int) -> float:
+    samples = []
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(calls):
+            fn(text)
+        samples.append((time.perf_counter() - started) / calls * 1e6)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    matcher = ProfanityMatcher(BAD_WORDS)
+    cases = []
+    for name, text in TEXTS.items():
+        cases.append((f"{name}, чистый", text))
+        cases.append((f"{name}, с матом", text + " короче мастер урод"))
+
+    print(f"{'текст':<28} {'символов':>8} | {'loop, мкс':>10} | {'matcher, мкс':>12} | ускорение")
+    for name, text in cases:
+        assert legacy_contains(text) == matcher.contains(text), name
+        loop = per_call_us(legacy_contains, text, args.calls)
+        compiled = per_call_us(matcher.contains, text, args.calls)
+        print(f"{name:<28} {len(text):>8} | {loop:>10.1f} | {compiled:>12.1f} | x{loop / compiled:.0f}")
+
+    started = time.perf_counter()
+    ProfanityMatcher(BAD_WORDS)
+    print(f"Сборка словаря ({len(BAD_WORDS)} слов): {(time.perf_counter() - started) * 1000:.2f} мс")
+
+
+if __name__ == "__main__":
+    main()
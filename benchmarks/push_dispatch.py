@@ -0,0 +1,89 @@
+# benchmarks/push_dispatch.py
+"""
+Пропускная способность push-диспетчера против локального фейкового FCM.
+
+Поднимает benchmarks.fake_fcm в фоновом потоке, направляет на него
+firebase_admin (FCM_ENDPOINT) и ставит в очередь --pushes уведомлений
+заявками по --per-request мастеров. Доля токенов --unregistered
+получает UNREGISTERED, --flaky — 503 на первую попытку.
+
+Удаление токенов из БД подменено счётчиком, база не нужна:
+    python -m benchmarks.push_dispatch --pushes 20000 --concurrency 4
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pushes", type=int, default=20000)
+    parser.add_argument("--per-request", type=int, default=800, help="токенов на одну заявку")
+    parser.add_argument("--concurrency", type=int, default=4, help="одновременных пачек")
+    parser.add_argument("--unregistered", type=float, default=0.05)
+    parser.add_argument("--flaky", type=float, default=0.01)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--port", type=int, default=9099)
+    args = parser.parse_args()
+
+    os.environ["FCM_ENDPOINT"] = f"http://127.0.0.1:{args.port}/v1/projects/{{0}}/messages:send"
+    os.environ["PUSH_BACKOFF_SECONDS"] = "0.1"
+    os.environ.setdefault("DATABASE_URL", "sqlite://")  # БД не используется, но нужна для импорта
+
+    import firebase_admin
+    from firebase_admin import credentials
+    from google.auth.credentials import AnonymousCredentials
+
+    from benchmarks import fake_fcm
+    from services import push
+
+    class FakeCredential(credentials.Base):
+        def get_credential(self):
+            return AnonymousCredentials()
+
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(FakeCredential(), {"projectId": "bench"})
+    fake_fcm.run_in_thread(args.port, args.latency_ms / 1000)
+
+    pruned = []
+
+    async def collect(tokens):
+        pruned.extend(tokens)
+
+    dispatcher = push.PushDispatcher(on_unregistered=collect, concurrency=args.concurrency)
+    await dispatcher.start()
+
+    unreg_every = int(1 / args.unregistered) if args.unregistered else 0
+    flaky_every = int(1 / args.flaky) if args.flaky else 0
+
+    def token(i: int) -> str:
+        if unreg_every and i % unreg_every == 0:
+            return f"unreg-{i}"
+        if flaky_every and i % flaky_every == 1:
+            return f"flaky-{i}"
+        return f"ok-{i}"
+
+    started = time.perf_counter()
+    enqueue_time = 0.0
+    for offset in range(0, args.pushes, args.per_request):
+        tokens = [token(i) for i in range(offset, min(offset + args.per_request, args.pushes))]
+        t = time.perf_counter()
+        dispatcher.enqueue(tokens, "Новая заявка", "bench")
+        enqueue_time = max(enqueue_time, time.perf_counter() - t)
+    await dispatcher.drain()
+    elapsed = time.perf_counter() - started
+    await dispatcher.stop()
+
+    async with httpx.AsyncClient() as client:
+        stats = (await client.get(f"http://127.0.0.1:{args.port}/stats")).json()
+    print(f"{args.pushes} уведомлений за {elapsed:.2f} с: {args.pushes / elapsed:.0f} push/с "
+          f"(concurrency={args.concurrency}, латентность FCM {args.latency_ms:.0f} мс)")
+    print(f"Макс. время enqueue в хендлере: {enqueue_time * 1000:.2f} мс")
+    print(f"Фейковый FCM: {stats}; токенов на удаление: {len(pruned)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
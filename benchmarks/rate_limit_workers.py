@@ -0,0 +1,67 @@
+# benchmarks/rate_limit_workers.py
+"""
+Проверка, что лимит соблюдается суммарно для нескольких процессов,
+и замер пропускной способности хранилища.
+
+N процессов одновременно бьют в один ключ; при общем хранилище
+пропущено должно быть ровно --limit запросов, при memory:// — N * limit.
+
+Запуск:
+    python -m benchmarks.rate_limit_workers --storage-uri file:///tmp/ratelimit.db
+    python -m benchmarks.rate_limit_workers --storage-uri redis://localhost:6379/0
+
+Вместо настоящего Redis можно поднять локальную замену
+(pip install redis "fakeredis[lua]"):
+    python -c "from fakeredis import TcpFakeServer; TcpFakeServer(('127.0.0.1', 6379)).serve_forever()"
+"""
+import argparse
+import time
+import uuid
+from multiprocessing import Pool
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import STRATEGIES
+
+import core.rate_limit_storage  # noqa: F401 — регистрирует схему file://
+
+
+def worker(args):
+    storage_uri, strategy, limit_string, key, hits = args
+    limiter = STRATEGIES[strategy](storage_from_string(storage_uri))
+    item = parse(limit_string)
+    allowed = 0
+    started = time.perf_counter()
+    for _ in range(hits):
+        if limiter.hit(item, key):
+            allowed += 1
+    return allowed, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--storage-uri", default="file:///tmp/masterok-ratelimit-bench.db")
+    parser.add_argument("--strategy", default="sliding-window-counter")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--hits", type=int, default=2000, help="запросов на процесс")
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    key = f"bench-{uuid.uuid4()}"
+    limit_string = f"{args.limit}/hour"
+    jobs = [(args.storage_uri, args.strategy, limit_string, key, args.hits)] * args.workers
+
+    started = time.perf_counter()
+    with Pool(args.workers) as pool:
+        results = pool.map(worker, jobs)
+    elapsed = time.perf_counter() - started
+
+    allowed = sum(r[0] for r in results)
+    total = args.workers * args.hits
+    print(f"{args.storage_uri} [{args.strategy}] воркеров={args.workers}")
+    print(f"пропущено {allowed} из {total} (лимит {args.limit}) -> {'OK' if allowed == args.limit else 'ЛИМИТ НАРУШЕН'}")
+    print(f"{total / elapsed:.0f} проверок/с суммарно")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,14 @@
 import os
 from fastapi import Depends, HTTPException, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from db.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.database import get_async_db
 from jose import JWTError, jwt
 from typing import Optional
 from datetime import datetime, timedelta
 from models.user import User
+from core.principal_cache import principal_cache
 
 ALGORITHM = "HS256"
 security = HTTPBearer()
@@ -20,12 +22,19 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return jwt.encode(to_encode, os.getenv("SECRET_KEY"), algorithm=ALGORITHM)
 
 
-# Получение текущего пользователя по токену
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Security(security),
-    db: Session = Depends(get_db),
-) -> User:
-    token = credentials.credentials
+# Токен для WebSocket/SSE: браузерные WebSocket и EventSource не умеют
+# заголовки, поэтому разрешаем и ?token=
+def token_from_headers(headers, token: Optional[str] = None) -> str:
+    if token:
+        return token
+    scheme, _, credentials = headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and credentials:
+        return credentials
+    raise HTTPException(status_code=401, detail="Не передан токен")
+
+
+# Пользователь по JWT (для WebSocket/SSE, где нет Security-зависимости)
+async def get_user_by_token(token: str, db: AsyncSession) -> User:
     try:
         payload = jwt.decode(token, os.getenv("SECRET_KEY"), algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
@@ -34,12 +43,27 @@ async def get_current_user(
     except JWTError:
         raise HTTPException(status_code=401, detail="Неверный токен")
 
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    user_id = int(user_id)
+    cached = principal_cache.get(user_id)
+    if cached is not None:
+        # Подключаем копию из кэша к сессии запроса без SELECT
+        return await db.merge(cached, load=False)
+
+    user = await db.scalar(select(User).where(User.id == user_id))
     if user is None:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
+    principal_cache.set(user_id, user)
     return user
 
 
+# Получение текущего пользователя по токену
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    db: AsyncSession = Depends(get_async_db),
+) -> User:
+    return await get_user_by_token(credentials.credentials, db)
+
+
 # Проверка на администратора
 async def get_current_admin(current_user: User = Depends(get_current_user)):
     if current_user.user_type != "admin":
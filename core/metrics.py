@@ -0,0 +1,172 @@
+# core/metrics.py
+"""
+Метрики в формате Prometheus: HTTP, SQLAlchemy, внешние вызовы и задачи
+планировщика. Отдаются на /metrics.
+
+При нескольких воркерах uvicorn задайте PROMETHEUS_MULTIPROC_DIR
+(пустой каталог) — тогда /metrics суммирует значения всех процессов.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from fastapi import Request, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    REGISTRY,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# ---------- HTTP ----------
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Количество HTTP-запросов", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса", ["method", "route"]
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Запросы в обработке", ["method"], multiprocess_mode="livesum"
+)
+
+# ---------- База данных ----------
+DB_QUERIES = Counter("db_queries_total", "Количество SQL-запросов", ["engine"])
+DB_QUERY_ERRORS = Counter("db_query_errors_total", "SQL-запросы, завершившиеся ошибкой", ["engine"])
+DB_QUERY_TIME = Histogram(
+    "db_query_duration_seconds", "Время выполнения SQL-запроса", ["engine"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Ожидание соединения из пула", ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+
+# ---------- Внешние сервисы и планировщик ----------
+EXTERNAL_CALL_LATENCY = Histogram(
+    "external_call_duration_seconds", "Время вызова внешнего сервиса", ["service", "outcome"]
+)
+SCHEDULER_JOB_LATENCY = Histogram(
+    "scheduler_job_duration_seconds", "Время выполнения задачи планировщика", ["job"]
+)
+SCHEDULER_JOB_FAILURES = Counter(
+    "scheduler_job_failures_total", "Ошибки задач планировщика", ["job"]
+)
+
+# ---------- Push-уведомления (FCM) ----------
+PUSH_MESSAGES = Counter(
+    "push_messages_total", "Push-уведомления по исходу",
+    ["outcome"],  # sent, retried, unregistered, failed, dropped
+)
+PUSH_QUEUE_DEPTH = Gauge(
+    "push_queue_depth", "Пачек в очереди на отправку", multiprocess_mode="livesum"
+)
+
+# ---------- Модерация фото ----------
+IMAGE_MODERATION = Counter(
+    "image_moderation_total", "Проверки фото по результату",
+    ["result"],  # clean, flagged, cache_hit, error, skipped
+)
+MODERATION_SCAN_ITEMS = Counter(
+    "moderation_scan_items_total", "Объекты, перепроверенные фоновой модерацией",
+    ["source"],  # ratings, requests, profiles, work_photos
+)
+
+# ---------- Push-каналы (WebSocket / SSE) ----------
+PUBSUB_SUBSCRIBERS = Gauge(
+    "pubsub_subscribers", "Открытые подписки", ["kind"], multiprocess_mode="livesum"
+)
+PUBSUB_DELIVERED = Counter(
+    "pubsub_delivered_total", "Сообщений поставлено в очереди подписчиков", ["kind"]
+)
+PUBSUB_DROPPED = Counter(
+    "pubsub_dropped_total", "Сообщений выброшено из-за переполненной очереди", ["kind"]
+)
+
+
+@contextmanager
+def track_external_call(service: str):
+    """with track_external_call("fcm"): ... — время и исход вызова."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        EXTERNAL_CALL_LATENCY.labels(service, outcome).observe(time.perf_counter() - started)
+
+
+@contextmanager
+def track_job(job: str):
+    """Можно и как декоратор: @track_job("promote_masters")."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        SCHEDULER_JOB_LATENCY.labels(job).observe(time.perf_counter() - started)
+
+
+# ---------- Middleware и эндпоинт ----------
+async def track_requests(request: Request, call_next):
+    method = request.method
+    HTTP_IN_FLIGHT.labels(method).inc()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - started
+        HTTP_IN_FLIGHT.labels(method).dec()
+        # Шаблон пути (/orders/{order_id}), а не сам URL — иначе метки не ограничены
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        HTTP_REQUESTS.labels(method, route, str(status)).inc()
+        HTTP_LATENCY.labels(method, route).observe(elapsed)
+
+
+def metrics_response() -> Response:
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+# ---------- SQLAlchemy ----------
+def instrument_engine(engine: Engine, name: str) -> None:
+    """Счётчик и время запросов, ожидание соединения из пула."""
+
+    # Время старта — в контексте выполнения, а не в conn.info: у запроса с ошибкой
+    # after_cursor_execute не вызывается, и список на соединении из пула рос бы бесконечно
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start_time = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        DB_QUERIES.labels(name).inc()
+        DB_QUERY_TIME.labels(name).observe(time.perf_counter() - context._query_start_time)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        DB_QUERY_ERRORS.labels(name).inc()
+
+    # У пула нет события "до выдачи соединения", поэтому оборачиваем _do_get
+    pool = engine.pool
+    do_get = pool._do_get
+
+    def _timed_do_get():
+        started = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(name).observe(time.perf_counter() - started)
+
+    pool._do_get = _timed_do_get
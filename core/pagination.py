@@ -0,0 +1,104 @@
+# core/pagination.py
+"""
+Курсорная (keyset) пагинация по (created_at, id).
+
+Вместо OFFSET следующая страница начинается строго после последней
+строки предыдущей: WHERE (created_at, id) < (:created_at, :id) — это
+индексный диапазон, стоимость не растёт с номером страницы.
+
+    @router.get("/", response_model=Page[NotificationResponse])
+    async def get_notifications(page: PageParams = Depends(page_params), ...):
+        query = paginate(select(Notification).where(...), page, Notification.created_at, Notification.id)
+        rows = (await db.scalars(query)).all()
+        return make_page(rows, page, "created_at")
+"""
+import base64
+from datetime import datetime
+from typing import Generic, List, Optional, TypeVar
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy import and_, or_, tuple_
+
+T = TypeVar("T")
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+class PageParams:
+    def __init__(self, cursor: Optional[str], limit: int):
+        self.cursor = cursor
+        self.limit = limit
+
+
+def page_params(
+    cursor: Optional[str] = Query(None, description="next_cursor из предыдущего ответа"),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+) -> PageParams:
+    return PageParams(cursor, limit)
+
+
+def encode_cursor(sort_value: Optional[datetime], row_id: int) -> str:
+    raw = f"{sort_value.isoformat() if sort_value else ''}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_raw, _, id_raw = base64.urlsafe_b64decode(padded).decode().partition("|")
+        return (datetime.fromisoformat(sort_raw) if sort_raw else None), int(id_raw)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Неверный курсор")
+
+
+def paginate(query, page: PageParams, sort_column, id_column, descending: bool = True):
+    """
+    Добавляет к select()/Query условие курсора, сортировку и LIMIT.
+    sort_column=None — пагинация только по id (для таблиц без created_at).
+    Берём limit + 1 строку, чтобы понять, есть ли следующая страница.
+
+    NULL в sort_column считается больше любого значения (как в индексе
+    Postgres): при DESC такие строки идут первыми, при ASC — последними.
+    """
+    if page.cursor:
+        sort_value, row_id = decode_cursor(page.cursor)
+        query = query.where(_after_cursor(sort_column, id_column, sort_value, row_id, descending))
+
+    if sort_column is None:
+        order = [id_column.desc() if descending else id_column.asc()]
+    elif descending:
+        order = [sort_column.desc().nulls_first(), id_column.desc()]
+    else:
+        order = [sort_column.asc().nulls_last(), id_column.asc()]
+    return query.order_by(*order).limit(page.limit + 1)
+
+
+def _after_cursor(sort_column, id_column, sort_value, row_id: int, descending: bool):
+    if sort_column is None:
+        return id_column < row_id if descending else id_column > row_id
+    after_id = id_column < row_id if descending else id_column > row_id
+    if sort_value is None:
+        # Курсор внутри группы NULL: её остаток, а при DESC — затем все значения
+        null_rest = and_(sort_column.is_(None), after_id)
+        return or_(null_rest, sort_column.is_not(None)) if descending else null_rest
+    key, value = tuple_(sort_column, id_column), (sort_value, row_id)
+    if descending:
+        return key < value
+    return or_(key > value, sort_column.is_(None))
+
+
+def make_page(rows, page: PageParams, sort_attr: Optional[str] = "created_at", id_attr: str = "id") -> dict:
+    rows = list(rows)
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_attr) if sort_attr else None, getattr(last, id_attr))
+    return {"items": rows, "next_cursor": next_cursor}
@@ -0,0 +1,41 @@
+# core/passwords.py
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+# Стоимость bcrypt (2^rounds итераций). При изменении старые хэши
+# прозрачно пересчитываются при следующем успешном входе.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# Сколько хэширований bcrypt может идти одновременно
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+# bcrypt отпускает GIL, поэтому потоков достаточно: event loop остаётся свободным
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, pwd_context.hash, password)
+
+
+async def verify_password(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """Возвращает (пароль верен, новый хэш или None, если пересчёт не нужен)."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, pwd_context.verify_and_update, password, hashed)
+
+
+def hash_password_sync(password: str) -> str:
+    """Для синхронных хэндлеров: тот же ограниченный пул, ждём результат."""
+    return _executor.submit(pwd_context.hash, password).result()
@@ -0,0 +1,89 @@
+# core/principal_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from models.user import User
+
+
+class PrincipalCache:
+    """
+    Ограниченный LRU-кэш с TTL для пользователей, авторизованных по JWT.
+
+    Хранит отсоединённые (detached) копии User: в сессию запроса они
+    возвращаются через merge(load=False), без SELECT. Кэш локален для
+    воркера, поэтому TTL ограничивает устаревание между процессами.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[int, tuple[float, User]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: int) -> Optional[User]:
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                del self._data[user_id]
+                self.misses += 1
+                return None
+            self._data.move_to_end(user_id)
+            self.hits += 1
+            return user
+
+    def set(self, user_id: int, user: User) -> None:
+        copy = _detached_copy(user)
+        with self._lock:
+            self._data[user_id] = (time.monotonic() + self.ttl, copy)
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+def _detached_copy(user: User) -> User:
+    """Копия только с колонками, не привязанная ни к одной сессии."""
+    values = {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+    copy = User(**values)
+    make_transient_to_detached(copy)
+    return copy
+
+
+principal_cache = PrincipalCache(
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL", "60")),
+)
@@ -0,0 +1,203 @@
+# core/pubsub.py
+"""
+Pub/sub хаб для push-каналов (WebSocket / SSE).
+
+Подписки живут в памяти воркера: topic -> набор Subscription, у каждой
+своя ограниченная очередь. Сообщение сериализуется в JSON один раз и
+одной и той же строкой раскладывается по очередям всех подписчиков.
+
+PUBSUB_BACKEND=local    — доставка только внутри процесса (один воркер);
+PUBSUB_BACKEND=postgres — publish() делает NOTIFY, каждый воркер
+                          (включая отправителя) получает его через LISTEN
+                          и раздаёт своим подписчикам.
+
+    sub = hub.subscribe(feed_topic(city, category_id))
+    try:
+        while True:
+            text = await sub.get()
+            ...
+    finally:
+        hub.unsubscribe(sub)
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, Optional, Set
+
+from core.metrics import PUBSUB_DELIVERED, PUBSUB_DROPPED, PUBSUB_SUBSCRIBERS
+from db.database import ASYNC_DATABASE_URL
+
+logger = logging.getLogger("pubsub")
+
+PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "local")
+PUBSUB_CHANNEL = os.getenv("PUBSUB_CHANNEL", "masterok_events")
+PUBSUB_QUEUE_SIZE = int(os.getenv("PUBSUB_QUEUE_SIZE", "100"))
+
+# Payload NOTIFY ограничен 8000 байтами
+NOTIFY_MAX_BYTES = 7900
+RECONNECT_DELAY = 5
+
+
+def _kind(topic: str) -> str:
+    return topic.split(":", 1)[0]
+
+
+class Subscription:
+    """
+    Очередь одного подписчика. Публикацию никогда не блокирует; при
+    переполнении drop_oldest=True выбрасывает самое старое сообщение,
+    drop_oldest=False закрывает подписку (get() вернёт None) — для
+    каналов, где пропуск недопустим и клиент должен пересинхронизироваться.
+    """
+
+    def __init__(self, topic: str, maxsize: int, drop_oldest: bool = True):
+        self.topic = topic
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.drop_oldest = drop_oldest
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, text: str) -> None:
+        if self.closed:
+            return
+        if self.queue.full():
+            PUBSUB_DROPPED.labels(_kind(self.topic)).inc()
+            self.dropped += 1
+            if not self.drop_oldest:
+                self._close()
+                return
+            self.queue.get_nowait()
+        self.queue.put_nowait(text)
+
+    def _close(self) -> None:
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def get(self) -> Optional[str]:
+        return await self.queue.get()
+
+
+class PubSub:
+    def __init__(self, backend: str = PUBSUB_BACKEND, channel: str = PUBSUB_CHANNEL):
+        self.backend = backend
+        self.channel = channel
+        self._topics: Dict[str, Set[Subscription]] = {}
+        self._listener = None   # asyncpg-соединение с LISTEN
+        self._publisher = None  # отдельное соединение для NOTIFY
+        self._publish_lock = asyncio.Lock()
+        self._watchdog: Optional[asyncio.Task] = None
+
+    # ---------- подписки ----------
+    def subscribe(self, topic: str, maxsize: int = PUBSUB_QUEUE_SIZE, drop_oldest: bool = True) -> Subscription:
+        subscription = Subscription(topic, maxsize, drop_oldest)
+        self._topics.setdefault(topic, set()).add(subscription)
+        PUBSUB_SUBSCRIBERS.labels(_kind(topic)).inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._topics.get(subscription.topic)
+        if subscribers is None or subscription not in subscribers:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._topics[subscription.topic]
+        PUBSUB_SUBSCRIBERS.labels(_kind(subscription.topic)).dec()
+
+    def subscriber_count(self, topic: Optional[str] = None) -> int:
+        if topic is not None:
+            return len(self._topics.get(topic, ()))
+        return sum(len(subscribers) for subscribers in self._topics.values())
+
+    # ---------- доставка ----------
+    def deliver(self, topic: str, text: str) -> int:
+        """Кладёт готовую JSON-строку в очереди локальных подписчиков."""
+        subscribers = self._topics.get(topic)
+        if not subscribers:
+            return 0
+        for subscription in tuple(subscribers):
+            subscription.put(text)
+        PUBSUB_DELIVERED.labels(_kind(topic)).inc(len(subscribers))
+        return len(subscribers)
+
+    async def publish(self, topic: str, message: dict) -> None:
+        text = json.dumps(message, ensure_ascii=False, default=str)
+        if self._publisher is None:
+            self.deliver(topic, text)
+            return
+
+        payload = json.dumps({"topic": topic, "text": text}, ensure_ascii=False)
+        if len(payload.encode()) > NOTIFY_MAX_BYTES:
+            logger.warning("Сообщение для %s больше лимита NOTIFY — только локальная доставка", topic)
+            self.deliver(topic, text)
+            return
+        try:
+            async with self._publish_lock:  # одно asyncpg-соединение — один запрос за раз
+                await self._publisher.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+        except Exception:
+            logger.exception("NOTIFY не отправлен — только локальная доставка")
+            self.deliver(topic, text)
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        try:
+            envelope = json.loads(payload)
+            self.deliver(envelope["topic"], envelope["text"])
+        except (ValueError, KeyError):
+            logger.warning("Некорректное сообщение в канале %s", channel)
+
+    # ---------- жизненный цикл ----------
+    async def start(self) -> None:
+        if self.backend != "postgres":
+            return
+        await self._connect()
+        self._watchdog = asyncio.create_task(self._reconnect_loop())
+
+    async def stop(self) -> None:
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+            self._watchdog = None
+        await self._close()
+
+    async def _connect(self) -> None:
+        import asyncpg
+
+        dsn = ASYNC_DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1)
+        self._listener = await asyncpg.connect(dsn)
+        await self._listener.add_listener(self.channel, self._on_notify)
+        self._publisher = await asyncpg.connect(dsn)
+        logger.info("LISTEN %s", self.channel)
+
+    async def _close(self) -> None:
+        for connection in (self._listener, self._publisher):
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        self._listener = self._publisher = None
+
+    async def _reconnect_loop(self) -> None:
+        """Пока соединения нет, сообщения доставляются только локально."""
+        while True:
+            await asyncio.sleep(RECONNECT_DELAY)
+            if all(c is not None and not c.is_closed() for c in (self._listener, self._publisher)):
+                continue
+            logger.warning("Соединение LISTEN/NOTIFY потеряно, переподключаемся")
+            try:
+                await self._close()
+                await self._connect()
+            except Exception:
+                logger.exception("Не удалось переподключиться к PostgreSQL")
+
+
+async def forward_to_websocket(websocket, subscription: Subscription) -> None:
+    """Отправляет сообщения подписки в сокет, пока подписка не закрыта."""
+    while True:
+        text = await subscription.get()
+        if text is None:
+            # Клиент не успевает читать — отключаем, он пересинхронизируется по HTTP
+            await websocket.close(code=1013, reason="Slow consumer")
+            return
+        await websocket.send_text(text)
+
+
+hub = PubSub()
@@ -0,0 +1,121 @@
+# core/query_budget.py
+"""
+Детектор N+1 и бюджет SQL-запросов на запрос (для разработки и тестов).
+
+Включается через QUERY_DEBUG=1:
+  * каждый HTTP-запрос считает свои SQL-запросы через события движка;
+  * одинаковые по форме запросы, повторённые QUERY_REPEAT_THRESHOLD раз,
+    пишутся в лог как вероятный N+1;
+  * ответ получает заголовок X-Query-Count;
+  * если у эндпоинта задан @query_budget(n) (или QUERY_BUDGET_DEFAULT)
+    и он превышен — предупреждение, а при QUERY_BUDGET_STRICT=1
+    исключение QueryBudgetExceeded (тест падает).
+
+Для кода вне HTTP (задачи планировщика) есть count_queries():
+    with count_queries(budget=3) as stats:
+        promote_masters_job()
+"""
+import logging
+import os
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("query_budget")
+
+QUERY_DEBUG = os.getenv("QUERY_DEBUG") == "1"
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT") == "1"
+QUERY_BUDGET_DEFAULT = int(os.getenv("QUERY_BUDGET_DEFAULT", "0")) or None
+QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", "3"))
+
+_PLACEHOLDERS = re.compile(r"\((?:\s*(?:\?|%s|\$\d+|:\w+)\s*,?)+\)")
+_SPACES = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str) -> None:
+        self.count += 1
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int = QUERY_REPEAT_THRESHOLD):
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def statement_shape(statement: str) -> str:
+    """Нормализует SQL: списки параметров IN (...) и пробелы."""
+    shape = _SPACES.sub(" ", statement).strip()
+    return _PLACEHOLDERS.sub("(...)", shape)
+
+
+def query_budget(max_queries: int):
+    """Декоратор эндпоинта: не больше max_queries SQL-запросов за запрос."""
+    def decorator(fn):
+        fn.__query_budget__ = max_queries
+        return fn
+    return decorator
+
+
+def install_query_counter(engine: Engine) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.record(statement)
+
+
+def _check(stats: QueryStats, budget: Optional[int], where: str) -> None:
+    for shape, n in stats.repeated():
+        logger.warning("Возможный N+1 в %s: %d× %s", where, n, shape)
+    if budget is not None and stats.count > budget:
+        message = f"{where}: {stats.count} SQL-запросов при бюджете {budget}"
+        if QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+@contextmanager
+def count_queries(budget: Optional[int] = None, where: str = "block"):
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+    _check(stats, budget, where)
+
+
+async def track_queries(request: Request, call_next):
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        response = await call_next(request)
+    finally:
+        _current_stats.reset(token)
+
+    route = request.scope.get("route")
+    endpoint = getattr(route, "endpoint", None)
+    budget = getattr(endpoint, "__query_budget__", QUERY_BUDGET_DEFAULT)
+    _check(stats, budget, f"{request.method} {getattr(route, 'path', request.url.path)}")
+
+    repeated = stats.repeated()
+    response.headers["X-Query-Count"] = str(stats.count)
+    if repeated:
+        response.headers["X-Query-Repeated"] = str(max(n for _, n in repeated))
+    return response
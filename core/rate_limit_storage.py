@@ -0,0 +1,153 @@
+# core/rate_limit_storage.py
+"""
+Файловое хранилище счётчиков для slowapi/limits, общее для всех
+воркеров uvicorn на одной машине (SQLite в режиме WAL).
+
+Регистрируется в limits по схеме file://, например:
+    RATE_LIMIT_STORAGE_URI=file:///var/tmp/masterok-ratelimit.db
+"""
+import sqlite3
+import threading
+import time
+from math import floor
+from urllib.parse import urlparse
+
+from limits.storage import Storage, SlidingWindowCounterSupport
+from limits.storage.base import TimestampedSlidingWindow
+
+# Раз в столько операций удаляем просроченные ключи
+_PURGE_EVERY = 1000
+
+
+class FileStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    STORAGE_SCHEME = ["file"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, timeout: float = 5.0, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.path = urlparse(uri).path or "ratelimit.db"
+        self._lock = threading.Lock()
+        self._ops = 0
+        # isolation_level=None: транзакциями управляем сами (BEGIN IMMEDIATE)
+        self._conn = sqlite3.connect(self.path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS counters ("
+            " key TEXT PRIMARY KEY,"
+            " value INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    # --- транзакции ---
+
+    def _transaction(self, fn):
+        """Выполняет fn(conn, now) под межпроцессной блокировкой записи."""
+        with self._lock:
+            now = time.time()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn, now)
+                self._ops += 1
+                if self._ops % _PURGE_EVERY == 0:
+                    self._conn.execute("DELETE FROM counters WHERE expires_at <= ?", (now,))
+                self._conn.execute("COMMIT")
+                return result
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _get(conn, key: str, now: float) -> int:
+        row = conn.execute(
+            "SELECT value FROM counters WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _incr(conn, key: str, expiry: float, amount: int, now: float) -> int:
+        # Просроченный ключ начинается заново, живой — только увеличивается
+        conn.execute(
+            "INSERT INTO counters (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET "
+            " value = CASE WHEN expires_at <= ? THEN excluded.value ELSE value + excluded.value END, "
+            " expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END",
+            (key, amount, now + expiry, now, now),
+        )
+        return conn.execute("SELECT value FROM counters WHERE key = ?", (key,)).fetchone()[0]
+
+    # --- Storage ---
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        return self._transaction(lambda conn, now: self._incr(conn, key, expiry, amount, now))
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            return self._get(self._conn, key, time.time())
+
+    def get_expiry(self, key: str) -> float:
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at FROM counters WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self) -> bool:
+        try:
+            with self._lock:
+                self._conn.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int:
+        def _reset(conn, now):
+            count = conn.execute("SELECT COUNT(*) FROM counters").fetchone()[0]
+            conn.execute("DELETE FROM counters")
+            return count
+        return self._transaction(_reset)
+
+    def clear(self, key: str) -> None:
+        self._transaction(lambda conn, now: conn.execute("DELETE FROM counters WHERE key = ?", (key,)))
+
+    # --- SlidingWindowCounterSupport ---
+
+    def _sliding_window_info(self, conn, key: str, expiry: int, now: float):
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        previous_count = self._get(conn, previous_key, now)
+        current_count = self._get(conn, current_key, now)
+        if previous_count == 0:
+            previous_ttl = 0.0
+        else:
+            previous_ttl = (1 - (((now - expiry) / expiry) % 1)) * expiry
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+
+        # Проверка и инкремент в одной транзакции — без гонок между воркерами
+        def _acquire(conn, now):
+            previous_count, previous_ttl, current_count, _ = self._sliding_window_info(conn, key, expiry, now)
+            weighted_count = previous_count * previous_ttl / expiry + current_count
+            if floor(weighted_count) + amount > limit:
+                return False
+            _, current_key = self.sliding_window_keys(key, expiry, now)
+            self._incr(conn, current_key, 2 * expiry, amount, now)
+            return True
+
+        return self._transaction(_acquire)
+
+    def get_sliding_window(self, key: str, expiry: int):
+        with self._lock:
+            return self._sliding_window_info(self._conn, key, expiry, time.time())
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        previous_key, current_key = self.sliding_window_keys(key, expiry, time.time())
+        self._transaction(
+            lambda conn, now: conn.execute(
+                "DELETE FROM counters WHERE key IN (?, ?)", (previous_key, current_key)
+            )
+        )
@@ -1,5 +1,39 @@
 # core/rate_limiter.py
+import os
+from dotenv import load_dotenv
+from fastapi import Request
+from jose import JWTError, jwt
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
-limiter = Limiter(key_func=get_remote_address)
+import core.rate_limit_storage  # noqa: F401 — регистрирует схему file://
+from core.dependencies import ALGORITHM
+
+load_dotenv()
+
+# memory:// — счётчики в процессе (каждый воркер считает сам);
+# file:///path/ratelimit.db — общие для всех воркеров на машине;
+# redis://host:6379/0 — общие для всех машин (нужен пакет redis).
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "memory://")
+RATE_LIMIT_STRATEGY = os.getenv("RATE_LIMIT_STRATEGY", "sliding-window-counter")
+
+
+def get_user_or_ip(request: Request) -> str:
+    """Ключ лимита: id пользователя из JWT, иначе IP-адрес."""
+    auth = request.headers.get("authorization", "")
+    scheme, _, token = auth.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            payload = jwt.decode(token, os.getenv("SECRET_KEY"), algorithms=[ALGORITHM])
+            if payload.get("sub"):
+                return f"user:{payload['sub']}"
+        except JWTError:
+            pass
+    return f"ip:{get_remote_address(request)}"
+
+
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    strategy=RATE_LIMIT_STRATEGY,
+)
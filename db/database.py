@@ -1,6 +1,8 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.dialects import postgresql, sqlite
 import os
 from dotenv import load_dotenv
 
@@ -9,11 +11,31 @@ load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 
+def _to_async_url(url: str) -> str:
+    """postgresql://... -> postgresql+asyncpg://... (для async-движка)."""
+    for sync_prefix, async_prefix in (
+        ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("postgres://", "postgresql+asyncpg://"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+    ):
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _to_async_url(DATABASE_URL)
 
 
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронный движок: запросы не блокируют event loop uvicorn
+async_engine = create_async_engine(ASYNC_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 
@@ -23,3 +45,33 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def upsert(dialect_name: str, model, values, index_elements: list, set_: dict):
+    """
+    INSERT ... ON CONFLICT (index_elements) DO UPDATE SET set_ — одним запросом.
+    В set_ колонка модели означает текущее значение строки: {"n": Model.n + 1}.
+    values — dict или список dict (многострочный upsert).
+        await db.execute(upsert(db.bind.dialect.name, Counter, {...}, ["user_id"], {...}))
+    """
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    return insert(model).values(values).on_conflict_do_update(
+        index_elements=index_elements, set_=set_
+    )
+
+
+def insert_ignore(dialect_name: str, model, rows: list, index_elements: list):
+    """Многострочный INSERT ... ON CONFLICT (index_elements) DO NOTHING."""
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    return insert(model).values(rows).on_conflict_do_nothing(index_elements=index_elements)
+
+
+def insert_from_select_ignore(dialect_name: str, model, names: list, select_stmt, index_elements: list):
+    """INSERT INTO model (names) SELECT ... ON CONFLICT (index_elements) DO NOTHING — одним запросом."""
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    return insert(model).from_select(names, select_stmt).on_conflict_do_nothing(index_elements=index_elements)
@@ -1,5 +1,5 @@
 from fastapi import FastAPI
-from db.database import Base, engine, SessionLocal
+from db.database import Base, engine, async_engine, SessionLocal
 from dotenv import load_dotenv
 import os
 from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -8,10 +8,19 @@ from fastapi.responses import JSONResponse
 from slowapi.errors import RateLimitExceeded
 from routes import sms_auth, chat, notifications, payments, password_reset, users, categories, orders, admin, ratings
 from fastapi.staticfiles import StaticFiles
-from routes import photos,  requests as request_routes
+from routes import photos,  requests as request_routes, feed
 from datetime import datetime
 from services.scheduler import start_scheduler
 from core.rate_limiter import limiter
+from core.metrics import track_requests, metrics_response, instrument_engine
+from core.query_budget import QUERY_DEBUG, track_queries, install_query_counter
+from core.pubsub import hub
+from services.push import push_dispatcher
+from services.outbox import OUTBOX_RELAY_IN_APP, outbox_relay
+from services.image_moderation import image_moderator
+from services.thumbnails import THUMB_DIR, DerivativeFiles
+from services.moderation import dictionary_watcher
+from services.moderation_scan import moderation_scanner
 
 
 
@@ -27,6 +36,17 @@ app = FastAPI()
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+# 📈 Метрики: HTTP, SQL-запросы и пул соединений
+app.middleware("http")(track_requests)
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+
+# 🐞 Dev: счётчик SQL-запросов на запрос и поиск N+1 (QUERY_DEBUG=1)
+if QUERY_DEBUG:
+    app.middleware("http")(track_queries)
+    install_query_counter(engine)
+    install_query_counter(async_engine.sync_engine)
+
 app.include_router(users.router)  #  Подключаем роутеры
 app.include_router(categories.router)
 app.include_router(orders.router)
@@ -39,6 +59,7 @@ app.include_router(chat.router),
 app.include_router(notifications.router)
 app.include_router(payments.router)
 app.include_router(password_reset.router)
+app.include_router(feed.router)
 
 from models.user import User  # если лежит отдельно
 from models.category import Category
@@ -48,12 +69,81 @@ from models.rating import Rating
 Base.metadata.create_all(bind=engine)
 
 app.mount("/media", StaticFiles(directory="media"), name="media")
+# 🖼 Уменьшенные копии: отсутствующая создаётся при первом запросе
+app.mount("/thumbs", DerivativeFiles(directory=THUMB_DIR), name="thumbs")
+
+
+# 📡 Push-каналы: LISTEN/NOTIFY для доставки между воркерами (PUBSUB_BACKEND=postgres)
+@app.on_event("startup")
+async def start_pubsub():
+    await hub.start()
+
+
+@app.on_event("shutdown")
+async def stop_pubsub():
+    await hub.stop()
+
+
+# 📲 Фоновая отправка push-уведомлений пачками
+@app.on_event("startup")
+async def start_push_dispatcher():
+    await push_dispatcher.start()
+
+
+@app.on_event("shutdown")
+async def stop_push_dispatcher():
+    await push_dispatcher.stop()
+
+
+# 📤 Relay outbox: уведомления и push из outbox_events (можно и отдельным процессом)
+@app.on_event("startup")
+async def start_outbox_relay():
+    if OUTBOX_RELAY_IN_APP:
+        outbox_relay.start()
+
+
+@app.on_event("shutdown")
+async def stop_outbox_relay():
+    await outbox_relay.stop()
+
+
+# 🛡 Словарь модерации: загрузка из БД и подмена при изменении
+@app.on_event("startup")
+async def start_dictionary_watcher():
+    await dictionary_watcher.start()
+
+
+@app.on_event("shutdown")
+async def stop_dictionary_watcher():
+    await dictionary_watcher.stop()
+
+
+# 🔁 Повторная модерация — прерывается до остановки пула модерации фото, точка сохраняется
+@app.on_event("shutdown")
+async def stop_moderation_scanner():
+    await moderation_scanner.stop()
+
+
+# 🖼 Модерация фото: пул процессов с моделью поднимается при старте
+@app.on_event("startup")
+async def start_image_moderator():
+    await image_moderator.start()
+
+
+@app.on_event("shutdown")
+async def stop_image_moderator():
+    await image_moderator.stop()
 
 
 @app.get("/")
 async def root():
     return {"message": "Добро пожаловать в API МастерОК!"}
 
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
+
 app.mount("/media", StaticFiles(directory="media"), name="media")
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.sql import func
 from db.database import Base
 from datetime import datetime
@@ -8,16 +8,38 @@ from typing import Optional
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        Index("ix_chat_messages_order_id_created_at", "order_id", "created_at"),
+        Index("ix_chat_messages_receiver_id_is_read", "receiver_id", "is_read"),
+        {"extend_existing": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
     sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     receiver_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     message = Column(Text, nullable=False)
-    is_read = Column(Boolean, default=False)
+    is_read = Column(Boolean, default=False)  # устарело: прочитанность хранится в ChatReadCursor
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+
+class ChatReadCursor(Base):
+    """Докуда участник прочитал чат заказа и сколько в нём непрочитанных."""
+    __tablename__ = "chat_read_cursors"
+
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    last_read_message_id = Column(Integer, nullable=False, default=0, server_default="0")
+    unread_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+class ChatUnreadCounter(Base):
+    """Сумма unread_count по всем чатам пользователя — для /chat/unread-count."""
+    __tablename__ = "chat_unread_counters"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    unread_count = Column(Integer, nullable=False, default=0, server_default="0")
+
 class ChatMessageCreate(BaseModel):
     order_id: int
     message: str
@@ -0,0 +1,107 @@
+from sqlalchemy import Column, Integer, Float, String, Text, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from db.database import Base
+from pydantic import BaseModel, Field, computed_field
+from datetime import datetime
+from typing import List, Optional
+
+
+class ModerationWord(Base):
+    """Словарь запрещённых слов (services/moderation.py)."""
+    __tablename__ = "moderation_words"
+
+    id = Column(Integer, primary_key=True)
+    word = Column(String, unique=True, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ModerationDictionary(Base):
+    """Одна строка (id=1): версия словаря, растёт при каждом изменении."""
+    __tablename__ = "moderation_dictionary"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+
+class ModerationScan(Base):
+    """Повторная проверка старого контента (services/moderation_scan.py); source + last_id — точка возобновления."""
+    __tablename__ = "moderation_scans"
+
+    id = Column(Integer, primary_key=True)
+    status = Column(String, nullable=False, default="running")  # running, paused, failed, done
+    dictionary_version = Column(Integer, nullable=False)
+    source = Column(String, nullable=True)  # ratings, requests, profiles, work_photos
+    last_id = Column(Integer, nullable=False, default=0, server_default="0")
+    processed = Column(Integer, nullable=False, default=0, server_default="0")
+    flagged = Column(Integer, nullable=False, default=0, server_default="0")
+    errors = Column(Integer, nullable=False, default=0, server_default="0")  # не проверены из-за ошибки
+    elapsed_seconds = Column(Float, nullable=False, default=0, server_default="0")  # без пауз
+    error = Column(Text, nullable=True)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class ModerationFlag(Base):
+    """Найденное проверкой нарушение; одна строка на (объект, kind), чистый при повторной проверке — удаляется."""
+    __tablename__ = "moderation_flags"
+    __table_args__ = (
+        UniqueConstraint("content_type", "content_id", "kind", name="uq_moderation_flags_content"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    content_type = Column(String, nullable=False)  # rating, request, profile, work_photo
+    content_id = Column(Integer, nullable=False)
+    kind = Column(String, nullable=False)  # text, photo
+    terms = Column(Text, nullable=True)  # найденные слова через запятую
+    scan_id = Column(Integer, ForeignKey("moderation_scans.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ModerationWordsUpdate(BaseModel):
+    add: List[str] = Field(default_factory=list)
+    remove: List[str] = Field(default_factory=list)
+
+
+class ModerationDictionaryResponse(BaseModel):
+    version: int
+    words: List[str]
+
+
+class ModerationScanResponse(BaseModel):
+    id: int
+    status: str
+    dictionary_version: int
+    source: Optional[str] = None
+    last_id: int
+    processed: int
+    flagged: int
+    errors: int
+    elapsed_seconds: float
+    error: Optional[str] = None
+    started_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+    @computed_field
+    @property
+    def items_per_second(self) -> Optional[float]:
+        if not self.elapsed_seconds:
+            return None
+        return round(self.processed / self.elapsed_seconds, 1)
+
+    class Config:
+        from_attributes = True
+
+
+class ModerationFlagResponse(BaseModel):
+    id: int
+    content_type: str
+    content_id: int
+    kind: str
+    terms: Optional[str] = None
+    scan_id: Optional[int] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index, text
 from sqlalchemy.sql import func
 from db.database import Base
 from pydantic import BaseModel
@@ -7,12 +7,27 @@ from datetime import datetime
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_user_id_created_at", "user_id", "created_at"),
+        Index("ix_notifications_delivery_key", "delivery_key", unique=True),
+        # Для очистки старых прочитанных (services/scheduler.compact_notifications)
+        Index("ix_notifications_read_created_at", "created_at", postgresql_where=text("is_read IS TRUE")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     message = Column(String, nullable=False)
     is_read = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    delivery_key = Column(String, nullable=True)  # идемпотентность доставки из outbox
+
+
+class NotificationUnreadCounter(Base):
+    """Число непрочитанных уведомлений — для /notifications/unread-count."""
+    __tablename__ = "notification_unread_counters"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    unread_count = Column(Integer, nullable=False, default=0, server_default="0")
 
 
 class NotificationResponse(BaseModel):
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey, DateTime, Enum
+from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey, DateTime, Enum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from db.database import Base
@@ -17,6 +17,11 @@ class OrderStatus(str, enum.Enum):
 # SQLAlchemy модель
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        Index("ix_orders_status_category_id_city", "status", "category_id", "city"),  # лента новых заказов
+        Index("ix_orders_master_id_status", "master_id", "status"),
+        Index("ix_orders_client_id", "client_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     client_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, JSON, Index, text
+from sqlalchemy.sql import func
+from db.database import Base
+
+
+class OutboxEvent(Base):
+    """
+    Событие для доставки (уведомления, push), записанное в той же
+    транзакции, что и бизнес-изменение. Доставляет relay из services/outbox.py.
+    """
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        # Очередь relay: только необработанные, по времени готовности
+        Index("ix_outbox_events_pending", "available_at", "id", postgresql_where=text("processed_at IS NULL")),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    event_type = Column(String, nullable=False)
+    key = Column(String, nullable=False)  # ключ бизнес-события, из него строятся ключи доставки
+    payload = Column(JSON, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    available_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    processed_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.sql import func
 from db.database import Base
 from pydantic import BaseModel, Field
@@ -9,6 +9,9 @@ from typing import Optional
 
 class Payment(Base):
     __tablename__ = "payments"
+    __table_args__ = (
+        Index("ix_payments_user_id_purpose_is_active_end_date", "user_id", "purpose", "is_active", "end_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
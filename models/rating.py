@@ -1,8 +1,8 @@
-from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from db.database import Base
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional
 
@@ -10,6 +10,9 @@ from typing import Optional
 # SQLAlchemy модель
 class Rating(Base):
     __tablename__ = "ratings"
+    __table_args__ = (
+        Index("ix_ratings_master_id", "master_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
@@ -27,7 +30,7 @@ class Rating(Base):
 # Pydantic схемы
 class RatingCreate(BaseModel):
     order_id: int
-    rating: int
+    rating: int = Field(..., ge=1, le=5)
     review_text: Optional[str] = None
 
 
@@ -1,15 +1,19 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from db.database import Base
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, computed_field
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
+from services.thumbnails import derivative_urls
 
 
 # SQLAlchemy модель заявки
 class ClientRequest(Base):
     __tablename__ = "client_requests"
+    __table_args__ = (
+        Index("ix_client_requests_client_id_created_at", "client_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     client_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -29,6 +33,20 @@ class ClientRequest(Base):
     payment = relationship("Payment", backref="client_request", lazy="joined")
 
 
+class RequestQuota(Base):
+    """
+    Лимит заявок клиента: бесплатные за текущий день (UTC) и оплаченные
+    extra_request, ещё не потраченные. Одна строка на клиента —
+    см. services/request_quota.py.
+    """
+    __tablename__ = "request_quotas"
+
+    client_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, nullable=False)
+    free_used = Column(Integer, nullable=False, default=0, server_default="0")
+    paid_credits = Column(Integer, nullable=False, default=0, server_default="0")
+
+
 # Pydantic модель создания заявки
 class RequestCreate(BaseModel):
     category_id: int
@@ -52,5 +70,10 @@ class RequestResponse(BaseModel):
     phone_number: str
     created_at: datetime
 
+    @computed_field
+    @property
+    def photo_thumbnails(self) -> Optional[Dict[int, Dict[str, str]]]:
+        return derivative_urls(self.photo_url)
+
     class Config:
         from_attributes = True
@@ -1,6 +1,6 @@
 # sms_code.py
 
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index
 from sqlalchemy.sql import func
 from db.database import Base
 from pydantic import BaseModel
@@ -8,6 +8,9 @@ from datetime import datetime
 
 class SMSCode(Base):
     __tablename__ = "verification_codes"
+    __table_args__ = (
+        Index("ix_verification_codes_phone_number_created_at", "phone_number", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     phone_number = Column(String, nullable=False)
@@ -3,9 +3,10 @@ from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from db.database import Base
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, computed_field
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
+from services.thumbnails import derivative_urls
 
 
 # SQLAlchemy модель для таблицы users
@@ -27,6 +28,14 @@ class User(Base):
     city = Column(String, nullable=True)
 
     reputation = Column(Float, default=0)
+    # ⭐ Агрегаты отзывов (services/reputation.py): reputation = rating_sum / rating_count
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_1 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_2 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_3 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_4 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_5 = Column(Integer, nullable=False, default=0, server_default="0")
     registration_date = Column(DateTime(timezone=True), server_default=func.now())
     device_token = Column(String, nullable=True)
 
@@ -92,6 +101,11 @@ class UserDetailAdminResponse(BaseModel):
     category_id: Optional[int] = None
     city: Optional[str] = None
 
+    @computed_field
+    @property
+    def photo_thumbnails(self) -> Optional[Dict[int, Dict[str, str]]]:
+        return derivative_urls(self.photo_url)
+
     class Config:
         from_attributes = True
 
@@ -107,8 +121,25 @@ class UserResponse(BaseModel):
     city: Optional[str] = None
     is_verified: bool
     reputation: float
+    rating_count: int = 0
+    rating_1: int = Field(0, exclude=True)
+    rating_2: int = Field(0, exclude=True)
+    rating_3: int = Field(0, exclude=True)
+    rating_4: int = Field(0, exclude=True)
+    rating_5: int = Field(0, exclude=True)
     registration_date: datetime
     device_token: Optional[str]
 
+    @computed_field
+    @property
+    def photo_thumbnails(self) -> Optional[Dict[int, Dict[str, str]]]:
+        return derivative_urls(self.photo_url)
+
+    @computed_field
+    @property
+    def rating_histogram(self) -> Dict[int, int]:
+        """{1: n, ..., 5: n} — сколько отзывов с каждой оценкой."""
+        return {stars: getattr(self, f"rating_{stars}") for stars in range(1, 6)}
+
     class Config:
         from_attributes = True
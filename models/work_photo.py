@@ -1,7 +1,10 @@
 from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
 from sqlalchemy.sql import func
 from db.database import Base
-from pydantic import BaseModel
+from pydantic import BaseModel, computed_field
+from datetime import datetime
+from typing import Dict, Optional
+from services.thumbnails import derivative_urls
 
 class WorkPhoto(Base):
     __tablename__ = "work_photos"
@@ -15,6 +18,11 @@ class WorkPhoto(Base):
 class PhotoResponse(BaseModel):
     id: int
     image_path: str
-    uploaded_at: str
+    uploaded_at: datetime
+
+    @computed_field
+    @property
+    def thumbnails(self) -> Optional[Dict[int, Dict[str, str]]]:
+        return derivative_urls(self.image_path)
 
     model_config = {"from_attributes": True}
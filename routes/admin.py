@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func
-from typing import List
+from sqlalchemy import func, select, update
+from typing import List, Optional
 from sqlalchemy.orm import Session
 from db.database import get_db
 from core.dependencies import get_current_admin
+from core.principal_cache import principal_cache
+from core.query_budget import query_budget
+from core.pagination import Page, PageParams, page_params, paginate, make_page
 from models.user import User, UserAdminResponse, UserDetailAdminResponse
 from models.order import Order, OrderAdminResponse
 from models.category import Category, CategoryResponse, CategoryUpdate
@@ -11,9 +14,19 @@ from models.rating import Rating, AllRatingResponse
 from models.payment import Payment
 from models.request import ClientRequest
 from models.ad import Ad
+from models.moderation import (
+    ModerationDictionary, ModerationDictionaryResponse, ModerationWord, ModerationWordsUpdate,
+    ModerationFlag, ModerationFlagResponse, ModerationScan, ModerationScanResponse
+)
+from db.database import insert_ignore
+from core.pubsub import hub
 from fastapi.responses import StreamingResponse
 from io import BytesIO
 from services.pdf_report import generate_pdf_report
+from services.moderation import DICTIONARY_TOPIC, install_dictionary, normalize_word, reload_dictionary
+from services.moderation_scan import moderation_scanner
+from services.reputation import apply_rating
+from services.unread_counters import drop_order_cursors
 
 
 
@@ -24,13 +37,15 @@ router = APIRouter(
 )
 
 # ---------- Пользователи ----------
-@router.get("/users", response_model=List[UserAdminResponse])
+@router.get("/users", response_model=Page[UserAdminResponse])
+@query_budget(2)  # пользователь + список
 async def get_all_users(
+    page: PageParams = Depends(page_params),
     current_admin_id: int = Depends(get_current_admin),
     db: Session = Depends(get_db),
 ):
-    users = db.query(User).all()
-    return [UserAdminResponse.from_orm(user) for user in users]
+    users = paginate(db.query(User), page, User.registration_date, User.id).all()
+    return make_page(users, page, "registration_date")
 
 
 @router.get("/users/{user_id}", response_model=UserDetailAdminResponse)
@@ -54,8 +69,11 @@ async def delete_user(
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
+    # Курсоры и счётчики непрочитанного самого пользователя удаляются каскадом;
+    # заказы остаются, поэтому счётчики собеседников не меняются
     db.delete(user)
     db.commit()
+    principal_cache.invalidate(user_id)
     return {"message": f"Пользователь с ID {user_id} успешно удалён"}
 
 
@@ -70,6 +88,7 @@ async def block_user(
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     user.is_verified = False
     db.commit()
+    principal_cache.invalidate(user_id)
     return {"message": f"Пользователь с ID {user_id} заблокирован"}
 
 
@@ -84,16 +103,19 @@ async def unblock_user(
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     user.is_verified = True
     db.commit()
+    principal_cache.invalidate(user_id)
     return {"message": f"Пользователь с ID {user_id} разблокирован"}
 
 # ---------- Заказы ----------
-@router.get("/orders", response_model=List[OrderAdminResponse])
+@router.get("/orders", response_model=Page[OrderAdminResponse])
+@query_budget(2)  # пользователь + список
 async def get_all_orders(
+    page: PageParams = Depends(page_params),
     current_admin_id: int = Depends(get_current_admin),
     db: Session = Depends(get_db),
 ):
-    orders = db.query(Order).all()
-    return [OrderAdminResponse.from_orm(order) for order in orders]
+    orders = paginate(db.query(Order), page, Order.created_at, Order.id).all()
+    return make_page(orders, page)
 
 
 @router.delete("/orders/{order_id}")
@@ -105,17 +127,23 @@ async def delete_order_admin(
     order = db.query(Order).filter(Order.id == order_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Заказ не найден")
+    # 📬 Непрочитанное в чате заказа списываем с общих счётчиков участников
+    drop_order_cursors(db, order_id)
     db.delete(order)
     db.commit()
     return {"message": f"Заказ с ID {order_id} успешно удалён"}
 
 # ---------- Категории ----------
-@router.get("/categories", response_model=List[CategoryResponse])
+@router.get("/categories", response_model=Page[CategoryResponse])
+@query_budget(2)  # пользователь + список
 async def get_all_categories_admin(
+    page: PageParams = Depends(page_params),
     current_admin_id: int = Depends(get_current_admin),
     db: Session = Depends(get_db),
 ):
-    return db.query(Category).all()
+    # У категорий нет created_at — листаем по id
+    categories = paginate(db.query(Category), page, None, Category.id, descending=False).all()
+    return make_page(categories, page, None)
 
 
 @router.put("/categories/{category_id}", response_model=CategoryResponse)
@@ -149,13 +177,15 @@ async def delete_category(
     return {"message": f"Категория с ID {category_id} успешно удалена"}
 
 # ---------- Отзывы ----------
-@router.get("/ratings", response_model=List[AllRatingResponse])
+@router.get("/ratings", response_model=Page[AllRatingResponse])
+@query_budget(2)  # пользователь + список
 async def get_all_ratings_admin(
+    page: PageParams = Depends(page_params),
     current_admin_id: int = Depends(get_current_admin),
     db: Session = Depends(get_db),
 ):
-    ratings = db.query(Rating).all()
-    return [AllRatingResponse.from_orm(r) for r in ratings]
+    ratings = paginate(db.query(Rating), page, Rating.created_at, Rating.id).all()
+    return make_page(ratings, page)
 
 
 @router.delete("/ratings/{rating_id}")
@@ -168,10 +198,103 @@ async def delete_rating_admin(
     if not rating:
         raise HTTPException(status_code=404, detail="Отзыв не найден")
     db.delete(rating)
+    apply_rating(db, rating.master_id, rating.rating, -1)
     db.commit()
     return {"message": f"Отзыв с ID {rating_id} успешно удалён"}
 
 
+# ---------- Словарь модерации ----------
+MAX_WORD_LENGTH = 100
+
+
+def _normalize_words(words: List[str]) -> List[str]:
+    words = [normalize_word(w) for w in words]
+    if any(len(w) > MAX_WORD_LENGTH for w in words):
+        raise HTTPException(status_code=400, detail=f"Слово длиннее {MAX_WORD_LENGTH} символов")
+    return list(dict.fromkeys(w for w in words if w))
+
+
+@router.get("/moderation/words", response_model=ModerationDictionaryResponse)
+async def get_moderation_words(
+    current_admin_id: int = Depends(get_current_admin),
+    db: Session = Depends(get_db),
+):
+    # Только чтение: таблицу заполняет встроенным списком dictionary_watcher при старте
+    version = db.scalar(select(ModerationDictionary.version).where(ModerationDictionary.id == 1))
+    words = db.scalars(select(ModerationWord.word).order_by(ModerationWord.word)).all()
+    return {"version": version or 0, "words": words}
+
+
+@router.put("/moderation/words", response_model=ModerationDictionaryResponse)
+async def update_moderation_words(
+    data: ModerationWordsUpdate,
+    current_admin_id: int = Depends(get_current_admin),
+    db: Session = Depends(get_db),
+):
+    add, remove = _normalize_words(data.add), _normalize_words(data.remove)
+    if not add and not remove:
+        raise HTTPException(status_code=400, detail="Нечего менять")
+    # Если словарь ещё не заполнен (старт воркера не дошёл до БД), заполняем сейчас:
+    # без строки версии UPDATE ниже ничего не вернёт, а правка затрёт встроенный список
+    await reload_dictionary()
+
+    if add:
+        db.execute(insert_ignore(db.bind.dialect.name, ModerationWord, [{"word": w} for w in add], ["word"]))
+    if remove:
+        db.query(ModerationWord).filter(ModerationWord.word.in_(remove)).delete(synchronize_session=False)
+    # Блокировка строки версии упорядочивает параллельные правки
+    version = db.execute(
+        update(ModerationDictionary)
+        .where(ModerationDictionary.id == 1)
+        .values(version=ModerationDictionary.version + 1)
+        .returning(ModerationDictionary.version)
+    ).scalar_one()
+    db.commit()
+
+    words = db.scalars(select(ModerationWord.word).order_by(ModerationWord.word)).all()
+    # Этот воркер — сразу, остальные — по уведомлению (или опросом)
+    install_dictionary(version, words)
+    await hub.publish(DICTIONARY_TOPIC, {"version": version})
+    return {"version": version, "words": words}
+
+
+# ---------- Повторная модерация ----------
+@router.post("/moderation/scans", response_model=ModerationScanResponse)
+async def start_moderation_scan(current_admin_id: int = Depends(get_current_admin)):
+    return await moderation_scanner.start()
+
+
+@router.post("/moderation/scans/{scan_id}/resume", response_model=ModerationScanResponse)
+async def resume_moderation_scan(scan_id: int, current_admin_id: int = Depends(get_current_admin)):
+    return await moderation_scanner.start(scan_id)
+
+
+@router.get("/moderation/scans/{scan_id}", response_model=ModerationScanResponse)
+async def get_moderation_scan(
+    scan_id: int,
+    current_admin_id: int = Depends(get_current_admin),
+    db: Session = Depends(get_db),
+):
+    scan = db.get(ModerationScan, scan_id)
+    if not scan:
+        raise HTTPException(status_code=404, detail="Проверка не найдена")
+    return scan
+
+
+@router.get("/moderation/flags", response_model=Page[ModerationFlagResponse])
+async def get_moderation_flags(
+    page: PageParams = Depends(page_params),
+    content_type: Optional[str] = None,
+    current_admin_id: int = Depends(get_current_admin),
+    db: Session = Depends(get_db),
+):
+    query = db.query(ModerationFlag)
+    if content_type:
+        query = query.filter(ModerationFlag.content_type == content_type)
+    flags = paginate(query, page, ModerationFlag.created_at, ModerationFlag.id).all()
+    return make_page(flags, page, "created_at")
+
+
 @router.get("/reports/payments/pdf")
 def export_payments_pdf(
     current_admin_id: int = Depends(get_current_admin),
@@ -227,5 +350,6 @@ def get_admin_stats(
         "requests_total": total_requests,
         "ads_total": total_ads,
         "payments_total_sum": total_payments_sum,
-        "active_promotions": active_promotions
+        "active_promotions": active_promotions,
+        "principal_cache": principal_cache.stats()
     }
\ No newline at end of file
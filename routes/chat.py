@@ -1,23 +1,142 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from db.database import get_db
-from models.chat import ChatMessage, ChatMessageCreate, ChatMessageResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import asyncio
+import json
+import time
+from db.database import get_async_db, AsyncSessionLocal, insert_ignore, upsert
+from models.chat import ChatMessage, ChatMessageCreate, ChatMessageResponse, ChatReadCursor, ChatUnreadCounter
 from models.order import Order
 from models.user import User
-from core.dependencies import get_current_user
+from core.dependencies import get_current_user, get_user_by_token, token_from_headers
+from core.pagination import Page, PageParams, page_params, paginate, make_page
+from core.pubsub import hub, forward_to_websocket
 
 router = APIRouter(prefix="/chat", tags=["Чат"])
 
+# Очередь отправки на соединение: переполнилась — клиент отключается
+# и догружает пропущенное через GET /chat/{order_id}
+CHAT_QUEUE_SIZE = 256
+TYPING_THROTTLE_SECONDS = 2
+MAX_MESSAGE_LENGTH = 4000
+MAX_WAIT_SECONDS = 30
+
+
+def chat_topic(order_id: int) -> str:
+    return f"chat:{order_id}"
+
+
+async def _participant_order(db: AsyncSession, order_id: int, user_id: int) -> Order:
+    """Заказ, если user_id — его клиент или мастер; иначе 404/403."""
+    order = await db.scalar(select(Order).where(Order.id == order_id))
+    if not order:
+        raise HTTPException(status_code=404, detail="Заказ не найден")
+    if user_id not in [order.client_id, order.master_id]:
+        raise HTTPException(status_code=403, detail="Нет доступа к чату")
+    return order
+
+
+async def _save_message(db: AsyncSession, order: Order, sender_id: int, text: str) -> ChatMessage:
+    receiver_id = order.master_id if sender_id == order.client_id else order.client_id
+    if receiver_id is None:
+        raise HTTPException(status_code=400, detail="У заказа ещё нет мастера")
+
+    msg = ChatMessage(
+        order_id=order.id,
+        sender_id=sender_id,
+        receiver_id=receiver_id,
+        message=text,
+        is_read=False
+    )
+    db.add(msg)
+    await db.flush()
+
+    # 📬 Счётчики непрочитанных получателя — в той же транзакции
+    dialect = db.bind.dialect.name
+    await db.execute(upsert(
+        dialect, ChatReadCursor,
+        {"order_id": order.id, "user_id": receiver_id, "last_read_message_id": 0, "unread_count": 1},
+        ["order_id", "user_id"],
+        {"unread_count": ChatReadCursor.unread_count + 1},
+    ))
+    await db.execute(upsert(
+        dialect, ChatUnreadCounter,
+        {"user_id": receiver_id, "unread_count": 1},
+        ["user_id"],
+        {"unread_count": ChatUnreadCounter.unread_count + 1},
+    ))
+    await db.commit()
+    await db.refresh(msg)
+
+    # 📡 Участникам, у которых открыт сокет комнаты
+    await hub.publish(chat_topic(order.id), {
+        "type": "message",
+        "data": ChatMessageResponse.model_validate(msg).model_dump(mode="json"),
+    })
+    return msg
+
+
+async def _mark_read(db: AsyncSession, order_id: int, user_id: int) -> None:
+    """Сдвигает курсор на последнее сообщение чата и списывает непрочитанные."""
+    # Сначала блокируем курсор, и только потом читаем MAX(id): отправка, успевшая
+    # увеличить unread_count, к этому моменту закоммичена, а следующие ждут блокировку
+    dialect = db.bind.dialect.name
+    await db.execute(insert_ignore(
+        dialect, ChatReadCursor, [{"order_id": order_id, "user_id": user_id}], ["order_id", "user_id"]
+    ))
+    last_read = await db.scalar(
+        select(ChatReadCursor.last_read_message_id)
+        .where(ChatReadCursor.order_id == order_id, ChatReadCursor.user_id == user_id)
+        .with_for_update()
+    )
+    last_message_id = await db.scalar(
+        select(func.max(ChatMessage.id)).where(ChatMessage.order_id == order_id)
+    )
+    if last_message_id is None or last_message_id <= last_read:
+        await db.commit()
+        return
+
+    # Списываем ровно сообщения между старым и новым курсором, а не обнуляем счётчик
+    unread = await db.scalar(
+        select(func.count(ChatMessage.id)).where(
+            ChatMessage.order_id == order_id,
+            ChatMessage.receiver_id == user_id,
+            ChatMessage.id > last_read,
+            ChatMessage.id <= last_message_id,
+        )
+    )
+    await db.execute(
+        update(ChatReadCursor)
+        .where(ChatReadCursor.order_id == order_id, ChatReadCursor.user_id == user_id)
+        .values(last_read_message_id=last_message_id, unread_count=ChatReadCursor.unread_count - unread)
+    )
+    if unread:
+        await db.execute(
+            update(ChatUnreadCounter)
+            .where(ChatUnreadCounter.user_id == user_id)
+            .values(unread_count=ChatUnreadCounter.unread_count - unread)
+        )
+    await db.commit()
+    await hub.publish(chat_topic(order_id), {
+        "type": "read", "user_id": user_id, "last_read_message_id": last_message_id
+    })
+
+
+async def _next_message_event(subscription) -> None:
+    while True:
+        text = await subscription.get()
+        if text is not None and json.loads(text).get("type") == "message":
+            return
+
 
 @router.post("/send", response_model=ChatMessageResponse)
-def send_message(
+async def send_message(
     data: ChatMessageCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    order = db.query(Order).filter(Order.id == data.order_id).first()
-    receiver_id = order.master_id if current_user.id == order.client_id else order.client_id
+    order = await db.scalar(select(Order).where(Order.id == data.order_id))
 
     if not order:
         raise HTTPException(status_code=404, detail="Заказ не найден")
@@ -25,27 +144,31 @@ def send_message(
     if current_user.id not in [order.client_id, order.master_id]:
         raise HTTPException(status_code=403, detail="Вы не участник этого заказа")
 
-    msg = ChatMessage(
-        order_id=data.order_id,
-        sender_id=current_user.id,
-        receiver_id=receiver_id,
-        message=data.message,
-        is_read=False
-    )
+    return await _save_message(db, order, current_user.id, data.message)
 
-    db.add(msg)
-    db.commit()
-    db.refresh(msg)
-    return msg
+
+# До /{order_id}, иначе путь перехватывается им и отвечает 422
+@router.get("/unread-count")
+async def unread_count(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    count = await db.scalar(
+        select(ChatUnreadCounter.unread_count).where(ChatUnreadCounter.user_id == current_user.id)
+    )
+    return {"unread_messages": count or 0}
 
 
-@router.get("/{order_id}", response_model=List[ChatMessageResponse])
-def get_chat_messages(
+@router.get("/{order_id}", response_model=Page[ChatMessageResponse])
+async def get_chat_messages(
     order_id: int,
-    db: Session = Depends(get_db),
+    after_id: Optional[int] = Query(None, description="только сообщения с id больше этого"),
+    wait: int = Query(0, ge=0, le=MAX_WAIT_SECONDS, description="long-polling: ждать новое сообщение, секунд"),
+    page: PageParams = Depends(page_params),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await db.scalar(select(Order).where(Order.id == order_id))
 
     if not order:
         raise HTTPException(status_code=404, detail="Заказ не найден")
@@ -53,32 +176,108 @@ def get_chat_messages(
     if current_user.id not in [order.client_id, order.master_id]:
         raise HTTPException(status_code=403, detail="Нет доступа к чату")
 
-    return db.query(ChatMessage).filter(
-        ChatMessage.order_id == order_id
-    ).order_by(ChatMessage.created_at.asc()).all()
+    if after_id is None:
+        # История от старых к новым: курсор указывает на последнее полученное сообщение
+        query = select(ChatMessage).where(ChatMessage.order_id == order_id)
+        messages = await db.scalars(
+            paginate(query, page, ChatMessage.created_at, ChatMessage.id, descending=False)
+        )
+        return make_page(messages.all(), page)
+
+    # 🔄 Дельта: только новые сообщения (id растёт вместе с created_at)
+    query = paginate(
+        select(ChatMessage).where(ChatMessage.order_id == order_id, ChatMessage.id > after_id),
+        page, None, ChatMessage.id, descending=False
+    )
+    # Подписываемся до запроса, чтобы не пропустить сообщение между SELECT и ожиданием
+    subscription = hub.subscribe(chat_topic(order_id), maxsize=8) if wait else None
+    try:
+        messages = (await db.scalars(query)).all()
+        if not messages and subscription is not None:
+            # Во время ожидания соединение пула не держим
+            await db.close()
+            try:
+                await asyncio.wait_for(_next_message_event(subscription), wait)
+            except asyncio.TimeoutError:
+                pass
+            else:
+                messages = (await db.scalars(query)).all()
+    finally:
+        if subscription is not None:
+            hub.unsubscribe(subscription)
+    return make_page(messages, page, sort_attr=None)
+
 
 @router.put("/{order_id}/mark-read")
-def mark_chat_as_read(
+async def mark_chat_as_read(
     order_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    db.query(ChatMessage).filter(
-        ChatMessage.order_id == order_id,
-        ChatMessage.receiver_id == current_user.id,
-        ChatMessage.is_read == False
-    ).update({ChatMessage.is_read: True})
-
-    db.commit()
+    await _participant_order(db, order_id, current_user.id)
+    await _mark_read(db, order_id, current_user.id)
     return {"message": "Все сообщения помечены как прочитанные"}
 
-@router.get("/unread-count")
-def unread_count(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    count = db.query(ChatMessage).filter(
-        ChatMessage.receiver_id == current_user.id,
-        ChatMessage.is_read == False
-    ).count()
-    return {"unread_messages": count}
+
+# ────────────────────── WEBSOCKET КОМНАТЫ ЗАКАЗА ──────────────────────
+# Клиент → сервер: {"type": "message", "message": "..."}, {"type": "typing"}, {"type": "read"}
+# Сервер → клиент: {"type": "message", "data": {...}}, {"type": "typing", "user_id": ...},
+#                  {"type": "read", "user_id": ..., "last_read_message_id": ...}, {"type": "error", "detail": "..."}
+@router.websocket("/ws/{order_id}")
+async def chat_websocket(websocket: WebSocket, order_id: int, token: Optional[str] = None):
+    await websocket.accept()
+    try:
+        # Короткие сессии: пока сокет открыт, соединение с БД не держим
+        async with AsyncSessionLocal() as db:
+            user = await get_user_by_token(token_from_headers(websocket.headers, token), db)
+            await _participant_order(db, order_id, user.id)
+            user_id = user.id
+    except HTTPException as e:
+        await websocket.close(code=4000 + e.status_code, reason=e.detail)
+        return
+
+    topic = chat_topic(order_id)
+    subscription = hub.subscribe(topic, maxsize=CHAT_QUEUE_SIZE, drop_oldest=False)
+    sender = asyncio.create_task(forward_to_websocket(websocket, subscription))
+    last_typing = 0.0
+    try:
+        while True:
+            try:
+                event = json.loads(await websocket.receive_text())
+                kind = event.get("type")
+            except (ValueError, AttributeError):
+                continue
+
+            if kind == "message":
+                text = str(event.get("message") or "").strip()
+                if not text or len(text) > MAX_MESSAGE_LENGTH:
+                    await websocket.send_json({"type": "error", "detail": "Пустое или слишком длинное сообщение"})
+                    continue
+                try:
+                    # Заказ — заново на каждое сообщение: мастер мог взять или смениться,
+                    # пока сокет открыт
+                    async with AsyncSessionLocal() as db:
+                        order = await _participant_order(db, order_id, user_id)
+                        await _save_message(db, order, user_id, text)
+                except HTTPException as e:
+                    await websocket.send_json({"type": "error", "detail": e.detail})
+
+            elif kind == "typing":
+                # Не чаще раза в TYPING_THROTTLE_SECONDS: иначе NOTIFY на каждое нажатие
+                now = time.monotonic()
+                if now - last_typing >= TYPING_THROTTLE_SECONDS:
+                    last_typing = now
+                    await hub.publish(topic, {"type": "typing", "user_id": user_id})
+
+            elif kind == "read":
+                try:
+                    async with AsyncSessionLocal() as db:
+                        await _participant_order(db, order_id, user_id)
+                        await _mark_read(db, order_id, user_id)
+                except HTTPException as e:
+                    await websocket.send_json({"type": "error", "detail": e.detail})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        hub.unsubscribe(subscription)
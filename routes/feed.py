@@ -0,0 +1,76 @@
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from db.database import AsyncSessionLocal
+from core.dependencies import get_user_by_token, token_from_headers
+from core.pubsub import hub, forward_to_websocket
+from services.feed import feed_topic
+
+router = APIRouter(prefix="/feed", tags=["Лента"])
+
+# SSE: комментарий-пинг, чтобы прокси не закрывали простаивающее соединение
+KEEPALIVE_SECONDS = 25
+
+
+async def _master_topic(token: str) -> str:
+    # Сессия только на проверку токена: пока открыт канал, соединение с БД не держим
+    async with AsyncSessionLocal() as db:
+        user = await get_user_by_token(token, db)
+        if user.user_type != "master":
+            raise HTTPException(status_code=403, detail="Требуются права мастера")
+        if not user.category_id or not user.city:
+            raise HTTPException(status_code=400, detail="Укажите город и категорию в профиле")
+        return feed_topic(user.city, user.category_id)
+
+
+# ────────────────────── WEBSOCKET ──────────────────────
+@router.websocket("/ws")
+async def feed_websocket(websocket: WebSocket, token: Optional[str] = None):
+    await websocket.accept()
+    try:
+        topic = await _master_topic(token_from_headers(websocket.headers, token))
+    except HTTPException as e:
+        await websocket.close(code=4000 + e.status_code, reason=e.detail)
+        return
+
+    subscription = hub.subscribe(topic)
+    sender = asyncio.create_task(forward_to_websocket(websocket, subscription))
+    try:
+        while True:
+            # Входящие сообщения (пинги клиента) не нужны — ждём отключения
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        hub.unsubscribe(subscription)
+
+
+# ────────────────────── SERVER-SENT EVENTS ──────────────────────
+@router.get("/sse")
+async def feed_sse(request: Request, token: Optional[str] = Query(None)):
+    topic = await _master_topic(token_from_headers(request.headers, token))
+
+    async def stream():
+        # Подписываемся внутри генератора: finally выполнится при любом отключении
+        subscription = hub.subscribe(topic)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    text = await asyncio.wait_for(subscription.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield f"data: {text}\n\n"
+        finally:
+            hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
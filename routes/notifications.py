@@ -1,38 +1,93 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from db.database import get_db
-from models.notification import Notification, NotificationResponse
+from db.database import get_async_db
+from models.notification import Notification, NotificationResponse, NotificationUnreadCounter
 from models.user import User
 from core.dependencies import get_current_user
+from core.pagination import MAX_LIMIT, Page, PageParams, page_params, paginate, make_page
 
 router = APIRouter(prefix="/notifications", tags=["Уведомления"])
 
 
-@router.get("/", response_model=List[NotificationResponse])
-def get_notifications(
-    db: Session = Depends(get_db),
+@router.get("/", response_model=Page[NotificationResponse])
+async def get_notifications(
+    unread_only: bool = Query(False, description="Только непрочитанные"),
+    page: PageParams = Depends(page_params),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    return db.query(Notification).filter(
-        Notification.user_id == current_user.id
-    ).order_by(Notification.created_at.desc()).all()
+    query = select(Notification).where(Notification.user_id == current_user.id)
+    if unread_only:
+        query = query.where(Notification.is_read.isnot(True))
+    notifications = await db.scalars(paginate(query, page, Notification.created_at, Notification.id))
+    return make_page(notifications.all(), page)
+
+
+@router.get("/unread-count")
+async def unread_count(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    # 🔢 Счётчик ведёт relay outbox — чтение по первичному ключу, без COUNT(*)
+    count = await db.scalar(
+        select(NotificationUnreadCounter.unread_count).where(NotificationUnreadCounter.user_id == current_user.id)
+    )
+    return {"unread_notifications": count or 0}
+
+
+async def _mark_read(db: AsyncSession, user_id: int, *conditions) -> int:
+    """Отмечает прочитанными непрочитанные уведомления пользователя и списывает их со счётчика."""
+    result = await db.execute(
+        update(Notification)
+        .where(Notification.user_id == user_id, Notification.is_read.isnot(True), *conditions)
+        .values(is_read=True)
+        .execution_options(synchronize_session=False)
+    )
+    # Вычитаем ровно отмеченные: новое уведомление, пришедшее параллельно, не обнулится
+    if result.rowcount:
+        await db.execute(
+            update(NotificationUnreadCounter)
+            .where(NotificationUnreadCounter.user_id == user_id)
+            .values(unread_count=NotificationUnreadCounter.unread_count - result.rowcount)
+        )
+    await db.commit()
+    return result.rowcount
+
+
+@router.put("/mark-all-read")
+async def mark_all_as_read(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    marked = await _mark_read(db, current_user.id)
+    return {"message": "Все уведомления прочитаны", "marked": marked}
+
+
+@router.put("/mark-read")
+async def mark_many_as_read(
+    ids: List[int] = Query(..., min_length=1, max_length=MAX_LIMIT, description="id уведомлений"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    marked = await _mark_read(db, current_user.id, Notification.id.in_(ids))
+    return {"message": "Уведомления прочитаны", "marked": marked}
 
 
 @router.put("/{notification_id}/read")
-def mark_as_read(
+async def mark_as_read(
     notification_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    notif = db.query(Notification).filter(
+    notif = await db.scalar(select(Notification.id).where(
         Notification.id == notification_id,
         Notification.user_id == current_user.id
-    ).first()
+    ))
 
     if not notif:
         raise HTTPException(status_code=404, detail="Уведомление не найдено")
 
-    notif.is_read = True
-    db.commit()
+    await _mark_read(db, current_user.id, Notification.id == notification_id)
     return {"message": "Уведомление прочитано"}
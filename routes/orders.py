@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 from typing import List
-from db.database import get_db
+from db.database import get_async_db
 from core.dependencies import get_current_user
+from core.pagination import Page, PageParams, page_params, paginate, make_page
 from models.order import Order, OrderCreate, OrderForMaster, ClientOrderResponse
 from models.user import User
-from models.notification import Notification
+from services.feed import publish_new_order
+from services.outbox import notify_user
 
 router = APIRouter(
     prefix="/orders",
@@ -18,7 +21,7 @@ router = APIRouter(
 async def create_order(
     order_data: OrderCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.user_type != "client":
         raise HTTPException(status_code=403, detail="Требуются права клиента")
@@ -35,44 +38,66 @@ async def create_order(
         status="pending"
     )
     db.add(new_order)
-    db.commit()
-    db.refresh(new_order)
+    await db.commit()
+    await db.refresh(new_order)
+
+    # 📡 Мастерам, подписанным на ленту своего города и категории
+    await publish_new_order(new_order)
     return new_order
 
 
 # ────────────────────── ПОЛУЧЕНИЕ ЗАКАЗОВ МАСТЕРОМ ──────────────────────
-@router.get("/new", response_model=List[OrderForMaster])
+@router.get("/new", response_model=Page[OrderForMaster])
 async def get_new_orders_for_master(
+    page: PageParams = Depends(page_params),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.user_type != "master":
         raise HTTPException(status_code=403, detail="Требуются права мастера")
 
     if not current_user.category_id or not current_user.city:
-        return []
+        return {"items": [], "next_cursor": None}
 
-    orders = db.query(Order).filter(
+    query = select(Order).where(
         Order.status == "pending",
         Order.category_id == current_user.category_id,
         Order.city == current_user.city
-    ).all()
+    )
+    orders = await db.scalars(paginate(query, page, Order.created_at, Order.id))
 
-    return orders
+    return make_page(orders.all(), page)
 
 
 @router.get("/masters/me/orders/in_progress", response_model=List[OrderForMaster])
 async def get_in_progress_orders_for_master(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.user_type != "master":
         raise HTTPException(status_code=403, detail="Требуются права мастера")
 
-    return db.query(Order).filter(
+    orders = await db.scalars(select(Order).where(
         Order.status == "in_progress",
         Order.master_id == current_user.id
-    ).all()
+    ))
+    return orders.all()
+
+
+async def _change_status(db: AsyncSession, order_id: int, conditions: list, values: dict, *returning):
+    """
+    Смена статуса одним условным UPDATE ... WHERE ... RETURNING:
+    из двух одновременных запросов строку изменит только один.
+    Возвращает строку RETURNING или None, если условия не выполнились.
+    """
+    result = await db.execute(
+        update(Order)
+        .where(Order.id == order_id, *conditions)
+        .values(**values)
+        .returning(Order.id, *returning)
+        .execution_options(synchronize_session=False)
+    )
+    return result.first()
 
 
 # ────────────────────── ВЗЯТЬ ЗАКАЗ ──────────────────────
@@ -80,20 +105,23 @@ async def get_in_progress_orders_for_master(
 async def take_order(
     order_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.user_type != "master":
         raise HTTPException(status_code=403, detail="Требуются права мастера")
 
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
-        raise HTTPException(status_code=404, detail="Заказ не найден")
-    if order.status != "pending":
+    claimed = await _change_status(
+        db, order_id,
+        [Order.status == "pending"],
+        {"status": "in_progress", "master_id": current_user.id},
+    )
+    if claimed is None:
+        # Дополнительный SELECT только для текста ошибки
+        if await db.scalar(select(Order.id).where(Order.id == order_id)) is None:
+            raise HTTPException(status_code=404, detail="Заказ не найден")
         raise HTTPException(status_code=400, detail="Заказ уже в работе или завершён")
 
-    order.status = "in_progress"
-    order.master_id = current_user.id
-    db.commit()
+    await db.commit()
     return {"message": "Заказ успешно взят в работу"}
 
 
@@ -102,22 +130,25 @@ async def take_order(
 async def complete_order(
     order_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.user_type != "master":
         raise HTTPException(status_code=403, detail="Требуются права мастера")
 
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
-        raise HTTPException(status_code=404, detail="Заказ не найден")
-    if order.status != "in_progress":
-        raise HTTPException(status_code=400, detail="Заказ не в статусе 'in_progress'")
-    if order.master_id != current_user.id:
+    completed = await _change_status(
+        db, order_id,
+        [Order.status == "in_progress", Order.master_id == current_user.id],
+        {"status": "completed", "completed_at": datetime.utcnow()},
+    )
+    if completed is None:
+        order = await db.scalar(select(Order).where(Order.id == order_id))
+        if not order:
+            raise HTTPException(status_code=404, detail="Заказ не найден")
+        if order.status != "in_progress":
+            raise HTTPException(status_code=400, detail="Заказ не в статусе 'in_progress'")
         raise HTTPException(status_code=403, detail="Вы не назначены на этот заказ")
 
-    order.status = "completed"
-    order.completed_at = datetime.utcnow()
-    db.commit()
+    await db.commit()
     return {"message": "Заказ завершён"}
 
 
@@ -126,37 +157,42 @@ async def complete_order(
 async def cancel_order(
     order_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.user_type != "client":
         raise HTTPException(status_code=403, detail="Требуются права клиента")
 
-    order = db.query(Order).filter(
-        Order.id == order_id,
-        Order.client_id == current_user.id
-    ).first()
-
-    if not order:
-        raise HTTPException(status_code=404, detail="Заказ не найден")
-    if order.status != "pending":
+    cancelled = await _change_status(
+        db, order_id,
+        [Order.client_id == current_user.id, Order.status == "pending"],
+        {"status": "cancelled", "cancelled_at": datetime.utcnow()},
+    )
+    if cancelled is None:
+        order_exists = await db.scalar(select(Order.id).where(
+            Order.id == order_id,
+            Order.client_id == current_user.id
+        ))
+        if order_exists is None:
+            raise HTTPException(status_code=404, detail="Заказ не найден")
         raise HTTPException(status_code=400, detail="Отменить можно только заказ в ожидании")
 
-    order.status = "cancelled"
-    order.cancelled_at = datetime.utcnow()
-    db.commit()
+    await db.commit()
     return {"message": "Заказ отменён"}
 
 
 # ────────────────────── ЗАКАЗЫ КЛИЕНТА ──────────────────────
-@router.get("/clients/me/orders", response_model=List[ClientOrderResponse])
+@router.get("/clients/me/orders", response_model=Page[ClientOrderResponse])
 async def get_client_orders(
+    page: PageParams = Depends(page_params),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.user_type != "client":
         raise HTTPException(status_code=403, detail="Требуются права клиента")
 
-    return db.query(Order).filter(Order.client_id == current_user.id).all()
+    query = select(Order).where(Order.client_id == current_user.id)
+    orders = await db.scalars(paginate(query, page, Order.created_at, Order.id))
+    return make_page(orders.all(), page)
 
 
 # ────────────────────── ПОДРОБНОСТИ ЗАКАЗА ──────────────────────
@@ -164,12 +200,12 @@ async def get_client_orders(
 async def get_order_details_for_master(
     order_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.user_type != "master":
         raise HTTPException(status_code=403, detail="Требуются права мастера")
 
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await db.scalar(select(Order).where(Order.id == order_id))
     if not order:
         raise HTTPException(status_code=404, detail="Заказ не найден")
     if order.master_id != current_user.id:
@@ -178,30 +214,31 @@ async def get_order_details_for_master(
     return order
 
 @router.put("/{order_id}/complete")
-def complete_order(
+async def complete_order(
     order_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    order = db.query(Order).filter(Order.id == order_id).first()
-
-    if not order:
-        raise HTTPException(status_code=404, detail="Заказ не найден")
-
-    if order.client_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Вы не можете завершить этот заказ")
-
-    if order.status == "completed":
+    completed = await _change_status(
+        db, order_id,
+        [Order.client_id == current_user.id, Order.status != "completed"],
+        {"status": "completed"},
+        Order.master_id,
+    )
+    if completed is None:
+        order = await db.scalar(select(Order).where(Order.id == order_id))
+        if not order:
+            raise HTTPException(status_code=404, detail="Заказ не найден")
+        if order.client_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Вы не можете завершить этот заказ")
         raise HTTPException(status_code=400, detail="Заказ уже завершён")
 
-    order.status = "completed"
-    notification = Notification(
-        user_id=order.master_id,
-        message=f"Клиент завершил заказ №{order.id}"
+    notify_user(
+        db, f"order:{order_id}:completed", completed.master_id,
+        f"Клиент завершил заказ №{order_id}",
+        "Заказ завершён", f"Клиент завершил заказ №{order_id}"
     )
-    db.add(notification)
 
-    db.commit()
-    db.refresh(order)
+    await db.commit()
 
     return {"message": "Заказ завершён, теперь вы можете оставить отзыв"}
@@ -5,7 +5,7 @@ from sqlalchemy.orm import Session
 from db.database import get_db
 from models.sms_code import SMSCode
 from models.user import User
-from passlib.hash import bcrypt
+from core.passwords import hash_password_sync
 from datetime import datetime, timedelta
 import random
 
@@ -60,7 +60,7 @@ def set_new_password(phone_number: str, code: str, new_password: str, db: Sessio
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
 
-    user.password = bcrypt.hash(new_password)
+    user.password = hash_password_sync(new_password)
     db.commit()
 
     return {"message": "Пароль успешно изменен"}
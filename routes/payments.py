@@ -5,8 +5,10 @@ from datetime import datetime, timedelta
 from db.database import get_db
 from models.payment import Payment, PaymentCreate, PaymentResponse
 from models.user import User
-from models.notification import Notification
 from core.dependencies import get_current_user
+from core.principal_cache import principal_cache
+from services.outbox import notify_user
+from services.request_quota import add_paid_credit
 
 router = APIRouter(prefix="/payments", tags=["Платежи"])
 
@@ -94,19 +96,22 @@ def confirm_payment(
     payment.end_date = now + timedelta(days=30)
     payment.is_active = True
 
-    # Обновление профиля мастера
-    current_user.is_promoted = True
-    current_user.promotion_expiration = payment.end_date
-    current_user.promote_times_per_day = payment.times_per_day
-    current_user.promote_today_used = 0
-
-    # Уведомление
-    db.add(Notification(
-        user_id=current_user.id,
-        message="🎯 Оплата подтверждена! Ваш профиль продвигается в ТОП"
-    ))
+    # Обновление профиля мастера (current_user загружен в другой сессии)
+    master = db.query(User).filter(User.id == current_user.id).first()
+    master.is_promoted = True
+    master.promotion_expiration = payment.end_date
+    master.promote_times_per_day = payment.times_per_day
+    master.promote_today_used = 0
+
+    # Уведомление (через outbox, в той же транзакции)
+    notify_user(
+        db, f"payment:{payment.id}:paid", current_user.id,
+        "🎯 Оплата подтверждена! Ваш профиль продвигается в ТОП",
+        "Оплата подтверждена", "Ваш профиль продвигается в ТОП"
+    )
 
     db.commit()
+    principal_cache.invalidate(current_user.id)
     return {"message": "Платёж успешно подтверждён и продвижение активировано"}
 
 # ✅ Оплата за дополнительную заявку (после 5 в день)
@@ -133,6 +138,8 @@ def pay_for_extra_request(
         start_date=datetime.utcnow()
     )
     db.add(payment)
+    # +1 оплаченная заявка в счётчике лимита — в той же транзакции, что и платёж
+    add_paid_credit(db, current_user.id)
     db.commit()
 
     return {"message": "Оплата за заявку прошла успешно"}
@@ -1,12 +1,13 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, Depends, HTTPException
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from db.database import get_db
 from models.work_photo import WorkPhoto, PhotoResponse
 from models.user import User
 from core.dependencies import get_current_user
-import shutil
-import uuid
-import os
+from core.pagination import Page, PageParams, page_params, paginate, make_page
+from services.media import confirm_upload, discard_upload, remove_unreferenced, save_upload
+from services.thumbnails import generate_derivatives, remove_derivatives
 from typing import List
 
 
@@ -14,34 +15,38 @@ router = APIRouter(prefix="/photos", tags=["Работы"])
 
 @router.post("/upload", response_model=PhotoResponse)
 async def upload_work_photo(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    if not file.filename.endswith((".jpg", ".jpeg", ".png")):
-        raise HTTPException(status_code=400, detail="Только jpg и png разрешены")
+    # 💾 Потоково, с лимитом размера; одинаковые фото хранятся один раз
+    stored = await save_upload(file)
+    # 🖼 Уменьшенные копии — после ответа
+    background_tasks.add_task(generate_derivatives, stored.name)
 
-    filename = f"{uuid.uuid4()}.{file.filename.split('.')[-1]}"
-    file_path = f"media/{filename}"
-
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    photo = WorkPhoto(user_id=current_user.id, image_path=f"/media/{filename}")
-    db.add(photo)
-    db.commit()
+    try:
+        photo = WorkPhoto(user_id=current_user.id, image_path=stored.url)
+        db.add(photo)
+        db.commit()
+    except BaseException:
+        await discard_upload(stored)
+        raise
+    await confirm_upload(stored)
     db.refresh(photo)
 
     return photo
 
 # 📂 1. Получить все фото текущего мастера
-@router.get("/my", response_model=List[PhotoResponse])
+@router.get("/my", response_model=Page[PhotoResponse])
 async def get_my_photos(
+    page: PageParams = Depends(page_params),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    photos = db.query(WorkPhoto).filter(WorkPhoto.user_id == current_user.id).all()
-    return photos
+    query = db.query(WorkPhoto).filter(WorkPhoto.user_id == current_user.id)
+    photos = paginate(query, page, WorkPhoto.uploaded_at, WorkPhoto.id).all()
+    return make_page(photos, page, "uploaded_at")
 
 
 # ❌ 2. Удалить фото по ID
@@ -59,13 +64,13 @@ async def delete_photo(
     if not photo:
         raise HTTPException(status_code=404, detail="Фото не найдено или не ваше")
 
-    # удаляем сам файл
-    file_path = photo.image_path.lstrip("/")  # убираем /media/
-    if os.path.exists(file_path):
-        os.remove(file_path)
-
     # удаляем из БД
     db.delete(photo)
     db.commit()
 
+    # удаляем сам файл и его копии, если он больше нигде не используется;
+    # блокировка файла, запросы и os.remove — в пуле потоков, не в event loop
+    if await run_in_threadpool(remove_unreferenced, db, photo.image_path):
+        await run_in_threadpool(remove_derivatives, photo.image_path)
+
     return {"message": "Фото удалено"}
\ No newline at end of file
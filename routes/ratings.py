@@ -1,14 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
-from sqlalchemy import func
 
 from db.database import get_db
 from core.dependencies import get_current_user
+from core.pagination import Page, PageParams, page_params, paginate, make_page
 from models.rating import Rating, RatingCreate, RatingResponse
 from models.order import Order
 from models.user import User
 from services.moderation import contains_bad_words  # 👈 импорт фильтра
+from services.outbox import notify_user
+from services.reputation import apply_rating
 
 router = APIRouter(prefix="/ratings", tags=["Отзывы"])
 
@@ -47,25 +49,29 @@ def create_rating(
     )
 
     db.add(rating)
-    db.commit()
-
-    # Пересчёт среднего рейтинга мастера
-    avg_rating = db.query(func.avg(Rating.rating)) \
-        .filter(Rating.master_id == order.master_id) \
-        .scalar()
-
-    master = db.query(User).filter(User.id == order.master_id).first()
-    master.reputation = avg_rating
+    db.flush()
+    # Репутация мастера — в той же транзакции, без AVG по всем отзывам
+    apply_rating(db, order.master_id, data.rating)
+    notify_user(
+        db, f"rating:{rating.id}", order.master_id,
+        f"⭐ Новый отзыв по заказу №{order.id}: {data.rating}/5",
+        "Новый отзыв", f"Оценка {data.rating}/5"
+    )
     db.commit()
     db.refresh(rating)
 
     return rating
 
 
-@router.get("/by-master/{master_id}", response_model=List[RatingResponse])
-def get_ratings_by_master(master_id: int, db: Session = Depends(get_db)):
-    ratings = db.query(Rating).filter(Rating.master_id == master_id).all()
-    return ratings
+@router.get("/by-master/{master_id}", response_model=Page[RatingResponse])
+def get_ratings_by_master(
+    master_id: int,
+    page: PageParams = Depends(page_params),
+    db: Session = Depends(get_db)
+):
+    query = db.query(Rating).filter(Rating.master_id == master_id)
+    ratings = paginate(query, page, Rating.created_at, Rating.id).all()
+    return make_page(ratings, page)
 
 
 @router.delete("/{rating_id}")
@@ -83,5 +89,6 @@ def delete_rating(
         raise HTTPException(status_code=404, detail="Отзыв не найден")
 
     db.delete(rating)
+    apply_rating(db, rating.master_id, rating.rating, -1)
     db.commit()
     return {"message": "Отзыв удалён"}
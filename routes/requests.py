@@ -1,35 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from db.database import get_db
+from db.database import get_async_db
 from models.request import ClientRequest, RequestResponse
 from core.dependencies import get_current_user
+from core.rate_limiter import limiter, get_user_or_ip
+from core.pagination import Page, PageParams, page_params, paginate, make_page
 from models.user import User
-from models.notification import Notification
-from datetime import datetime
-import shutil
-import uuid
-import os
-from sqlalchemy import and_
 from dateutil import parser
 import asyncio
 
-from services.push import send_push_notification
+from services.outbox import notify_masters
+from services.feed import publish_new_request
+from services.media import confirm_upload, discard_upload, save_upload
+from services.thumbnails import generate_derivatives
 from services.moderation import contains_bad_words
-from services.image_moderation import is_inappropriate_image_by_url
+from services.request_quota import FREE_REQUESTS_PER_DAY, consume_quota, has_quota
+from services.image_moderation import image_moderator
 
 router = APIRouter(prefix="/requests", tags=["Заявки"])
 
-MEDIA_DIR = "media"
-os.makedirs(MEDIA_DIR, exist_ok=True)
-
-def get_image_url_local(filename: str) -> str:
-    # Пример — на проде ты можешь вернуть полный URL вида: https://mydomain.kz/media/filename
-    return f"http://localhost:8000/media/{filename}"
+QUOTA_EXCEEDED_DETAIL = (
+    f"⚠️ Вы достигли лимита бесплатных заявок ({FREE_REQUESTS_PER_DAY} в день). Следующая заявка — платная: 350₸"
+)
 
 
 @router.post("/create", response_model=RequestResponse)
+@limiter.limit("20/hour", key_func=get_user_or_ip)  # 👈 на аккаунт, а не на IP
 async def create_request(
+    request: Request,
+    background_tasks: BackgroundTasks,
     category_id: int = Form(...),
     city: str = Form(...),
     address: str = Form(...),
@@ -37,7 +38,7 @@ async def create_request(
     description: str = Form(..., min_length=20),
     phone_number: str = Form(...),
     file: Optional[UploadFile] = File(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     # 🛡 Модерация текста
@@ -50,88 +51,74 @@ async def create_request(
     except ValueError:
         raise HTTPException(status_code=400, detail="Неверный формат даты")
 
+    # 📊 Лимит заявок — до приёма файла, чтобы не загружать и не модерировать зря
+    if not await has_quota(db, current_user.id):
+        raise HTTPException(status_code=402, detail=QUOTA_EXCEEDED_DETAIL)
+
     # 🖼 Работа с изображением
-    filename = None
-    if file:
-        ext = file.filename.split(".")[-1]
-        filename = f"{uuid.uuid4()}.{ext}"
-        filepath = os.path.join(MEDIA_DIR, filename)
-
-        with open(filepath, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        file.file.close()
-
-        image_url = get_image_url_local(filename)
-        if is_inappropriate_image_by_url(image_url):
-            os.remove(filepath)
-            raise HTTPException(status_code=400, detail="Фото нарушает правила сообщества")
-
-    # 📊 Проверка лимита заявок
-    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    requests_today = db.query(ClientRequest).filter(
-        and_(
-            ClientRequest.client_id == current_user.id,
-            ClientRequest.created_at >= today_start
+    stored = await save_upload(file) if file else None
+    try:
+        if stored:
+            if await image_moderator.is_inappropriate(stored.sha256, stored.path, stored.url):
+                raise HTTPException(status_code=400, detail="Фото нарушает правила сообщества")
+            background_tasks.add_task(generate_derivatives, stored.name)
+
+        # 📊 Лимит заявок — списываем в той же транзакции, что и вставка заявки
+        quota = await consume_quota(db, current_user.id)
+        if quota is None:
+            # Лимит кончился, пока загружался файл (параллельная заявка)
+            raise HTTPException(status_code=402, detail=QUOTA_EXCEEDED_DETAIL)
+
+        # ✅ Сохраняем в базу
+        client_request = ClientRequest(
+            client_id=current_user.id,
+            category_id=category_id,
+            city=city,
+            address=address,
+            scheduled_date=scheduled_dt,
+            description=description,
+            photo_url=stored.url if stored else None,
+            phone_number=phone_number,
+            is_paid=quota.is_paid,
+            payment_id=quota.payment_id
         )
-    ).count()
 
-    if requests_today >= 5:
-        raise HTTPException(
-            status_code=402,
-            detail="⚠️ Вы достигли лимита бесплатных заявок (5 в день). Следующая заявка — платная: 350₸"
+        db.add(client_request)
+        await db.flush()
+
+        # 🔔 Уведомления и push подходящим мастерам доставит outbox relay
+        notify_masters(
+            db, f"request:{client_request.id}", city, category_id,
+            f"📥 Новая заявка: {description[:30]}... ({city})",
+            "Новая заявка", f"{description[:30]}... ({city})"
         )
 
-    # ✅ Сохраняем в базу
-    request = ClientRequest(
-        client_id=current_user.id,
-        category_id=category_id,
-        city=city,
-        address=address,
-        scheduled_date=scheduled_dt,
-        description=description,
-        photo_url=f"/media/{filename}" if filename else None,
-        phone_number=phone_number
-    )
-
-    db.add(request)
-
-    # 🔔 Уведомляем подходящих мастеров
-    matching_masters = db.query(User).filter(
-        User.user_type == "master",
-        User.city == city,
-        User.category_id == category_id,
-        User.is_verified == True
-    ).all()
-
-    for master in matching_masters:
-        db.add(Notification(
-            user_id=master.id,
-            message=f"📥 Новая заявка: {description[:30]}... ({city})"
-        ))
-        if master.device_token:
-            await asyncio.sleep(0)  # Предотвращаем блокировку event loop
-            await send_push_notification(
-                master.device_token,
-                "Новая заявка",
-                f"{description[:30]}... ({city})"
-            )
-
-    db.commit()
-    db.refresh(request)
-
-    return request
-
-
-@router.get("/", response_model=List[RequestResponse])
-def list_requests(
-    db: Session = Depends(get_db),
+        await db.commit()
+    except BaseException:
+        # Новый файл удаляется, если на него никто не ссылается; существовавший не трогаем
+        if stored:
+            await discard_upload(stored)
+        raise
+    if stored:
+        await confirm_upload(stored)
+    await db.refresh(client_request)
+
+    # 📡 Мастерам, подписанным на ленту своего города и категории
+    await publish_new_request(client_request)
+    return client_request
+
+
+@router.get("/", response_model=Page[RequestResponse])
+async def list_requests(
+    page: PageParams = Depends(page_params),
+    db: AsyncSession = Depends(get_async_db),
     category_id: Optional[int] = None,
     city: Optional[str] = None
 ):
-    query = db.query(ClientRequest)
+    query = select(ClientRequest)
     if category_id:
-        query = query.filter(ClientRequest.category_id == category_id)
+        query = query.where(ClientRequest.category_id == category_id)
     if city:
-        query = query.filter(ClientRequest.city.ilike(f"%{city}%"))
-    return query.order_by(ClientRequest.created_at.desc()).all()
+        query = query.where(ClientRequest.city.ilike(f"%{city}%"))
+    requests = await db.scalars(paginate(query, page, ClientRequest.created_at, ClientRequest.id))
+    return make_page(requests.all(), page)
@@ -5,13 +5,11 @@ from random import randint
 from db.database import get_db
 from models.sms_code import SMSCode, RequestSMSCode, VerifySMSCode, ForgotPasswordRequest, ForgotPasswordConfirm
 from models.user import User
-from passlib.context import CryptContext
+from core.passwords import hash_password
 import os
 
 router = APIRouter(prefix="/auth", tags=["Auth (SMS)"])
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 @router.post("/request-code")
 async def request_code(data: RequestSMSCode, db: Session = Depends(get_db)):
     phone = data.phone_number
@@ -90,7 +88,7 @@ async def forgot_password_confirm(data: ForgotPasswordConfirm, db: Session = Dep
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
 
-    hashed_password = pwd_context.hash(data.new_password)
+    hashed_password = await hash_password(data.new_password)
     user.password = hashed_password
 
     # удаляем коды
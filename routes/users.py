@@ -2,18 +2,21 @@ from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from sqlalchemy.orm import Session, joinedload
-from passlib.hash import bcrypt
+from sqlalchemy.orm import joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta, datetime
-from db.database import get_db
+from db.database import get_async_db
 from core.dependencies import create_access_token, get_current_user
 from models.user import User, UserRegistration, UserLogin, ClientProfileUpdate, MasterProfileUpdate, UserResponse
 from models.sms_code import SMSCode
 from models.payment import Payment
 from typing import List, Optional
-from sqlalchemy import and_
+from sqlalchemy import and_, select
 from services.moderation import contains_bad_words
 from core.rate_limiter import limiter
+from core.principal_cache import principal_cache
+from core.passwords import hash_password, verify_password
+from core.query_budget import query_budget
 
 
 router = APIRouter(
@@ -26,9 +29,9 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 @router.post("/register")
 @limiter.limit("3/minute")  # 👈 максимум 3 регистрации в минуту с одного IP
-async def register_user(user: UserRegistration, request: Request, db: Session = Depends(get_db)):
+async def register_user(user: UserRegistration, request: Request, db: AsyncSession = Depends(get_async_db)):
     # Проверка: не зарегистрировано ли уже устройство
-    existing_device = db.query(User).filter(User.device_id == user.device_id).first()
+    existing_device = await db.scalar(select(User).where(User.device_id == user.device_id))
     if existing_device:
         raise HTTPException(status_code=400, detail="С этого устройства уже зарегистрирован аккаунт")
 
@@ -36,21 +39,21 @@ async def register_user(user: UserRegistration, request: Request, db: Session =
         raise HTTPException(status_code=400, detail="Вы должны принять условия использования")
     
     # проверка подтверждения телефона
-    verified = (
-        db.query(SMSCode)
-        .filter(SMSCode.phone_number == user.phone_number)
+    verified = await db.scalar(
+        select(SMSCode)
+        .where(SMSCode.phone_number == user.phone_number)
         .order_by(SMSCode.created_at.desc())
-        .first()
+        .limit(1)
     )
 
     if not verified:
         raise HTTPException(status_code=400, detail="Номер не подтвержден через SMS")
 
-    existing_user = db.query(User).filter(User.phone_number == user.phone_number).first()
+    existing_user = await db.scalar(select(User).where(User.phone_number == user.phone_number))
     if existing_user:
         raise HTTPException(status_code=400, detail="Номер уже зарегистрирован")
 
-    hashed_password = bcrypt.hash(user.password)
+    hashed_password = await hash_password(user.password)
     new_user = User(
         phone_number=user.phone_number,
         password=hashed_password,
@@ -60,8 +63,8 @@ async def register_user(user: UserRegistration, request: Request, db: Session =
         device_id=user.device_id
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     return {
         "id": new_user.id,
@@ -74,11 +77,20 @@ async def register_user(user: UserRegistration, request: Request, db: Session =
 
 @router.post("/login")
 @limiter.limit("5/minute")
-async def login_user(user: UserLogin, request: Request, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.phone_number == user.phone_number).first()
-    if not db_user or not bcrypt.verify(user.password, db_user.password):
+async def login_user(user: UserLogin, request: Request, db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.scalar(select(User).where(User.phone_number == user.phone_number))
+    if not db_user:
+        raise HTTPException(status_code=401, detail="Неверный номер телефона или пароль")
+
+    is_valid, new_hash = await verify_password(user.password, db_user.password)
+    if not is_valid:
         raise HTTPException(status_code=401, detail="Неверный номер телефона или пароль")
 
+    # Стоимость bcrypt изменилась — пересохраняем хэш
+    if new_hash:
+        db_user.password = new_hash
+        await db.commit()
+
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(data={"sub": str(db_user.id)}, expires_delta=access_token_expires)
     return {"access_token": access_token, "token_type": "bearer"}
@@ -93,7 +105,7 @@ async def protected(current_user: User = Depends(get_current_user)):
 async def update_master_profile(
     profile_data: MasterProfileUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.user_type != "master":
         raise HTTPException(status_code=403, detail="Требуются права мастера")
@@ -104,8 +116,9 @@ async def update_master_profile(
             raise HTTPException(status_code=400, detail=f"Поле '{field}' содержит запрещённые слова")
         setattr(current_user, field, value)
 
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    principal_cache.invalidate(current_user.id)
+    await db.refresh(current_user)
     return current_user
 
 
@@ -113,7 +126,7 @@ async def update_master_profile(
 async def update_client_profile(
     profile_data: ClientProfileUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.user_type != "client":
         raise HTTPException(status_code=403, detail="Требуются права клиента")
@@ -121,40 +134,39 @@ async def update_client_profile(
     for field, value in profile_data.dict(exclude_unset=True).items():
         setattr(current_user, field, value)
 
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    principal_cache.invalidate(current_user.id)
+    await db.refresh(current_user)
     return current_user
 
-from sqlalchemy.orm import joinedload
-from sqlalchemy import and_
-
 @router.get("/top", response_model=List[UserResponse])
-def get_top_masters(
+@query_budget(5)
+async def get_top_masters(
     city: Optional[str] = Query(None, description="Фильтр по городу"),
     category_id: Optional[int] = Query(None, description="Фильтр по категории"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     now = datetime.utcnow()
 
     # 1. Деактивируем просроченные оплаты
-    expired = db.query(Payment).filter(
+    expired = (await db.scalars(select(Payment).where(
         Payment.purpose == "promote",
         Payment.is_active == True,
         Payment.end_date < now
-    ).all()
+    ))).all()
     for payment in expired:
         payment.is_active = False
-    db.commit()
+    await db.commit()
 
     # 2. Загружаем мастеров
-    query = db.query(User).filter(User.user_type == "master", User.is_verified == True)
+    query = select(User).where(User.user_type == "master", User.is_verified == True)
 
     if city:
-        query = query.filter(User.city == city)
+        query = query.where(User.city == city)
     if category_id:
-        query = query.filter(User.category_id == category_id)
+        query = query.where(User.category_id == category_id)
 
-    masters = query.options(joinedload(User.payments)).all()
+    masters = (await db.scalars(query.options(joinedload(User.payments)))).unique().all()
 
     # 3. Делим на продвигаемых и обычных
     promoted = []
@@ -177,7 +189,7 @@ def get_top_masters(
     # 5. Обновим last_promoted_at у первого рекламного мастера
     if promoted:
         promoted[0].last_promoted_at = now
-        db.commit()
+        await db.commit()
 
     return promoted + regular
 
@@ -0,0 +1,28 @@
+# services/feed.py
+"""
+Лента новых заказов и заявок для мастеров.
+
+Мастер подписан на топик своего (city, category_id); create_order и
+create_request публикуют в него событие после commit.
+"""
+from core.pubsub import hub
+from models.order import OrderForMaster
+from models.request import RequestResponse
+
+
+def feed_topic(city: str, category_id: int) -> str:
+    return f"feed:{category_id}:{city}"
+
+
+async def publish_new_order(order) -> None:
+    await hub.publish(feed_topic(order.city, order.category_id), {
+        "type": "order",
+        "data": OrderForMaster.model_validate(order).model_dump(mode="json"),
+    })
+
+
+async def publish_new_request(client_request) -> None:
+    await hub.publish(feed_topic(client_request.city, client_request.category_id), {
+        "type": "request",
+        "data": RequestResponse.model_validate(client_request).model_dump(mode="json"),
+    })
@@ -1,20 +1,248 @@
-import requests
+# services/image_moderation.py
+"""
+Модерация фото.
+
+По умолчанию (IMAGE_MODERATION_BACKEND=local) — локальный классификатор
+nudenet в пуле процессов: модель загружается один раз при старте
+каждого процесса, event loop не блокируется, ядра используются все.
+Вердикт кэшируется по SHA-256 содержимого — повторная загрузка того же
+фото (а хранилище и так дедуплицирует) не пересчитывается.
+
+IMAGE_MODERATION_BACKEND=moderatecontent — внешний API moderatecontent.com:
+async-запрос с таймаутом и circuit breaker. Фото должно быть доступно
+снаружи по PUBLIC_BASE_URL. Недоступный сервис не валит загрузку —
+фото пропускается, как и раньше.
+
+    flagged = await image_moderator.is_inappropriate(stored.sha256, stored.path, stored.url)
+    verdicts = await image_moderator.moderate_batch([(sha256, path, url), ...])
+"""
+import asyncio
+import logging
+import multiprocessing
 import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Sequence, Tuple
+
+import httpx
 from dotenv import load_dotenv
 
+from core.metrics import IMAGE_MODERATION, track_external_call
+
 load_dotenv()
 
+logger = logging.getLogger("image_moderation")
+
+IMAGE_MODERATION_BACKEND = os.getenv("IMAGE_MODERATION_BACKEND", "local")
+IMAGE_MODERATION_WORKERS = int(os.getenv("IMAGE_MODERATION_WORKERS", str(os.cpu_count() or 1)))
+IMAGE_MODERATION_BATCH = int(os.getenv("IMAGE_MODERATION_BATCH", "8"))
+IMAGE_MODERATION_THRESHOLD = float(os.getenv("IMAGE_MODERATION_THRESHOLD", "0.6"))
+IMAGE_MODERATION_CACHE_SIZE = int(os.getenv("IMAGE_MODERATION_CACHE_SIZE", "10000"))
+
 MODERATECONTENT_API_KEY = os.getenv("MODERATECONTENT_API_KEY")
+MODERATECONTENT_TIMEOUT = float(os.getenv("MODERATECONTENT_TIMEOUT", "3"))
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "http://localhost:8000")
+
+# Классы nudenet, при которых фото отклоняется
+UNSAFE_CLASSES = {
+    "FEMALE_GENITALIA_EXPOSED",
+    "MALE_GENITALIA_EXPOSED",
+    "FEMALE_BREAST_EXPOSED",
+    "BUTTOCKS_EXPOSED",
+    "ANUS_EXPOSED",
+}
+UNSAFE_LABELS = {"adult", "racy", "violent"}  # moderatecontent
+
+ImageRef = Tuple[str, str, str]  # (sha256, путь на диске, url от /media)
+
+
+# ────────────────────── ЛОКАЛЬНЫЙ КЛАССИФИКАТОР (в процессах пула) ──────────────────────
+_detector = None
+
+
+def _init_worker() -> None:
+    """Загружает модель при старте процесса пула — не на каждое фото."""
+    global _detector
+    from nudenet import NudeDetector
+    _detector = NudeDetector()
+
+
+def _warmup() -> int:
+    return os.getpid()
+
+
+def _unsafe_score(detections: list) -> float:
+    return max((d["score"] for d in detections if d["class"] in UNSAFE_CLASSES), default=0.0)
+
+
+def score_images(paths: Sequence[str]) -> List[float]:
+    """Максимальная уверенность по «запрещённым» классам для каждого фото."""
+    paths = list(paths)
+    if hasattr(_detector, "detect_batch"):
+        return [_unsafe_score(d) for d in _detector.detect_batch(paths, batch_size=len(paths))]
+    return [_unsafe_score(_detector.detect(path)) for path in paths]
 
-def is_inappropriate_image_by_url(image_url: str) -> bool:
-    try:
-        response = requests.get(
-            "https://api.moderatecontent.com/moderate/",
-            params={"key": MODERATECONTENT_API_KEY, "url": image_url}
+
+# ────────────────────── CIRCUIT BREAKER ──────────────────────
+class CircuitBreaker:
+    """
+    После failure_threshold ошибок подряд не ходим в сервис reset_timeout
+    секунд, затем пропускаем один пробный запрос.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.opened_at = time.monotonic()  # пробный запрос, остальные ждут его исхода
+            return True
+        return False
+
+    def success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+# ────────────────────── ДВИЖОК ──────────────────────
+class ImageModerator:
+    def __init__(self, backend: str = IMAGE_MODERATION_BACKEND, workers: int = IMAGE_MODERATION_WORKERS,
+                 batch_size: int = IMAGE_MODERATION_BATCH, threshold: float = IMAGE_MODERATION_THRESHOLD,
+                 cache_size: int = IMAGE_MODERATION_CACHE_SIZE):
+        self.backend = backend
+        self.workers = workers
+        self.batch_size = batch_size
+        self.threshold = threshold
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, bool]" = OrderedDict()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._start_lock = asyncio.Lock()
+        self._load_failed = False
+        self.breaker = CircuitBreaker()
+
+    async def start(self) -> None:
+        async with self._start_lock:
+            if self.backend != "local":
+                if self._client is None:
+                    self._client = httpx.AsyncClient(timeout=MODERATECONTENT_TIMEOUT)
+                return
+            if self._pool is not None or self._load_failed:
+                return
+            # spawn, а не fork: дочерние процессы не наследуют соединения и потоки приложения
+            pool = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker
+            )
+            loop = asyncio.get_running_loop()
+            try:
+                # Прогрев: модель загружена до первого запроса
+                await asyncio.gather(*(loop.run_in_executor(pool, _warmup) for _ in range(self.workers)))
+            except BrokenProcessPool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                # До рестарта не пытаемся снова: каждая попытка — запуск процессов
+                self._load_failed = True
+                logger.exception("Не удалось загрузить модель модерации фото, фото не проверяются")
+                return
+            self._pool = pool
+
+    async def stop(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def is_inappropriate(self, sha256: str, path: str, url: str) -> bool:
+        return (await self.moderate_batch([(sha256, path, url)]))[0]
+
+    async def moderate_batch(self, images: Sequence[ImageRef], raw: bool = False) -> List[Optional[bool]]:
+        """
+        Вердикт для каждого фото: сначала кэш, промахи — пачками в пул или во внешний API.
+        Ошибка проверки — False (фото пропускается); raw=True — None, чтобы отличить её от «чисто».
+        """
+        verdicts: List[Optional[bool]] = [self._cache_get(sha256) for sha256, _, _ in images]
+        misses = [i for i, verdict in enumerate(verdicts) if verdict is None]
+        IMAGE_MODERATION.labels("cache_hit").inc(len(images) - len(misses))
+
+        if misses:
+            if self.backend == "local":
+                fresh = await self._score_local([images[i][1] for i in misses])
+            else:
+                fresh = await asyncio.gather(*(self._score_remote(images[i][2]) for i in misses))
+            for i, verdict in zip(misses, fresh):
+                verdicts[i] = verdict
+                if verdict is not None:  # ошибку не кэшируем
+                    self._cache_put(images[i][0], verdict)
+                    IMAGE_MODERATION.labels("flagged" if verdict else "clean").inc()
+        return verdicts if raw else [bool(verdict) for verdict in verdicts]
+
+    async def _score_local(self, paths: List[str]) -> List[Optional[bool]]:
+        await self.start()
+        if self._pool is None:
+            IMAGE_MODERATION.labels("error").inc(len(paths))
+            return [None] * len(paths)
+        loop = asyncio.get_running_loop()
+        batches = [paths[i:i + self.batch_size] for i in range(0, len(paths), self.batch_size)]
+        results = await asyncio.gather(
+            *(loop.run_in_executor(self._pool, score_images, b) for b in batches), return_exceptions=True
         )
-        result = response.json()
-        rating = result.get("rating_label", "unknown")
-        return rating in ["adult", "racy", "violent"]
-    except Exception as e:
-        print("Moderation API error:", e)
-        return False  # безопасно по умолчанию
+        verdicts: List[Optional[bool]] = []
+        for batch, scores in zip(batches, results):
+            if isinstance(scores, BaseException):
+                if isinstance(scores, BrokenProcessPool):
+                    self._pool = None  # процесс пула упал — пересоздадим при следующем вызове
+                logger.error("Ошибка модерации фото: %r", scores)
+                IMAGE_MODERATION.labels("error").inc(len(batch))
+                verdicts.extend([None] * len(batch))
+            else:
+                verdicts.extend(score >= self.threshold for score in scores)
+        return verdicts
+
+    async def _score_remote(self, url: str) -> Optional[bool]:
+        await self.start()
+        if not self.breaker.allow():
+            IMAGE_MODERATION.labels("skipped").inc()
+            return None
+        try:
+            with track_external_call("moderatecontent"):
+                response = await self._client.get(
+                    "https://api.moderatecontent.com/moderate/",
+                    params={"key": MODERATECONTENT_API_KEY, "url": f"{PUBLIC_BASE_URL}{url}"},
+                )
+                response.raise_for_status()
+                result = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            self.breaker.failure()
+            IMAGE_MODERATION.labels("error").inc()
+            logger.warning("Moderation API error: %s", e)
+            return None  # безопасно по умолчанию
+        self.breaker.success()
+        return result.get("rating_label", "unknown") in UNSAFE_LABELS
+
+    def _cache_get(self, sha256: str) -> Optional[bool]:
+        verdict = self._cache.get(sha256)
+        if verdict is not None:
+            self._cache.move_to_end(sha256)
+        return verdict
+
+    def _cache_put(self, sha256: str, verdict: bool) -> None:
+        self._cache[sha256] = verdict
+        self._cache.move_to_end(sha256)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+
+image_moderator = ImageModerator()
@@ -0,0 +1,197 @@
+# services/media.py
+"""
+Загрузка фото: потоковая запись на диск с лимитом размера, определение
+типа по сигнатуре и контентная адресация.
+
+Файл читается кусками по CHUNK_SIZE, по ходу считается SHA-256 и
+проверяется MAX_UPLOAD_BYTES. Имя — хэш содержимого, разложенный по
+подкаталогам: media/ab/cd/abcd....jpg. Одинаковые фото хранятся один
+раз, в одном каталоге не больше нескольких тысяч файлов даже при
+миллионах загрузок.
+
+    stored = await save_upload(file)
+    photo = WorkPhoto(..., image_path=stored.url)
+    db.add(photo); db.commit()
+    await confirm_upload(stored)   # отказ до commit — await discard_upload(stored)
+
+Одинаковый файл может одновременно загружаться и удаляться (удалили
+последнюю ссылку, а новая ещё не закоммичена). Поэтому проверка ссылок
+с удалением и появление файла идут под межпроцессной блокировкой имени,
+а загрузка держит копию (жёсткую ссылку) в media/.tmp до commit своей
+строки: confirm_upload вернёт файл на место, если его успели удалить.
+"""
+import fcntl
+import hashlib
+import os
+import tempfile
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from db.database import SessionLocal
+
+MEDIA_DIR = os.getenv("MEDIA_DIR", "media")
+MEDIA_URL = "/media"
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+CHUNK_SIZE = 64 * 1024
+
+# Расширение по первым байтам файла — расширению от клиента не верим
+SIGNATURES = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+)
+
+_TMP_DIR = os.path.join(MEDIA_DIR, ".tmp")
+_LOCK_DIR = os.path.join(MEDIA_DIR, ".locks")
+LOCK_STRIPES = 256
+os.makedirs(_TMP_DIR, exist_ok=True)
+os.makedirs(_LOCK_DIR, exist_ok=True)
+
+
+@dataclass
+class StoredMedia:
+    name: str      # ab/cd/<sha256>.jpg — относительно MEDIA_DIR
+    sha256: str
+    size: int
+    created: bool  # False — такой файл уже был
+    backup: Optional[str] = None  # копия в .tmp до confirm_upload / discard_upload
+
+    @property
+    def url(self) -> str:
+        return f"{MEDIA_URL}/{self.name}"
+
+    @property
+    def path(self) -> str:
+        return os.path.join(MEDIA_DIR, self.name)
+
+
+def detect_image_type(head: bytes) -> Optional[str]:
+    for signature, ext in SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    return None
+
+
+@contextmanager
+def _media_lock(name: str):
+    """flock на одном из LOCK_STRIPES файлов — общий для всех воркеров на этом диске."""
+    path = os.path.join(_LOCK_DIR, f"{zlib.crc32(name.encode()) % LOCK_STRIPES:02x}.lock")
+    with open(path, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def media_name(sha256: str, ext: str) -> str:
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}.{ext}"
+
+
+def _store(source: BinaryIO, max_bytes: int) -> StoredMedia:
+    """Синхронная часть: копирование кусками во временный файл и перенос по хэшу."""
+    head = source.read(CHUNK_SIZE)
+    ext = detect_image_type(head)
+    if ext is None:
+        raise HTTPException(status_code=400, detail="Только jpg и png разрешены")
+
+    digest = hashlib.sha256()
+    size = 0
+    # Временный файл в том же разделе, что и media — os.replace атомарен
+    fd, tmp_path = tempfile.mkstemp(dir=_TMP_DIR)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            chunk = head
+            while chunk:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Файл больше {max_bytes // (1024 * 1024)} МБ"
+                    )
+                digest.update(chunk)
+                out.write(chunk)
+                chunk = source.read(CHUNK_SIZE)
+
+        sha256 = digest.hexdigest()
+        name = media_name(sha256, ext)
+        path = os.path.join(MEDIA_DIR, name)
+        with _media_lock(name):
+            created = not os.path.exists(path)
+            if created:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+                os.link(path, tmp_path)
+        # Временный файл остаётся копией, пока ссылка на файл не закоммичена
+        return StoredMedia(name, sha256, size, created=created, backup=tmp_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+async def save_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> StoredMedia:
+    """Сохраняет загрузку, не блокируя event loop; 400 — не картинка, 413 — слишком большой."""
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Файл больше {max_bytes // (1024 * 1024)} МБ")
+    try:
+        return await run_in_threadpool(_store, file.file, max_bytes)
+    finally:
+        await file.close()
+
+
+def _confirm(stored: StoredMedia) -> None:
+    with _media_lock(stored.name):
+        if os.path.exists(stored.path):
+            os.remove(stored.backup)
+        else:
+            # Файл удалили как неиспользуемый, пока наша строка не была закоммичена
+            os.makedirs(os.path.dirname(stored.path), exist_ok=True)
+            os.replace(stored.backup, stored.path)
+
+
+async def confirm_upload(stored: StoredMedia) -> None:
+    """Вызывать после commit строки со ссылкой на stored.url: файл точно на месте, копия удалена."""
+    await run_in_threadpool(_confirm, stored)
+
+
+def _discard(stored: StoredMedia) -> None:
+    if os.path.exists(stored.backup):
+        os.remove(stored.backup)
+    if stored.created:
+        with SessionLocal() as db:
+            remove_unreferenced(db, stored.url)
+
+
+async def discard_upload(stored: StoredMedia) -> None:
+    """Загрузка не пригодилась (отказ до commit): удаляет копию и новый файл, если он ничей."""
+    await run_in_threadpool(_discard, stored)
+
+
+def remove_unreferenced(db, url: str) -> bool:
+    """
+    Удаляет файл, если на него больше не ссылаются фото работ, заявки и профили.
+    db — синхронная Session; вызывать после удаления своей строки.
+    """
+    # Импорт здесь: модели сами используют services.thumbnails → services.media
+    from models.request import ClientRequest
+    from models.user import User
+    from models.work_photo import WorkPhoto
+
+    name = url.removeprefix(MEDIA_URL + "/")
+    # Под блокировкой: загрузка того же файла не проскочит между проверкой и удалением
+    with _media_lock(name):
+        if db.query(WorkPhoto.id).filter(WorkPhoto.image_path == url).first():
+            return False
+        if db.query(ClientRequest.id).filter(ClientRequest.photo_url == url).first():
+            return False
+        if db.query(User.id).filter(User.photo_url == url).first():
+            return False
+        path = os.path.join(MEDIA_DIR, name)
+        if os.path.exists(path):
+            os.remove(path)
+    return True
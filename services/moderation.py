@@ -1,7 +1,33 @@
 # services/moderation.py
+"""
+Проверка текста на запрещённые слова.
+
+Словарь хранится в таблице moderation_words и редактируется через
+/admin/moderation/words; BAD_WORDS ниже — начальное наполнение.
+Каждый воркер держит собранный ProfanityMatcher вместе с версией
+словаря и подменяет пару целиком, когда версия в БД выросла:
+сразу по уведомлению через hub и, на случай пропущенного уведомления,
+опросом раз в MODERATION_RELOAD_SECONDS. Проверка текста в БД не ходит
+и ничего не пересобирает.
+"""
+import asyncio
+import logging
+import os
 import re
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+
+from core.pubsub import hub
+from db.database import AsyncSessionLocal, insert_ignore
+from models.moderation import ModerationDictionary, ModerationWord
+
+logger = logging.getLogger("moderation")
+
+MODERATION_RELOAD_SECONDS = float(os.getenv("MODERATION_RELOAD_SECONDS", "30"))
+DICTIONARY_TOPIC = "moderation:dictionary"
 
-# Простой список запрещённых слов
+# Начальный список запрещённых слов
 BAD_WORDS = [
 	'аборт',
 	'алкаш',
@@ -162,7 +188,7 @@ BAD_WORDS = [
 	'стерв',
     'стрелять',
     'расстрел',
-    'расстрелять'
+    'расстрелять',
 	'сука',
 	'суки',
 	'сучар',
@@ -222,11 +248,137 @@ BAD_WORDS = [
 	'эрот'
 ]
 
-def contains_bad_words(text: str) -> bool:
-    if not text:
+WORD_RE = re.compile(r"\w+")
+
+
+class BadWordMatch(NamedTuple):
+    term: str   # слово из словаря
+    start: int  # позиция в исходном тексте
+    end: int
+
+
+class ProfanityMatcher:
+    """
+    Словарь, собранный один раз. Слово из словаря ищется целиком (как
+    \bслово\b), поэтому однословные термины — это поиск каждого слова
+    текста в множестве: один проход по тексту, без цикла по словарю.
+    Термины из нескольких слов (с пробелом, дефисом) — одним общим regex.
+    """
+
+    def __init__(self, words: Iterable[str]):
+        words = [w.strip().lower() for w in words if w and w.strip()]
+        self.single = frozenset(w for w in words if WORD_RE.fullmatch(w))
+        phrases = sorted({w for w in words if w not in self.single}, key=len, reverse=True)
+        self.phrase_re = (
+            re.compile(r"(?<!\w)(?:" + "|".join(map(re.escape, phrases)) + r")(?!\w)", re.IGNORECASE)
+            if phrases else None
+        )
+
+    def finditer(self, text: str) -> Iterator[BadWordMatch]:
+        if not text:
+            return
+        for m in WORD_RE.finditer(text):
+            word = m.group().lower()
+            if word in self.single:
+                yield BadWordMatch(word, m.start(), m.end())
+        if self.phrase_re is not None:
+            for m in self.phrase_re.finditer(text):
+                yield BadWordMatch(m.group().lower(), m.start(), m.end())
+
+    def find(self, text: str) -> List[BadWordMatch]:
+        return sorted(self.finditer(text), key=lambda m: m.start)
+
+    def contains(self, text: str) -> bool:
+        return next(self.finditer(text), None) is not None
+
+
+# (версия, matcher) — одна ссылка, подменяется атомарно; 0 — встроенный BAD_WORDS
+_current: Tuple[int, ProfanityMatcher] = (0, ProfanityMatcher(BAD_WORDS))
+
+
+def dictionary_version() -> int:
+    return _current[0]
+
+
+def install_dictionary(version: int, words: Iterable[str]) -> bool:
+    """Собирает matcher и подменяет текущий, если версия новее."""
+    global _current
+    if version <= _current[0]:
+        return False
+    matcher = ProfanityMatcher(words)
+    # Пока собирали, могла установиться версия новее — не откатываемся
+    if version <= _current[0]:
         return False
-    lower_text = text.lower()
-    for word in BAD_WORDS:
-        if re.search(rf"\b{re.escape(word)}\b", lower_text):
-            return True
-    return False
+    _current = (version, matcher)
+    logger.info("Словарь модерации обновлён до версии %d", version)
+    return True
+
+
+def find_bad_words(text: str) -> List[BadWordMatch]:
+    """Все запрещённые слова в тексте с позициями."""
+    return _current[1].find(text)
+
+
+def contains_bad_words(text: str) -> bool:
+    return _current[1].contains(text)
+
+
+def normalize_word(word: str) -> str:
+    return " ".join(word.lower().split())
+
+
+# ────────────────────── ЗАГРУЗКА ИЗ БД ──────────────────────
+async def reload_dictionary() -> bool:
+    """Подгружает словарь, если версия в БД новее; пустую таблицу заполняет BAD_WORDS."""
+    async with AsyncSessionLocal() as db:
+        version = await db.scalar(select(ModerationDictionary.version).where(ModerationDictionary.id == 1))
+        if version is None:
+            # ON CONFLICT DO NOTHING: несколько воркеров стартуют одновременно
+            dialect = db.bind.dialect.name
+            words = list(dict.fromkeys(normalize_word(w) for w in BAD_WORDS))
+            await db.execute(insert_ignore(dialect, ModerationWord, [{"word": w} for w in words], ["word"]))
+            await db.execute(insert_ignore(dialect, ModerationDictionary, [{"id": 1, "version": 1}], ["id"]))
+            await db.commit()
+            version = await db.scalar(select(ModerationDictionary.version).where(ModerationDictionary.id == 1))
+        if version <= dictionary_version():
+            return False
+        words = (await db.scalars(select(ModerationWord.word))).all()
+    # Сборка — вне сессии, соединение уже вернулось в пул
+    return install_dictionary(version, words)
+
+
+class DictionaryWatcher:
+    def __init__(self, poll_seconds: float = MODERATION_RELOAD_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        try:
+            await reload_dictionary()
+        except Exception:
+            logger.exception("Словарь модерации не загружен, используется встроенный")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        subscription = hub.subscribe(DICTIONARY_TOPIC)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(subscription.get(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                try:
+                    await reload_dictionary()
+                except Exception:
+                    logger.exception("Ошибка обновления словаря модерации")
+        finally:
+            hub.unsubscribe(subscription)
+
+
+dictionary_watcher = DictionaryWatcher()
@@ -0,0 +1,311 @@
+# services/moderation_scan.py
+"""
+Повторная модерация уже опубликованного контента — после правки словаря
+или смены политики для фото. Запускает админ (/admin/moderation/scans).
+
+Источники проходятся по порядку (SOURCES), каждый — одним запросом
+с серверным курсором (yield_per): пачки по MODERATION_SCAN_BATCH строк
+без OFFSET и без загрузки таблицы в память. Тексты пачки проверяются
+параллельно в пуле процессов (в каждом — ProfanityMatcher текущего
+словаря), фото — через image_moderator (свой пул и кэш по SHA-256).
+
+Результат пачки пишется одной транзакцией: флаги проверенных объектов
+заменяются найденными (DELETE + многострочный INSERT), а в строку
+moderation_scans — прогресс и точка возобновления (source, last_id).
+Прерванная проверка (рестарт, ошибка) продолжается с последней
+записанной пачки: POST /admin/moderation/scans/{id}/resume.
+"""
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, delete, func, or_, select, update
+
+from core.metrics import MODERATION_SCAN_ITEMS
+from db.database import AsyncSessionLocal, insert_ignore
+from models.moderation import ModerationDictionary, ModerationFlag, ModerationScan, ModerationWord
+from models.rating import Rating
+from models.request import ClientRequest
+from models.user import User
+from models.work_photo import WorkPhoto
+from services.image_moderation import ImageRef, image_moderator
+from services.media import MEDIA_DIR, MEDIA_URL
+from services.moderation import ProfanityMatcher, reload_dictionary
+
+logger = logging.getLogger("moderation_scan")
+
+MODERATION_SCAN_BATCH = int(os.getenv("MODERATION_SCAN_BATCH", "500"))
+MODERATION_SCAN_WORKERS = int(os.getenv("MODERATION_SCAN_WORKERS", str(os.cpu_count() or 1)))
+# running без обновлений дольше этого — воркер умер, проверку можно возобновить
+MODERATION_SCAN_STALE_SECONDS = int(os.getenv("MODERATION_SCAN_STALE_SECONDS", "300"))
+
+SHA256_RE = re.compile(r"[0-9a-f]{64}")
+
+
+class Source(NamedTuple):
+    name: str          # moderation_scans.source
+    content_type: str  # moderation_flags.content_type
+    model: type
+    text: Optional[object]   # колонка с текстом
+    photo: Optional[object]  # колонка с url фото
+
+
+SOURCES = (
+    Source("ratings", "rating", Rating, Rating.review_text, None),
+    Source("requests", "request", ClientRequest, ClientRequest.description, ClientRequest.photo_url),
+    Source("profiles", "profile", User, User.about_me, User.photo_url),
+    Source("work_photos", "work_photo", WorkPhoto, None, WorkPhoto.image_path),
+)
+SOURCE_NAMES = [s.name for s in SOURCES]
+
+
+# ────────────────────── ПРОВЕРКА ТЕКСТОВ (в процессах пула) ──────────────────────
+_matcher: Optional[ProfanityMatcher] = None
+
+
+def _init_worker(words: List[str]) -> None:
+    """Словарь собирается один раз при старте процесса."""
+    global _matcher
+    _matcher = ProfanityMatcher(words)
+
+
+def score_texts(items: Sequence[Tuple[int, str]]) -> List[Tuple[int, List[str]]]:
+    """[(id, текст)] → [(id, найденные слова)] только для текстов с нарушениями."""
+    found = []
+    for content_id, text in items:
+        terms = sorted({m.term for m in _matcher.finditer(text)})
+        if terms:
+            found.append((content_id, terms))
+    return found
+
+
+def _image_ref(url: Optional[str]) -> Optional[ImageRef]:
+    """(sha256, путь, url) для фото из /media; старые файлы (не по хэшу) хэшируются."""
+    if not url or not url.startswith(MEDIA_URL + "/"):
+        return None
+    path = os.path.join(MEDIA_DIR, url[len(MEDIA_URL) + 1:])
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if SHA256_RE.fullmatch(stem) and os.path.isfile(path):
+        return stem, path, url
+    try:
+        with open(path, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest(), path, url
+    except OSError:
+        return None
+
+
+class ModerationScanner:
+    def __init__(self, batch_size: int = MODERATION_SCAN_BATCH, workers: int = MODERATION_SCAN_WORKERS):
+        self.batch_size = batch_size
+        self.workers = workers
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, scan_id: Optional[int] = None) -> ModerationScan:
+        """Новая проверка или продолжение прерванной scan_id; выполняется в фоне."""
+        if self._task is not None and not self._task.done():
+            raise HTTPException(status_code=409, detail="Проверка уже идёт")
+        await reload_dictionary()  # проверяем по актуальному словарю
+
+        stale = datetime.now(timezone.utc) - timedelta(seconds=MODERATION_SCAN_STALE_SECONDS)
+        async with AsyncSessionLocal() as db:
+            if scan_id is None:
+                running = await db.scalar(
+                    select(ModerationScan.id)
+                    .where(ModerationScan.status == "running", ModerationScan.updated_at >= stale)
+                    .limit(1)
+                )
+                if running is not None:
+                    raise HTTPException(status_code=409, detail=f"Проверка #{running} уже идёт")
+                scan = ModerationScan(status="running", dictionary_version=0, source=SOURCES[0].name)
+                db.add(scan)
+                await db.flush()
+                scan_id = scan.id
+            else:
+                # Условный UPDATE: два воркера не возобновят одну проверку
+                claimed = await db.scalar(
+                    update(ModerationScan)
+                    .where(
+                        ModerationScan.id == scan_id,
+                        or_(
+                            ModerationScan.status.in_(("paused", "failed")),
+                            and_(ModerationScan.status == "running", ModerationScan.updated_at < stale),
+                        ),
+                    )
+                    .values(status="running", error=None, updated_at=func.now())
+                    .returning(ModerationScan.id)
+                    .execution_options(synchronize_session=False)
+                )
+                if claimed is None:
+                    scan = await db.get(ModerationScan, scan_id)
+                    if scan is None:
+                        raise HTTPException(status_code=404, detail="Проверка не найдена")
+                    raise HTTPException(
+                        status_code=409,
+                        detail="Проверка уже завершена" if scan.status == "done" else "Проверка уже идёт"
+                    )
+            await db.commit()
+            scan = await db.get(ModerationScan, scan_id, populate_existing=True)
+
+        self._task = asyncio.create_task(self._run(scan_id))
+        return scan
+
+    async def stop(self) -> None:
+        """Останавливает проверку этого воркера; она остаётся paused с последней точкой."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self, scan_id: int) -> None:
+        try:
+            async with AsyncSessionLocal() as db:
+                version = await db.scalar(
+                    select(ModerationDictionary.version).where(ModerationDictionary.id == 1)
+                )
+                words = (await db.scalars(select(ModerationWord.word))).all()
+                scan = await db.get(ModerationScan, scan_id)
+                scan.dictionary_version = version
+                source_name, last_id = scan.source, scan.last_id
+                await db.commit()
+
+            logger.info("Проверка #%d: словарь v%d, с %s после id %d", scan_id, version, source_name, last_id)
+            # spawn: дочерние процессы не наследуют соединения и потоки приложения
+            pool = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker, initargs=(list(words),)
+            )
+            try:
+                for source in SOURCES[SOURCE_NAMES.index(source_name):]:
+                    await self._scan_source(scan_id, source, last_id if source.name == source_name else 0, pool)
+            finally:
+                pool.shutdown(wait=False, cancel_futures=True)
+            await self._set_status(scan_id, "done", finished_at=func.now())
+            logger.info("Проверка #%d завершена", scan_id)
+        except asyncio.CancelledError:
+            await self._set_status(scan_id, "paused")
+            raise
+        except Exception as e:
+            logger.exception("Проверка #%d прервана ошибкой", scan_id)
+            await self._set_status(scan_id, "failed", error=repr(e))
+
+    async def _scan_source(self, scan_id: int, source: Source, last_id: int, pool: ProcessPoolExecutor) -> None:
+        model = source.model
+        columns = [model.id.label("id")]
+        if source.text is not None:
+            columns.append(source.text.label("text"))
+        if source.photo is not None:
+            columns.append(source.photo.label("photo"))
+
+        # Отдельная сессия на чтение: commit пачек не закрывает курсор
+        async with AsyncSessionLocal() as reader:
+            result = await reader.stream(
+                select(*columns).where(model.id > last_id).order_by(model.id)
+                .execution_options(yield_per=self.batch_size)
+            )
+            async for rows in result.partitions():
+                started = time.monotonic()
+                flags, errors = await self._score(source, rows, pool)
+                await self._save(scan_id, source, rows, flags, errors, time.monotonic() - started)
+
+    async def _score(self, source: Source, rows, pool: ProcessPoolExecutor) -> Tuple[dict, int]:
+        """{kind: (проверенные id, [(id, terms)])} для пачки и число объектов, не проверенных из-за ошибки."""
+        loop = asyncio.get_running_loop()
+        flags = {}
+        errors = {}
+
+        async def texts():
+            items = [(row.id, row.text) for row in rows if row.text]
+            step = max(1, -(-len(items) // self.workers))
+            chunks = [items[i:i + step] for i in range(0, len(items), step)]
+            results = await asyncio.gather(*(loop.run_in_executor(pool, score_texts, c) for c in chunks))
+            found = [(content_id, ", ".join(terms)) for chunk in results for content_id, terms in chunk]
+            flags["text"] = ([row.id for row in rows], found)
+
+        async def photos():
+            refs = await asyncio.to_thread(lambda: [(row.id, _image_ref(row.photo)) for row in rows])
+            refs = [(content_id, ref) for content_id, ref in refs if ref is not None]
+            verdicts = await image_moderator.moderate_batch([ref for _, ref in refs], raw=True)
+            # Ошибка проверки (модель не загрузилась, пул упал, API недоступен) — не «чисто»:
+            # такие id не проверены, их флаги не трогаем
+            checked = [content_id for (content_id, _), verdict in zip(refs, verdicts) if verdict is not None]
+            found = [(content_id, None) for (content_id, _), verdict in zip(refs, verdicts) if verdict]
+            flags["photo"] = (checked, found)
+            errors["photo"] = len(refs) - len(checked)
+
+        jobs = []
+        if source.text is not None:
+            jobs.append(texts())
+        if source.photo is not None:
+            jobs.append(photos())
+        await asyncio.gather(*jobs)
+        return flags, sum(errors.values())
+
+    async def _save(self, scan_id: int, source: Source, rows, flags: dict, errors: int, elapsed: float) -> None:
+        """Флаги пачки и точка возобновления — одной транзакцией."""
+        flagged = 0
+        async with AsyncSessionLocal() as db:
+            for kind, (checked, found) in flags.items():
+                if checked:
+                    await db.execute(
+                        delete(ModerationFlag)
+                        .where(
+                            ModerationFlag.content_type == source.content_type,
+                            ModerationFlag.kind == kind,
+                            ModerationFlag.content_id.in_(checked),
+                        )
+                        .execution_options(synchronize_session=False)
+                    )
+                if found:
+                    await db.execute(insert_ignore(
+                        db.bind.dialect.name, ModerationFlag,
+                        [
+                            {"content_type": source.content_type, "content_id": content_id,
+                             "kind": kind, "terms": terms, "scan_id": scan_id}
+                            for content_id, terms in found
+                        ],
+                        ["content_type", "content_id", "kind"],
+                    ))
+                    flagged += len(found)
+            scan = (await db.execute(
+                update(ModerationScan)
+                .where(ModerationScan.id == scan_id)
+                .values(
+                    source=source.name,
+                    last_id=rows[-1].id,
+                    processed=ModerationScan.processed + len(rows),
+                    flagged=ModerationScan.flagged + flagged,
+                    errors=ModerationScan.errors + errors,
+                    elapsed_seconds=ModerationScan.elapsed_seconds + elapsed,
+                    updated_at=func.now(),
+                )
+                .returning(ModerationScan.processed, ModerationScan.elapsed_seconds)
+                .execution_options(synchronize_session=False)
+            )).one()
+            await db.commit()
+
+        MODERATION_SCAN_ITEMS.labels(source.name).inc(len(rows))
+        logger.info(
+            "Проверка #%d: %s до id %d, всего %d (%.0f/с), в пачке нарушений %d, ошибок %d",
+            scan_id, source.name, rows[-1].id, scan.processed,
+            scan.processed / scan.elapsed_seconds if scan.elapsed_seconds else 0, flagged, errors
+        )
+
+    async def _set_status(self, scan_id: int, status: str, **values) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(ModerationScan).where(ModerationScan.id == scan_id)
+                .values(status=status, updated_at=func.now(), **values)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+
+moderation_scanner = ModerationScanner()
@@ -0,0 +1,226 @@
+# services/outbox.py
+"""
+Transactional outbox для уведомлений и push.
+
+Хендлер пишет событие в outbox_events в той же транзакции, что и
+бизнес-изменение (заявка, заказ, платёж, отзыв):
+    notify_user(db, f"payment:{payment.id}:paid", user_id, "...")
+    db.commit()
+Откат транзакции — нет события; падение процесса после commit — событие
+дождётся relay.
+
+Relay забирает пачку необработанных событий через
+SELECT ... FOR UPDATE SKIP LOCKED, создаёт Notification с ключом
+доставки "<ключ события>:<user_id>" (INSERT ... ON CONFLICT DO NOTHING —
+повторная обработка не дублирует уведомления) и отмечает событие
+обработанным в той же транзакции; там же растёт счётчик непрочитанных
+NotificationUnreadCounter. Push ставится в очередь после commit
+и только для реально вставленных уведомлений.
+
+Relay можно запускать в нескольких процессах — SKIP LOCKED не даст им
+взять одно событие:
+    python -m services.outbox
+По умолчанию relay работает и внутри приложения (OUTBOX_RELAY_IN_APP=0 — выключить).
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import String, cast, func, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.database import AsyncSessionLocal, insert_from_select_ignore, insert_ignore, upsert
+from models.notification import Notification, NotificationUnreadCounter
+from models.outbox import OutboxEvent
+from models.user import User
+from services.push import PushDispatcher, push_dispatcher
+
+logger = logging.getLogger("outbox")
+
+OUTBOX_RELAY_IN_APP = os.getenv("OUTBOX_RELAY_IN_APP", "1") == "1"
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "1"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+
+
+# ────────────────────── ЗАПИСЬ СОБЫТИЙ (в транзакции хендлера) ──────────────────────
+def _push(title: Optional[str], body: Optional[str]) -> Optional[dict]:
+    return {"title": title, "body": body} if title else None
+
+
+def notify_user(db, key: str, user_id: int, message: str,
+                push_title: Optional[str] = None, push_body: Optional[str] = None) -> None:
+    """Уведомление одному пользователю. db — Session или AsyncSession, commit делает хендлер."""
+    db.add(OutboxEvent(event_type="notify", key=key, payload={
+        "user_id": user_id, "message": message, "push": _push(push_title, push_body),
+    }))
+
+
+def notify_masters(db, key: str, city: str, category_id: int, message: str,
+                   push_title: Optional[str] = None, push_body: Optional[str] = None) -> None:
+    """Уведомление всем подтверждённым мастерам города и категории."""
+    db.add(OutboxEvent(event_type="notify_masters", key=key, payload={
+        "city": city, "category_id": category_id, "message": message, "push": _push(push_title, push_body),
+    }))
+
+
+# ────────────────────── ДОСТАВКА ──────────────────────
+async def _insert_notifications(db: AsyncSession, key: str, user_ids: List[int], message: str) -> List[int]:
+    """Вставляет уведомления, пропуская уже доставленные; возвращает новых получателей."""
+    if not user_ids:
+        return []
+    rows = [{"user_id": user_id, "message": message, "delivery_key": f"{key}:{user_id}"} for user_id in user_ids]
+    result = await db.execute(
+        insert_ignore(db.bind.dialect.name, Notification, rows, ["delivery_key"]).returning(Notification.user_id)
+    )
+    return await _count_unread(db, result.scalars().all())
+
+
+async def _count_unread(db: AsyncSession, user_ids: List[int]) -> List[int]:
+    """+1 к счётчику непрочитанных каждому новому получателю (в той же транзакции)."""
+    if user_ids:
+        await db.execute(upsert(
+            db.bind.dialect.name, NotificationUnreadCounter,
+            # По возрастанию id — параллельные relay блокируют строки в одном порядке
+            [{"user_id": user_id, "unread_count": 1} for user_id in sorted(user_ids)],
+            ["user_id"],
+            {"unread_count": NotificationUnreadCounter.unread_count + 1},
+        ))
+    return user_ids
+
+
+async def _deliver_notify(db: AsyncSession, event: OutboxEvent) -> List[int]:
+    return await _insert_notifications(db, event.key, [event.payload["user_id"]], event.payload["message"])
+
+
+async def insert_master_notifications(db: AsyncSession, key: str, city: str, category_id: int,
+                                      message: str) -> List[int]:
+    """
+    Рассылка мастерам одним INSERT ... SELECT из users: без загрузки мастеров
+    в Python и без отдельного INSERT на каждого. Возвращает новых получателей.
+    """
+    masters = select(
+        User.id,
+        literal(message),
+        literal(f"{key}:") + cast(User.id, String),
+    ).where(
+        User.user_type == "master",
+        User.city == city,
+        User.category_id == category_id,
+        User.is_verified == True
+    )
+    result = await db.execute(
+        insert_from_select_ignore(
+            db.bind.dialect.name, Notification, ["user_id", "message", "delivery_key"], masters, ["delivery_key"]
+        ).returning(Notification.user_id)
+    )
+    return await _count_unread(db, result.scalars().all())
+
+
+async def _deliver_notify_masters(db: AsyncSession, event: OutboxEvent) -> List[int]:
+    payload = event.payload
+    return await insert_master_notifications(db, event.key, payload["city"], payload["category_id"], payload["message"])
+
+
+HANDLERS = {
+    "notify": _deliver_notify,
+    "notify_masters": _deliver_notify_masters,
+}
+
+
+class OutboxRelay:
+    def __init__(self, dispatcher: PushDispatcher = push_dispatcher,
+                 batch_size: int = OUTBOX_BATCH_SIZE, poll_seconds: float = OUTBOX_POLL_SECONDS):
+        self.dispatcher = dispatcher
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> int:
+        """Обрабатывает одну пачку; возвращает число взятых событий."""
+        pushes = []
+        async with AsyncSessionLocal() as db:
+            events = (await db.scalars(
+                select(OutboxEvent)
+                .where(OutboxEvent.processed_at.is_(None), OutboxEvent.available_at <= func.now())
+                .order_by(OutboxEvent.available_at, OutboxEvent.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )).all()
+
+            for event in events:
+                event_id = event.id
+                try:
+                    recipients = await HANDLERS[event.event_type](db, event)
+                except Exception as e:
+                    # Откатываем пачку целиком; остальные события возьмём следующим проходом
+                    await db.rollback()
+                    await self._postpone(event_id, e)
+                    return len(events)
+                event.processed_at = func.now()
+                if recipients and event.payload.get("push"):
+                    pushes.append((recipients, event.payload["push"]))
+            await db.commit()
+
+            # Push — после commit и только новым получателям
+            for recipients, push in pushes:
+                tokens = (await db.scalars(select(User.device_token).where(
+                    User.id.in_(recipients), User.device_token.isnot(None)
+                ))).all()
+                self.dispatcher.enqueue(tokens, push["title"], push["body"])
+        return len(events)
+
+    async def _postpone(self, event_id: int, error: Exception) -> None:
+        logger.exception("Событие outbox %s не доставлено", event_id)
+        async with AsyncSessionLocal() as db:
+            attempts = await db.scalar(select(OutboxEvent.attempts).where(OutboxEvent.id == event_id)) + 1
+            values = {"attempts": attempts, "last_error": repr(error)[:1000]}
+            if attempts >= OUTBOX_MAX_ATTEMPTS:
+                # Больше не пытаемся: событие остаётся в таблице с last_error для разбора
+                values["processed_at"] = func.now()
+            else:
+                delay = min(2 ** attempts, 600)
+                values["available_at"] = datetime.now(timezone.utc) + timedelta(seconds=delay)
+            await db.execute(update(OutboxEvent).where(OutboxEvent.id == event_id).values(**values))
+            await db.commit()
+
+    async def run(self) -> None:
+        while True:
+            try:
+                taken = await self.run_once()
+            except Exception:
+                logger.exception("Ошибка relay outbox")
+                taken = 0
+            # Полная пачка — сразу за следующей, иначе ждём
+            if taken < self.batch_size:
+                await asyncio.sleep(self.poll_seconds)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+outbox_relay = OutboxRelay()
+
+
+async def _main() -> None:
+    from models import (  # noqa: F401 — все модели нужны для настройки мапперов
+        payment, order, rating, request, category, chat, sms_code, work_photo
+    )
+    logging.basicConfig(level=logging.INFO)
+    await push_dispatcher.start()
+    try:
+        await outbox_relay.run()
+    finally:
+        await push_dispatcher.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
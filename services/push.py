@@ -1,13 +1,38 @@
 # services/push.py
+"""
+Push-уведомления через Firebase Cloud Messaging.
 
+Хендлеры не ждут FCM: push_dispatcher.enqueue() кладёт пачку токенов в
+очередь и сразу возвращается. Фоновые воркеры (PUSH_CONCURRENCY штук)
+отправляют пачки до 500 токенов через send_each_for_multicast_async,
+повторяют временные ошибки с экспоненциальной задержкой и обнуляют
+device_token, про которые FCM ответил UNREGISTERED.
+
+Очередь в памяти процесса: при рестарте неотправленное теряется.
+FCM_ENDPOINT — адрес FCM v1 (для локального benchmarks/fake_fcm.py).
+"""
+import asyncio
+import logging
 import os
+import random
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional
+
 import firebase_admin
-from firebase_admin import credentials, messaging
+from firebase_admin import credentials, exceptions, messaging
 from dotenv import load_dotenv
+from sqlalchemy import update
+
+from core.metrics import PUSH_MESSAGES, PUSH_QUEUE_DEPTH, track_external_call
+from core.principal_cache import principal_cache
+from db.database import AsyncSessionLocal
+from models.user import User
 
 # Загружаем переменные окружения
 load_dotenv()
 
+logger = logging.getLogger("push")
+
 # Путь к JSON-файлу ключа сервисного аккаунта Firebase
 firebase_credentials_path = os.getenv("FIREBASE_CREDENTIALS")
 
@@ -19,14 +44,189 @@ if not firebase_admin._apps:
     except Exception as e:
         print(f"❌ Ошибка инициализации Firebase: {e}")
 
-async def send_push_notification(token: str, title: str, body: str):
-    """Отправка Push через Firebase Admin SDK"""
-    try:
-        message = messaging.Message(
-            notification=messaging.Notification(title=title, body=body),
-            token=token
+if os.getenv("FCM_ENDPOINT"):
+    # Формат как у FCM: .../v1/projects/{0}/messages:send
+    messaging._MessagingService.FCM_URL = os.getenv("FCM_ENDPOINT")
+
+FCM_BATCH_SIZE = 500  # лимит FCM на один multicast
+PUSH_CONCURRENCY = int(os.getenv("PUSH_CONCURRENCY", "4"))
+PUSH_QUEUE_SIZE = int(os.getenv("PUSH_QUEUE_SIZE", "10000"))
+PUSH_MAX_ATTEMPTS = int(os.getenv("PUSH_MAX_ATTEMPTS", "5"))
+PUSH_BACKOFF_SECONDS = float(os.getenv("PUSH_BACKOFF_SECONDS", "1"))
+
+# Токен больше не действителен — удаляем
+UNREGISTERED_ERRORS = (messaging.UnregisteredError, messaging.SenderIdMismatchError)
+# Временные ошибки — повторяем
+RETRYABLE_ERRORS = (
+    messaging.QuotaExceededError,
+    exceptions.UnavailableError,
+    exceptions.InternalError,
+    exceptions.DeadlineExceededError,
+    exceptions.UnknownError,
+)
+
+
+@dataclass
+class PushBatch:
+    tokens: List[str]
+    title: str
+    body: str
+    attempt: int = 1
+
+
+async def _send_fcm(batch: PushBatch) -> messaging.BatchResponse:
+    message = messaging.MulticastMessage(
+        notification=messaging.Notification(title=batch.title, body=batch.body),
+        tokens=batch.tokens,
+    )
+    with track_external_call("fcm"):
+        return await messaging.send_each_for_multicast_async(message)
+
+
+async def prune_tokens(tokens: List[str]) -> None:
+    """Обнуляет device_token, которые FCM больше не принимает."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            update(User)
+            .where(User.device_token.in_(tokens))
+            .values(device_token=None)
+            .returning(User.id)
+            .execution_options(synchronize_session=False)
         )
-        response = messaging.send(message)
-        print(f"✅ Push-уведомление отправлено: {response}")
-    except Exception as e:
-        print(f"❌ Ошибка при отправке push: {e}")
+        user_ids = result.scalars().all()
+        await db.commit()
+    for user_id in user_ids:
+        principal_cache.invalidate(user_id)
+    logger.info("Удалено недействительных токенов: %d", len(user_ids))
+
+
+class PushDispatcher:
+    def __init__(
+        self,
+        send: Callable[[PushBatch], Awaitable[messaging.BatchResponse]] = _send_fcm,
+        on_unregistered: Callable[[List[str]], Awaitable[None]] = prune_tokens,
+        concurrency: int = PUSH_CONCURRENCY,
+        queue_size: int = PUSH_QUEUE_SIZE,
+    ):
+        self._send = send
+        self._on_unregistered = on_unregistered
+        self._concurrency = concurrency
+        self._queue_size = queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._scheduled_retries = 0
+
+    def enqueue(self, tokens: List[str], title: str, body: str) -> bool:
+        """Не блокирует: режет токены на пачки по 500 и ставит в очередь."""
+        tokens = [t for t in dict.fromkeys(tokens) if t]
+        if not tokens:
+            return True
+        if self._queue is None:
+            logger.warning("Диспетчер push не запущен, %d уведомлений пропущено", len(tokens))
+            PUSH_MESSAGES.labels("dropped").inc(len(tokens))
+            return False
+        for i in range(0, len(tokens), FCM_BATCH_SIZE):
+            if not self._put(PushBatch(tokens[i:i + FCM_BATCH_SIZE], title, body)):
+                return False
+        return True
+
+    def _put(self, batch: PushBatch) -> bool:
+        try:
+            self._queue.put_nowait(batch)
+        except asyncio.QueueFull:
+            logger.warning("Очередь push переполнена, %d уведомлений пропущено", len(batch.tokens))
+            PUSH_MESSAGES.labels("dropped").inc(len(batch.tokens))
+            return False
+        PUSH_QUEUE_DEPTH.inc()
+        return True
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(self._queue_size)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self._concurrency)]
+
+    async def stop(self, drain_timeout: float = 5) -> None:
+        """Даёт воркерам дослать очередь, затем останавливает их."""
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self.drain(), drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Не отправлено при остановке: %d пачек", self._queue.qsize())
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    async def drain(self) -> None:
+        """Ждёт, пока опустеют очередь и отложенные повторы."""
+        while True:
+            await self._queue.join()
+            if not self._scheduled_retries:
+                return
+            await asyncio.sleep(0.05)
+
+    async def _worker(self) -> None:
+        while True:
+            batch = await self._queue.get()
+            PUSH_QUEUE_DEPTH.dec()
+            try:
+                await self._deliver(batch)
+            except Exception:
+                logger.exception("Ошибка отправки push-пачки")
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, batch: PushBatch) -> None:
+        try:
+            response = await self._send(batch)
+        except RETRYABLE_ERRORS as e:
+            logger.warning("FCM недоступен (%s), пачка будет повторена", e)
+            self._retry(batch, batch.tokens)
+            return
+
+        retry, unregistered, failed = [], [], 0
+        for token, result in zip(batch.tokens, response.responses):
+            if result.success:
+                continue
+            if isinstance(result.exception, UNREGISTERED_ERRORS):
+                unregistered.append(token)
+            elif isinstance(result.exception, RETRYABLE_ERRORS):
+                retry.append(token)
+            else:
+                failed += 1
+                logger.warning("Push не доставлен: %s", result.exception)
+
+        PUSH_MESSAGES.labels("sent").inc(response.success_count)
+        PUSH_MESSAGES.labels("failed").inc(failed)
+        if unregistered:
+            PUSH_MESSAGES.labels("unregistered").inc(len(unregistered))
+            await self._on_unregistered(unregistered)
+        if retry:
+            self._retry(batch, retry)
+
+    def _retry(self, batch: PushBatch, tokens: List[str]) -> None:
+        if batch.attempt >= PUSH_MAX_ATTEMPTS:
+            logger.warning("Push не доставлен после %d попыток: %d токенов", batch.attempt, len(tokens))
+            PUSH_MESSAGES.labels("failed").inc(len(tokens))
+            return
+        PUSH_MESSAGES.labels("retried").inc(len(tokens))
+        # 1, 2, 4, 8... с разбросом, чтобы повторы не шли одной волной
+        delay = PUSH_BACKOFF_SECONDS * 2 ** (batch.attempt - 1) * random.uniform(0.5, 1.5)
+        self._scheduled_retries += 1
+        asyncio.get_running_loop().call_later(
+            delay, self._put_retry, PushBatch(tokens, batch.title, batch.body, batch.attempt + 1)
+        )
+
+    def _put_retry(self, batch: PushBatch) -> None:
+        self._scheduled_retries -= 1
+        if self._queue is not None:
+            self._put(batch)
+
+
+push_dispatcher = PushDispatcher()
+
+
+async def send_push_notification(token: str, title: str, body: str):
+    """Ставит одно уведомление в очередь диспетчера (не ждёт FCM)."""
+    push_dispatcher.enqueue([token], title, body)
@@ -0,0 +1,105 @@
+# services/request_quota.py
+"""
+Лимит заявок клиента: FREE_REQUESTS_PER_DAY бесплатных в сутки (UTC),
+сверх них — оплаченные extra_request.
+
+Счётчик — одна строка request_quotas на клиента, вместо COUNT(*) по
+client_requests. Списание — условный UPDATE ... WHERE <есть остаток>
+в транзакции вставки заявки: параллельные заявки блокируются на строке,
+а условие перепроверяется после блокировки, так что лишняя не пройдёт.
+
+    if not await has_quota(db, user.id): 402    # до загрузки файла, без блокировок
+    use = await consume_quota(db, user.id)      # перед commit заявки; None — лимит исчерпан
+"""
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import case, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from db.database import insert_ignore, upsert
+from models.payment import Payment
+from models.request import RequestQuota
+
+FREE_REQUESTS_PER_DAY = 5
+
+
+@dataclass
+class QuotaUse:
+    is_paid: bool
+    payment_id: Optional[int] = None  # какой платёж extra_request потрачен
+
+
+def _today() -> date:
+    return datetime.utcnow().date()
+
+
+async def has_quota(db: AsyncSession, client_id: int) -> bool:
+    """Быстрая проверка без блокировок — чтобы не принимать файл, если заявку всё равно не создать."""
+    quota = (await db.execute(
+        select(RequestQuota.day, RequestQuota.free_used, RequestQuota.paid_credits)
+        .where(RequestQuota.client_id == client_id)
+    )).first()
+    if quota is None:
+        return True
+    return quota.day != _today() or quota.free_used < FREE_REQUESTS_PER_DAY or quota.paid_credits > 0
+
+
+async def consume_quota(db: AsyncSession, client_id: int) -> Optional[QuotaUse]:
+    """Списывает бесплатную заявку, иначе оплаченную. Commit делает хендлер вместе с заявкой."""
+    today = _today()
+    await db.execute(insert_ignore(
+        db.bind.dialect.name, RequestQuota,
+        [{"client_id": client_id, "day": today, "free_used": 0, "paid_credits": 0}], ["client_id"]
+    ))
+
+    # Новый день — счётчик бесплатных начинается заново
+    free = await db.scalar(
+        update(RequestQuota)
+        .where(
+            RequestQuota.client_id == client_id,
+            or_(RequestQuota.day != today, RequestQuota.free_used < FREE_REQUESTS_PER_DAY)
+        )
+        .values(day=today, free_used=case((RequestQuota.day == today, RequestQuota.free_used + 1), else_=1))
+        .returning(RequestQuota.client_id)
+        .execution_options(synchronize_session=False)
+    )
+    if free is not None:
+        return QuotaUse(is_paid=False)
+
+    paid = await db.scalar(
+        update(RequestQuota)
+        .where(RequestQuota.client_id == client_id, RequestQuota.paid_credits > 0)
+        .values(paid_credits=RequestQuota.paid_credits - 1)
+        .returning(RequestQuota.client_id)
+        .execution_options(synchronize_session=False)
+    )
+    if paid is None:
+        return None
+
+    # Привязываем заявку к самому старому неиспользованному платежу
+    payment_id = await db.scalar(
+        select(Payment.id)
+        .where(Payment.user_id == client_id, Payment.purpose == "extra_request", Payment.is_active == True)
+        .order_by(Payment.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    if payment_id is not None:
+        await db.execute(
+            update(Payment).where(Payment.id == payment_id).values(is_active=False)
+            .execution_options(synchronize_session=False)
+        )
+    return QuotaUse(is_paid=True, payment_id=payment_id)
+
+
+def add_paid_credit(db: Session, client_id: int) -> None:
+    """+1 оплаченная заявка; вызывать в транзакции платежа extra_request."""
+    db.execute(upsert(
+        db.bind.dialect.name, RequestQuota,
+        {"client_id": client_id, "day": _today(), "free_used": 0, "paid_credits": 1},
+        ["client_id"],
+        {"paid_credits": RequestQuota.paid_credits + 1},
+    ))
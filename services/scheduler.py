@@ -5,9 +5,17 @@ from sqlalchemy.orm import Session
 from db.database import SessionLocal
 from models.user import User
 from models.payment import Payment
-from datetime import datetime, timedelta
+from models.notification import Notification
+from services.thumbnails import evict_thumbnails
+from services.reputation import reconcile_reputation
+from services.unread_counters import reconcile_unread_counters
+from sqlalchemy import delete, select
+from datetime import datetime, timedelta, timezone
+import os
 import pytz
+from core.metrics import track_job, SCHEDULER_JOB_FAILURES
 
+@track_job("promote_masters")
 def promote_masters_job():
     db: Session = SessionLocal()
     try:
@@ -50,10 +58,12 @@ def promote_masters_job():
         print(f"✅ Продвинуто мастеров: {len(promoted_ids)} | ID: {promoted_ids}")
 
     except Exception as e:
+        SCHEDULER_JOB_FAILURES.labels("promote_masters").inc()
         print("❌ Ошибка в promote_masters_job:", str(e))
     finally:
         db.close()
 
+@track_job("reset_daily_promotions")
 def reset_daily_promotions():
     db: Session = SessionLocal()
     try:
@@ -63,13 +73,86 @@ def reset_daily_promotions():
         db.commit()
         print("♻️ Сброшен дневной счётчик продвижений")
     except Exception as e:
+        SCHEDULER_JOB_FAILURES.labels("reset_daily_promotions").inc()
         print("❌ Ошибка в reset_daily_promotions:", str(e))
     finally:
         db.close()
 
+# Прочитанные уведомления старше N дней удаляются пачками
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", "90"))
+NOTIFICATION_RETENTION_BATCH = int(os.getenv("NOTIFICATION_RETENTION_BATCH", "5000"))
+
+
+@track_job("compact_notifications")
+def compact_notifications():
+    db: Session = SessionLocal()
+    try:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=NOTIFICATION_RETENTION_DAYS)
+        total = 0
+        while True:
+            # Короткие транзакции: не держим блокировки на весь объём и не раздуваем WAL
+            batch = select(Notification.id).where(
+                Notification.is_read.is_(True),
+                Notification.created_at < cutoff
+            ).limit(NOTIFICATION_RETENTION_BATCH)
+            deleted = db.execute(
+                delete(Notification).where(Notification.id.in_(batch.scalar_subquery()))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+            total += deleted
+            if deleted < NOTIFICATION_RETENTION_BATCH:
+                break
+        print(f"🧹 Удалено старых прочитанных уведомлений: {total}")
+    except Exception as e:
+        SCHEDULER_JOB_FAILURES.labels("compact_notifications").inc()
+        print("❌ Ошибка в compact_notifications:", str(e))
+    finally:
+        db.close()
+
+@track_job("evict_thumbnails")
+def evict_thumbnails_job():
+    try:
+        removed = evict_thumbnails()
+        if removed:
+            print(f"🧹 Удалено уменьшенных копий из кэша: {removed}")
+    except Exception as e:
+        SCHEDULER_JOB_FAILURES.labels("evict_thumbnails").inc()
+        print("❌ Ошибка в evict_thumbnails:", str(e))
+
+@track_job("reconcile_reputation")
+def reconcile_reputation_job():
+    db: Session = SessionLocal()
+    try:
+        fixed = reconcile_reputation(db)
+        if fixed:
+            print(f"⭐ Исправлены агрегаты отзывов у пользователей: {fixed}")
+    except Exception as e:
+        SCHEDULER_JOB_FAILURES.labels("reconcile_reputation").inc()
+        print("❌ Ошибка в reconcile_reputation:", str(e))
+    finally:
+        db.close()
+
+@track_job("reconcile_unread_counters")
+def reconcile_unread_counters_job():
+    db: Session = SessionLocal()
+    try:
+        fixed = reconcile_unread_counters(db)
+        if fixed:
+            print(f"📬 Исправлены счётчики непрочитанного: {fixed}")
+    except Exception as e:
+        SCHEDULER_JOB_FAILURES.labels("reconcile_unread_counters").inc()
+        print("❌ Ошибка в reconcile_unread_counters:", str(e))
+    finally:
+        db.close()
+
 def start_scheduler():
     scheduler = BackgroundScheduler(timezone=pytz.timezone("Asia/Almaty"))
     scheduler.add_job(promote_masters_job, IntervalTrigger(minutes=15))
     scheduler.add_job(reset_daily_promotions, CronTrigger(hour=0, minute=0))
+    scheduler.add_job(compact_notifications, CronTrigger(hour=3, minute=30))
+    scheduler.add_job(evict_thumbnails_job, IntervalTrigger(hours=1))
+    scheduler.add_job(reconcile_reputation_job, CronTrigger(hour=4, minute=0))
+    scheduler.add_job(reconcile_unread_counters_job, CronTrigger(hour=4, minute=15))
     scheduler.start()
     print("🕒 Планировщик APScheduler запущен")
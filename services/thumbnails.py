@@ -0,0 +1,172 @@
+# services/thumbnails.py
+"""
+Уменьшенные копии фото для списков и карточек.
+
+Для каждого фото из /media — WebP и JPEG шириной THUMB_WIDTHS, без EXIF
+(ориентация применяется до удаления). Лежат в media/thumbs и отдаются
+по /thumbs/<ширина>/<имя оригинала без расширения>.<webp|jpg>:
+    /media/ab/cd/<sha256>.jpg → /thumbs/480/ab/cd/<sha256>.webp
+
+Копии создаются в фоне после загрузки (generate_derivatives), а если
+какой-то нет (старые фото, вытеснена из кэша) — при первом запросе
+(DerivativeFiles). Каталог ограничен THUMB_CACHE_MAX_BYTES: задача
+evict_thumbnails удаляет давно не читанные копии — они пересоздадутся
+по запросу.
+"""
+import logging
+import os
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException
+from starlette.staticfiles import StaticFiles
+
+from services.media import MEDIA_DIR, MEDIA_URL
+
+logger = logging.getLogger("thumbnails")
+
+THUMB_WIDTHS = (160, 480, 1080)
+THUMB_FORMATS = {"webp": "WEBP", "jpg": "JPEG"}
+THUMB_QUALITY = 80
+THUMB_DIR = os.path.join(MEDIA_DIR, "thumbs")
+THUMB_URL = "/thumbs"
+THUMB_CACHE_MAX_BYTES = int(os.getenv("THUMB_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+# Оригиналы: новые — по хэшу (jpg/png), старые — uuid с расширением от клиента
+SOURCE_EXTENSIONS = ("jpg", "png", "jpeg", "JPG", "PNG", "JPEG")
+
+os.makedirs(THUMB_DIR, exist_ok=True)
+
+
+def derivative_urls(url: Optional[str]) -> Optional[Dict[int, Dict[str, str]]]:
+    """{480: {"webp": "/thumbs/480/...webp", "jpg": "/thumbs/480/...jpg"}, ...} для фото из /media."""
+    if not url or not url.startswith(MEDIA_URL + "/"):
+        return None
+    stem = os.path.splitext(url[len(MEDIA_URL) + 1:])[0]
+    return {
+        width: {fmt: f"{THUMB_URL}/{width}/{stem}.{fmt}" for fmt in THUMB_FORMATS}
+        for width in THUMB_WIDTHS
+    }
+
+
+def _render(image: Image.Image, width: int, fmt: str, target: str) -> None:
+    if image.width > width:
+        height = round(image.height * width / image.width)
+        image = image.resize((width, height), Image.LANCZOS)
+    if fmt == "jpg" and image.mode != "RGB":
+        image = image.convert("RGB")
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # Во временный файл и os.replace: параллельный запрос не увидит недописанный файл
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            # exif не передаём — метаданные (в т.ч. геолокация) не копируются
+            image.save(out, THUMB_FORMATS[fmt], quality=THUMB_QUALITY, optimize=True)
+        os.replace(tmp_path, target)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _open_source(source: str) -> Image.Image:
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        image.load()
+        return image
+
+
+def generate_derivatives(name: str, widths: Tuple[int, ...] = THUMB_WIDTHS) -> List[str]:
+    """
+    Все копии для оригинала media/<name>; уже существующие пропускаются.
+    Синхронная — для BackgroundTasks (выполняются в пуле потоков после ответа).
+    """
+    stem = os.path.splitext(name)[0]
+    targets = [
+        (width, fmt, os.path.join(THUMB_DIR, str(width), f"{stem}.{fmt}"))
+        for width in widths for fmt in THUMB_FORMATS
+    ]
+    missing = [t for t in targets if not os.path.exists(t[2])]
+    if not missing:
+        return []
+    try:
+        image = _open_source(os.path.join(MEDIA_DIR, name))
+    except (OSError, UnidentifiedImageError):
+        logger.warning("Не удалось открыть %s для уменьшенных копий", name, exc_info=True)
+        return []
+    # Декодируем оригинал один раз, от большей ширины к меньшей
+    for width, fmt, target in sorted(missing, reverse=True):
+        _render(image, width, fmt, target)
+    return [target for _, _, target in missing]
+
+
+def _find_source(stem: str) -> Optional[str]:
+    for ext in SOURCE_EXTENSIONS:
+        name = f"{stem}.{ext}"
+        if os.path.isfile(os.path.join(MEDIA_DIR, name)):
+            return name
+    return None
+
+
+class DerivativeFiles(StaticFiles):
+    """StaticFiles для /thumbs: отсутствующая копия создаётся при первом запросе."""
+
+    async def get_response(self, path: str, scope):
+        try:
+            return await super().get_response(path, scope)
+        except HTTPException as e:
+            if e.status_code != 404:
+                raise
+        # path уже нормализован StaticFiles: <ширина>/<stem>.<fmt>
+        width, _, rest = path.partition("/")
+        stem, _, fmt = rest.rpartition(".")
+        if (not width.isdigit() or int(width) not in THUMB_WIDTHS or fmt not in THUMB_FORMATS
+                or ".." in stem or stem.startswith(("thumbs/", ".tmp/"))):
+            raise HTTPException(status_code=404)
+        source = await run_in_threadpool(_find_source, stem)
+        if source is None:
+            raise HTTPException(status_code=404)
+        await run_in_threadpool(generate_derivatives, source, (int(width),))
+        return await super().get_response(path, scope)
+
+
+def remove_derivatives(url: str) -> None:
+    """Удаляет копии удалённого оригинала."""
+    for sizes in (derivative_urls(url) or {}).values():
+        for derivative in sizes.values():
+            path = os.path.join(THUMB_DIR, derivative[len(THUMB_URL) + 1:])
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def evict_thumbnails(max_bytes: int = THUMB_CACHE_MAX_BYTES) -> int:
+    """Удаляет давно не читанные копии, пока каталог не станет меньше 90% лимита."""
+    files = []
+    total = 0
+    for root, _, names in os.walk(THUMB_DIR):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((max(st.st_atime, st.st_mtime), st.st_size, path))
+            total += st.st_size
+    if total <= max_bytes:
+        return 0
+
+    removed = 0
+    target = max_bytes * 0.9
+    for _, size, path in sorted(files):
+        if total <= target:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
@@ -0,0 +1,65 @@
+# services/unread_counters.py
+"""
+Счётчики непрочитанного: ChatUnreadCounter — сумма unread_count по
+курсорам чатов пользователя, NotificationUnreadCounter — число его
+непрочитанных уведомлений. Отправка и прочтение меняют их в той же
+транзакции, что и сообщения/курсоры.
+
+Заказ удаляется вместе с курсорами его чата — сначала их unread_count
+списывается с общих счётчиков участников:
+
+    drop_order_cursors(db, order.id); db.delete(order); db.commit()
+
+reconcile_unread_counters (ежедневно в планировщике) пересчитывает
+разошедшиеся счётчики — например, после удаления строк в обход API.
+"""
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from models.chat import ChatReadCursor, ChatUnreadCounter
+from models.notification import Notification, NotificationUnreadCounter
+
+
+def drop_order_cursors(db: Session, order_id: int) -> None:
+    """Удаляет курсоры чата заказа и списывает их непрочитанные. Commit — вместе с удалением заказа."""
+    # FOR UPDATE: параллельная отправка не увеличит unread_count между чтением и удалением
+    cursors = db.execute(
+        select(ChatReadCursor.user_id, ChatReadCursor.unread_count)
+        .where(ChatReadCursor.order_id == order_id)
+        .with_for_update()
+    ).all()
+    for user_id, unread in cursors:
+        if unread:
+            db.execute(
+                update(ChatUnreadCounter)
+                .where(ChatUnreadCounter.user_id == user_id)
+                .values(unread_count=ChatUnreadCounter.unread_count - unread)
+                .execution_options(synchronize_session=False)
+            )
+    db.execute(
+        delete(ChatReadCursor).where(ChatReadCursor.order_id == order_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def reconcile_unread_counters(db: Session) -> int:
+    """Пересчитывает разошедшиеся счётчики; возвращает их число."""
+    chat = (
+        select(func.coalesce(func.sum(ChatReadCursor.unread_count), 0))
+        .where(ChatReadCursor.user_id == ChatUnreadCounter.user_id)
+        .scalar_subquery()
+    )
+    notifications = (
+        select(func.count())
+        .where(Notification.user_id == NotificationUnreadCounter.user_id, Notification.is_read.isnot(True))
+        .scalar_subquery()
+    )
+    # Редкую гонку с параллельной отправкой внутри UPDATE исправит следующий запуск
+    fixed = 0
+    for counter, expected in ((ChatUnreadCounter, chat), (NotificationUnreadCounter, notifications)):
+        fixed += db.execute(
+            update(counter).where(counter.unread_count != expected).values(unread_count=expected)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+    return fixed
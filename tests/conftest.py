@@ -0,0 +1,67 @@
+# tests/conftest.py
+"""
+Тесты идут на отдельной SQLite-базе во временном каталоге; окружение
+задаётся до импорта приложения — движки создаются при импорте db.database.
+
+    python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+
+_TMP_DIR = tempfile.mkdtemp(prefix="masterok-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'test.db')}"
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ["QUERY_DEBUG"] = "1"  # счётчик запросов подключается при импорте main
+os.environ["MEDIA_DIR"] = os.path.join(_TMP_DIR, "media")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # main монтирует media/ относительно рабочего каталога
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from core.dependencies import create_access_token
+from core.principal_cache import principal_cache
+from db.database import Base, SessionLocal, engine
+from models.category import Category
+from models.user import User
+
+
+@pytest.fixture
+def db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    principal_cache.clear()  # id пользователей повторяются между тестами
+    session = SessionLocal()
+    session.add(Category(name="Сантехника"))
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def make_user(db):
+    def make(user_type: str = "client", **fields) -> User:
+        user = User(
+            phone_number=f"+7700{db.query(User).count():07d}", password="x",
+            user_type=user_type, is_verified=True, city="Алматы", category_id=1, **fields
+        )
+        db.add(user)
+        db.commit()
+        return user
+    return make
+
+
+@pytest.fixture
+def auth():
+    def headers(user: User) -> dict:
+        return {"Authorization": "Bearer " + create_access_token({"sub": str(user.id)})}
+    return headers
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
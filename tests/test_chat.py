@@ -0,0 +1,120 @@
+# tests/test_chat.py
+import pytest
+
+from models.chat import ChatMessage, ChatReadCursor, ChatUnreadCounter
+from models.notification import Notification, NotificationUnreadCounter
+from models.order import Order
+from services.unread_counters import reconcile_unread_counters
+
+
+@pytest.fixture
+def order(db, make_user):
+    order = Order(client_id=make_user("client").id, category_id=1, description="Течёт кран", city="Алматы")
+    db.add(order)
+    db.commit()
+    return order
+
+
+def _receive(ws, kind: str) -> dict:
+    while True:
+        event = ws.receive_json()
+        if event["type"] == kind:
+            return event
+
+
+def test_websocket_sees_master_assigned_after_connect(client, db, order, make_user, auth):
+    master = make_user("master")
+    with client.websocket_connect(f"/chat/ws/{order.id}", headers=auth(order.client)) as ws:
+        ws.send_json({"type": "message", "message": "Когда придёте?"})
+        assert _receive(ws, "error")["detail"] == "У заказа ещё нет мастера"
+
+        order.master_id = master.id
+        db.commit()
+        ws.send_json({"type": "message", "message": "Когда придёте?"})
+        assert _receive(ws, "message")["data"]["message"] == "Когда придёте?"
+    assert db.query(ChatMessage.receiver_id).filter(ChatMessage.order_id == order.id).scalar() == master.id
+
+
+def test_websocket_reassigned_master_cannot_send(client, db, order, make_user, auth):
+    master, replacement = make_user("master"), make_user("master")
+    order.master_id = master.id
+    db.commit()
+    with client.websocket_connect(f"/chat/ws/{order.id}", headers=auth(master)) as ws:
+        # Дожидаемся подписки: проверка при подключении уже пройдена
+        ws.send_json({"type": "typing"})
+        _receive(ws, "typing")
+        order.master_id = replacement.id
+        db.commit()
+        ws.send_json({"type": "message", "message": "Буду в 10"})
+        assert _receive(ws, "error")["detail"] == "Нет доступа к чату"
+
+
+def test_mark_read_requires_participant(client, db, order, make_user, auth):
+    outsider = make_user("master")
+    order.master_id = make_user("master").id
+    db.add(ChatMessage(order_id=order.id, sender_id=order.client_id, receiver_id=order.master_id, message="Жду"))
+    db.commit()
+
+    response = client.put(f"/chat/{order.id}/mark-read", headers=auth(outsider))
+    assert response.status_code == 403
+    assert "last_read_message_id" not in response.text
+    assert db.query(ChatReadCursor).filter(ChatReadCursor.user_id == outsider.id).count() == 0
+
+    assert client.put("/chat/999/mark-read", headers=auth(outsider)).status_code == 404
+    assert client.put(f"/chat/{order.id}/mark-read", headers=auth(order.master)).status_code == 200
+
+
+def test_mark_read_subtracts_only_messages_up_to_cursor(client, db, order, make_user, auth):
+    order.master_id = make_user("master").id
+    db.commit()
+    client_headers, master_headers = auth(order.client), auth(order.master)
+    for text in ("Когда придёте?", "Жду"):
+        client.post("/chat/send", json={"order_id": order.id, "message": text}, headers=client_headers)
+    client.post("/chat/send", json={"order_id": order.id, "message": "Буду в 10"}, headers=master_headers)
+    assert client.get("/chat/unread-count", headers=master_headers).json()["unread_messages"] == 2
+
+    assert client.put(f"/chat/{order.id}/mark-read", headers=master_headers).status_code == 200
+    assert client.get("/chat/unread-count", headers=master_headers).json()["unread_messages"] == 0
+    # Повторное прочтение ничего не списывает
+    assert client.put(f"/chat/{order.id}/mark-read", headers=master_headers).status_code == 200
+    client.post("/chat/send", json={"order_id": order.id, "message": "Ок"}, headers=client_headers)
+    assert client.get("/chat/unread-count", headers=master_headers).json()["unread_messages"] == 1
+
+    cursor = db.query(ChatReadCursor).filter(ChatReadCursor.user_id == order.master_id).one()
+    last_id = db.query(ChatMessage.id).filter(ChatMessage.message == "Буду в 10").scalar()
+    assert (cursor.last_read_message_id, cursor.unread_count) == (last_id, 1)
+
+
+def test_admin_order_delete_subtracts_unread(client, db, order, make_user, auth):
+    other = Order(client_id=order.client_id, category_id=1, description="Розетка", city="Алматы")
+    db.add(other)
+    order.master_id = other.master_id = make_user("master").id
+    db.commit()
+    for order_id in (order.id, order.id, other.id):
+        client.post("/chat/send", json={"order_id": order_id, "message": "Когда придёте?"}, headers=auth(order.client))
+    master_headers = auth(order.master)
+    assert client.get("/chat/unread-count", headers=master_headers).json()["unread_messages"] == 3
+
+    admin = make_user("admin")
+    assert client.delete(f"/admin/orders/{order.id}", headers=auth(admin)).status_code == 200
+    assert client.get("/chat/unread-count", headers=master_headers).json()["unread_messages"] == 1
+    assert db.query(ChatReadCursor).filter(ChatReadCursor.order_id == order.id).count() == 0
+    assert reconcile_unread_counters(db) == 0
+
+
+def test_reconcile_unread_counters_fixes_drift(db, order, make_user):
+    master = make_user("master")
+    db.add_all([
+        ChatReadCursor(order_id=order.id, user_id=master.id, unread_count=2),
+        ChatUnreadCounter(user_id=master.id, unread_count=5),
+        Notification(user_id=master.id, message="Новый заказ"),
+        Notification(user_id=master.id, message="Оплата", is_read=True),
+        NotificationUnreadCounter(user_id=master.id, unread_count=0),
+    ])
+    db.commit()
+
+    assert reconcile_unread_counters(db) == 2
+    db.expire_all()
+    assert db.get(ChatUnreadCounter, master.id).unread_count == 2
+    assert db.get(NotificationUnreadCounter, master.id).unread_count == 1
+    assert reconcile_unread_counters(db) == 0
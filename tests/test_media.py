@@ -0,0 +1,61 @@
+# tests/test_media.py
+import asyncio
+import io
+import os
+
+from models.work_photo import WorkPhoto
+from services.media import _store, confirm_upload, discard_upload, remove_unreferenced
+
+JPEG = b"\xff\xd8\xff\xe0" + b"test-image" * 100
+
+
+def test_dedupe_upload_survives_concurrent_remove(db, make_user):
+    first = _store(io.BytesIO(JPEG), 10 ** 6)
+    asyncio.run(confirm_upload(first))
+    second = _store(io.BytesIO(JPEG), 10 ** 6)
+    assert not second.created and os.path.exists(second.backup)
+
+    # Последнюю ссылку удалили до commit второй загрузки — файл ничей и удаляется
+    assert remove_unreferenced(db, first.url)
+    assert not os.path.exists(second.path)
+
+    db.add(WorkPhoto(user_id=make_user("master").id, image_path=second.url))
+    db.commit()
+    asyncio.run(confirm_upload(second))
+    assert os.path.exists(second.path) and not os.path.exists(second.backup)
+    with open(second.path, "rb") as f:
+        assert f.read() == JPEG
+
+
+def test_discard_keeps_file_referenced_by_another_row(db, make_user):
+    first = _store(io.BytesIO(JPEG + b"x"), 10 ** 6)
+    rejected = _store(io.BytesIO(JPEG + b"x"), 10 ** 6)
+    # Строка первой загрузки закоммичена раньше, чем вторая отказалась
+    db.add(WorkPhoto(user_id=make_user("master").id, image_path=first.url))
+    db.commit()
+    asyncio.run(confirm_upload(first))
+
+    rejected.created = True  # худший случай: отказавшаяся загрузка сама создала файл
+    asyncio.run(discard_upload(rejected))
+    assert os.path.exists(first.path) and not os.path.exists(rejected.backup)
+
+
+def test_remove_keeps_file_used_as_profile_photo(db, make_user):
+    stored = _store(io.BytesIO(JPEG + b"y"), 10 ** 6)
+    asyncio.run(confirm_upload(stored))
+    make_user("master", photo_url=stored.url)
+
+    assert not remove_unreferenced(db, stored.url)
+    assert os.path.exists(stored.path)
+
+
+def test_delete_photo_removes_unreferenced_file(client, db, make_user, auth):
+    stored = _store(io.BytesIO(JPEG + b"z"), 10 ** 6)
+    asyncio.run(confirm_upload(stored))
+    master = make_user("master")
+    photo = WorkPhoto(user_id=master.id, image_path=stored.url)
+    db.add(photo)
+    db.commit()
+
+    assert client.delete(f"/photos/{photo.id}", headers=auth(master)).status_code == 200
+    assert not os.path.exists(stored.path)
@@ -0,0 +1,51 @@
+# tests/test_moderation_scan.py
+import asyncio
+import hashlib
+import os
+from collections import namedtuple
+
+from models.moderation import ModerationFlag, ModerationScan
+from services import moderation_scan
+from services.media import MEDIA_DIR, MEDIA_URL, media_name
+from services.moderation_scan import SOURCES, ModerationScanner
+
+Row = namedtuple("Row", "id photo")
+WORK_PHOTOS = next(s for s in SOURCES if s.name == "work_photos")
+
+
+def _media_file(content: bytes) -> str:
+    sha256 = hashlib.sha256(content).hexdigest()
+    name = media_name(sha256, "jpg")
+    os.makedirs(os.path.join(MEDIA_DIR, os.path.dirname(name)), exist_ok=True)
+    with open(os.path.join(MEDIA_DIR, name), "wb") as f:
+        f.write(content)
+    return f"{MEDIA_URL}/{name}"
+
+
+def test_photo_errors_keep_existing_flags(db, monkeypatch):
+    scan = ModerationScan(status="running", dictionary_version=1, source="work_photos")
+    db.add(scan)
+    db.add_all([
+        ModerationFlag(content_type="work_photo", content_id=1, kind="photo"),
+        ModerationFlag(content_type="work_photo", content_id=2, kind="photo"),
+    ])
+    db.commit()
+    rows = [Row(1, _media_file(b"errored")), Row(2, _media_file(b"clean")), Row(3, _media_file(b"bad"))]
+
+    async def moderate_batch(images, raw=False):
+        assert raw
+        return [None, False, True]  # ошибка классификатора, чисто, нарушение
+
+    monkeypatch.setattr(moderation_scan.image_moderator, "moderate_batch", moderate_batch)
+
+    async def run():
+        scanner = ModerationScanner(batch_size=3, workers=1)
+        flags, errors = await scanner._score(WORK_PHOTOS, rows, pool=None)
+        await scanner._save(scan.id, WORK_PHOTOS, rows, flags, errors, 0.1)
+
+    asyncio.run(run())
+
+    flagged = {f.content_id for f in db.query(ModerationFlag).filter_by(content_type="work_photo")}
+    assert flagged == {1, 3}  # флаг фото с ошибкой проверки не снят
+    db.refresh(scan)
+    assert (scan.processed, scan.flagged, scan.errors, scan.last_id) == (3, 1, 1, 3)
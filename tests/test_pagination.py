@@ -0,0 +1,36 @@
+# tests/test_pagination.py
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from core.pagination import PageParams, make_page, paginate
+from models.user import User
+
+
+def _walk(db, descending: bool, limit: int = 2):
+    seen, cursor = [], None
+    while True:
+        page = PageParams(cursor, limit)
+        rows = db.scalars(paginate(select(User), page, User.last_promoted_at, User.id, descending)).all()
+        result = make_page(rows, page, "last_promoted_at")
+        seen.extend(u.id for u in result["items"])
+        cursor = result["next_cursor"]
+        if cursor is None:
+            return seen
+
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_pagination_walks_through_null_sort_values(db, make_user, descending):
+    start = datetime(2026, 1, 1)
+    stamps = [None, start, None, start + timedelta(days=1), start, None, start + timedelta(days=2)]
+    users = [make_user("master", last_promoted_at=stamp) for stamp in stamps]
+
+    seen = _walk(db, descending)
+
+    assert sorted(seen) == sorted(u.id for u in users)  # ни одна строка не потеряна и не повторена
+    # NULL — больше любого значения: первые при DESC, последние при ASC
+    expected = sorted(
+        users, key=lambda u: (u.last_promoted_at is None, u.last_promoted_at or start, u.id), reverse=descending
+    )
+    assert seen == [u.id for u in expected]
@@ -0,0 +1,45 @@
+# tests/test_query_budget.py
+import pytest
+from sqlalchemy import text
+
+import core.query_budget as query_budget
+from core.query_budget import QueryBudgetExceeded, count_queries
+from routes import admin
+
+
+@pytest.fixture
+def strict(monkeypatch):
+    monkeypatch.setattr(query_budget, "QUERY_BUDGET_STRICT", True)
+
+
+@pytest.fixture
+def admin_headers(make_user, auth):
+    return auth(make_user("admin"))
+
+
+def test_budgeted_route_within_budget(client, admin_headers, make_user, strict):
+    for _ in range(3):
+        make_user("master")
+    response = client.get("/admin/users", headers=admin_headers)
+    assert response.status_code == 200
+    assert int(response.headers["X-Query-Count"]) <= admin.get_all_users.__query_budget__
+
+
+def test_budgeted_route_over_budget_raises(client, admin_headers, strict, monkeypatch):
+    monkeypatch.setattr(admin.get_all_users, "__query_budget__", 0)
+    with pytest.raises(QueryBudgetExceeded):
+        client.get("/admin/users", headers=admin_headers)
+
+
+def test_over_budget_only_warns_when_not_strict(client, admin_headers, monkeypatch, caplog):
+    monkeypatch.setattr(admin.get_all_users, "__query_budget__", 0)
+    response = client.get("/admin/users", headers=admin_headers)
+    assert response.status_code == 200
+    assert "при бюджете 0" in caplog.text
+
+
+def test_count_queries_block(db, strict):
+    with pytest.raises(QueryBudgetExceeded):
+        with count_queries(budget=1, where="test"):
+            db.execute(text("SELECT 1"))
+            db.execute(text("SELECT 2"))
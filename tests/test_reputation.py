@@ -0,0 +1,57 @@
+# tests/test_reputation.py
+from models.order import Order
+from models.rating import Rating
+from models.user import User
+from services.reputation import apply_rating, reconcile_reputation
+
+
+def _aggregates(db, user_id: int):
+    db.expire_all()
+    user = db.get(User, user_id)
+    return (user.rating_sum, user.rating_count, [getattr(user, f"rating_{s}") for s in range(1, 6)],
+            round(user.reputation, 6))
+
+
+def _add_rating(db, client, master, stars: int) -> Rating:
+    order = Order(client_id=client.id, master_id=master.id, category_id=1, description="Ремонт", city="Алматы")
+    db.add(order)
+    db.flush()
+    rating = Rating(order_id=order.id, client_id=client.id, master_id=master.id, rating=stars)
+    db.add(rating)
+    apply_rating(db, master.id, stars)
+    db.commit()
+    return rating
+
+
+def test_apply_rating_round_trip_matches_reconcile(db, make_user):
+    client, master = make_user("client"), make_user("master")
+    ratings = [_add_rating(db, client, master, stars) for stars in (5, 4, 4, 1)]
+    assert _aggregates(db, master.id) == (14, 4, [1, 0, 0, 2, 1], 3.5)
+    assert reconcile_reputation(db) == 0
+
+    for rating in ratings[:2]:
+        db.delete(rating)
+        apply_rating(db, rating.master_id, rating.rating, -1)
+        db.commit()
+    assert _aggregates(db, master.id) == (5, 2, [1, 0, 0, 1, 0], 2.5)
+    assert reconcile_reputation(db) == 0
+
+    for rating in ratings[2:]:
+        db.delete(rating)
+        apply_rating(db, rating.master_id, rating.rating, -1)
+        db.commit()
+    assert _aggregates(db, master.id) == (0, 0, [0, 0, 0, 0, 0], 0.0)
+    assert reconcile_reputation(db) == 0
+
+
+def test_reconcile_repairs_drift(db, make_user):
+    client, master = make_user("client"), make_user("master")
+    _add_rating(db, client, master, 3)
+    _add_rating(db, client, master, 5)
+    # Отзыв удалён в обход API — агрегаты разошлись
+    db.query(Rating).filter(Rating.rating == 5).delete()
+    db.commit()
+
+    assert reconcile_reputation(db) == 1
+    assert _aggregates(db, master.id) == (3, 1, [0, 0, 1, 0, 0], 3.0)
+    assert reconcile_reputation(db) == 0